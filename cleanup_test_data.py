@@ -2,24 +2,22 @@
 """
 حذف جميع البيانات التجريبية من Firebase
 Delete all test data from Firebase
-"""
 
-import firebase_admin
-from firebase_admin import credentials, firestore
+يحذف المستندات على دفعات (batch commits) بدلاً من طلب لكل مستند،
+ويعالج عدة مجموعات بالتوازي، ويشمل المجموعات الفرعية (مثل رسائل المحادثات).
+"""
 
-# تهيئة Firebase
-try:
-    cred = credentials.Certificate('/opt/flutter/firebase-admin-sdk.json')
-    firebase_admin.initialize_app(cred)
-    print("✅ تم الاتصال بـ Firebase بنجاح")
-except Exception as e:
-    print(f"❌ خطأ في الاتصال بـ Firebase: {e}")
-    exit(1)
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-db = firestore.client()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
 
-print("\n🗑️  جاري حذف جميع البيانات التجريبية...")
-print("="*60)
+import firestore_session
+import profiling
+from batch_writer import BatchWriter, MAX_BATCH_SIZE, format_throughput
 
 # قائمة المجموعات التي تحتوي على بيانات تجريبية
 collections_to_clean = [
@@ -33,6 +31,7 @@ collections_to_clean = [
     'delivery_offices',
     'notifications',
     'messages',
+    'chats',
     'reviews',
     'coupons',
     'cart_items',
@@ -40,28 +39,134 @@ collections_to_clean = [
     'addresses',
 ]
 
-deleted_count = 0
 
-for collection_name in collections_to_clean:
+def iter_document_pages(collection_ref, page_size):
+    """
+    جلب مراجع المستندات على صفحات، بما فيها المجموعات الفرعية
+    Yield pages of document references for a collection and all its descendants
+    """
+    # recursive() يشمل كل المجموعات الفرعية في استعلام واحد،
+    # و select(['__name__']) يجلب المعرّفات فقط بدون الحقول
+    query = (collection_ref.recursive()
+             .select(['__name__'])
+             .order_by('__name__')
+             .limit(page_size))
+    last_doc = None
+
+    while True:
+        page_query = query.start_after(last_doc) if last_doc else query
+        page = list(page_query.stream())
+        if not page:
+            return
+        yield [doc.reference for doc in page]
+        if len(page) < page_size:
+            return
+        last_doc = page[-1]
+
+
+def purge_collection(db, collection_name, batch_size=MAX_BATCH_SIZE):
+    """
+    حذف مجموعة كاملة مع مجموعاتها الفرعية عبر دفعات
+    Delete a collection and its subcollections using batched commits
+    """
+    started = time.perf_counter()
+    with profiling.phase(collection_name), \
+            BatchWriter(db, batch_size=batch_size, label=collection_name) as writer:
+        # صفحة بحجم الدفعة، فكل صفحة تُرسل في commit واحد
+        for refs in iter_document_pages(db.collection(collection_name), writer.batch_size):
+            for ref in refs:
+                writer.delete(ref)
+
+    elapsed = time.perf_counter() - started
+    return {
+        'collection': collection_name,
+        'deleted': writer.writes,
+        'commits': writer.commits,
+        'elapsed': elapsed,
+        'docs_per_sec': writer.writes / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def purge_collections(db, collection_names, workers=4, batch_size=MAX_BATCH_SIZE,
+                      on_result=None):
+    """
+    حذف عدة مجموعات بالتوازي على عدد محدود من العمال
+    Purge several collections concurrently on a bounded worker pool
+
+    يعيد قائمة بنتائج كل مجموعة؛ المجموعات التي فشلت تحمل المفتاح 'error'.
+    """
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(purge_collection, db, name, batch_size): name
+            for name in collection_names
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'collection': name, 'deleted': 0, 'error': e}
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return results
+
+
+def print_result(result):
+    """طباعة نتيجة حذف مجموعة واحدة"""
+    name = result['collection']
+    if 'error' in result:
+        print(f"⚠️  خطأ في حذف '{name}': {result['error']}")
+    elif result['deleted'] > 0:
+        print(f"✅ {format_throughput(name, result['deleted'], result['elapsed'], result['commits'])}")
+    else:
+        print(f"ℹ️  لا توجد بيانات في '{name}'")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Delete all test data from Firestore')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='number of collections purged concurrently (default: 4)')
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE,
+                        help=f'deletes per batch commit, max {MAX_BATCH_SIZE}')
+    parser.add_argument('--collections', nargs='+', default=collections_to_clean,
+                        metavar='NAME', help='collections to purge (default: all test collections)')
+    profiling.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with profiling.session('cleanup_test_data', args):
+        run(args)
+
+
+def run(args):
+    # تهيئة Firebase
     try:
-        # جلب جميع المستندات
-        docs = db.collection(collection_name).stream()
-        
-        collection_deleted = 0
-        for doc in docs:
-            doc.reference.delete()
-            collection_deleted += 1
-            deleted_count += 1
-        
-        if collection_deleted > 0:
-            print(f"✅ حذف {collection_deleted} مستند من '{collection_name}'")
-        else:
-            print(f"ℹ️  لا توجد بيانات في '{collection_name}'")
-            
+        db = firestore_session.get_db()
     except Exception as e:
-        print(f"⚠️  خطأ في حذف '{collection_name}': {e}")
+        print(f"❌ خطأ في الاتصال بـ Firebase: {e}")
+        sys.exit(1)
+
+    print("\n🗑️  جاري حذف جميع البيانات التجريبية...")
+    print(f"   ⚙️  {args.workers} عمال، {args.batch_size} عملية حذف لكل دفعة")
+    print("="*60)
+
+    started = time.perf_counter()
+    results = purge_collections(db, args.collections, workers=args.workers,
+                                batch_size=args.batch_size, on_result=print_result)
+    elapsed = time.perf_counter() - started
+    deleted_count = sum(r['deleted'] for r in results)
+
+    print("="*60)
+    print(f"\n✅ تم حذف {deleted_count} مستند بنجاح!")
+    if elapsed > 0:
+        print(f"⏱️  الوقت الكلي: {elapsed:.2f} ث ({deleted_count / elapsed:.0f} مستند/ث)")
+    print("\n🎉 التطبيق الآن نظيف وجاهز للإطلاق العام!")
+    print("="*60)
+
 
-print("="*60)
-print(f"\n✅ تم حذف {deleted_count} مستند بنجاح!")
-print("\n🎉 التطبيق الآن نظيف وجاهز للإطلاق العام!")
-print("="*60)
+if __name__ == '__main__':
+    main()
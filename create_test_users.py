@@ -1,28 +1,84 @@
 #!/usr/bin/env python3
 """
 إنشاء مستخدمين تجريبيين في Firebase لاختبار نظام المصادقة
+
+وضع المصنع (--factory N) ينشئ آلاف المستخدمين لاختبارات الحمل: تُحسب
+بصمات كلمات المرور على مجموعة عمليات، ويُكتب كل مستخدم مع بيانات اعتماده
+في نفس الدفعة.
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
-from datetime import datetime
+import argparse
 import hashlib
+import itertools
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+
+import firestore_session
+import profiling
+
+# الحد الأقصى لعمليات الكتابة في دفعة واحدة (مستخدم + بيانات اعتماد = عمليتان)
+MAX_BATCH_SIZE = 500
 
-# تهيئة Firebase
-try:
-    cred = credentials.Certificate('/opt/flutter/firebase-admin-sdk.json')
-    firebase_admin.initialize_app(cred)
-    print("✅ تم الاتصال بـ Firebase بنجاح")
-except Exception as e:
-    print(f"❌ خطأ في الاتصال بـ Firebase: {e}")
-    exit(1)
+# عدد المستخدمين في كل مهمة تُرسل لمجموعة العمليات
+HASH_CHUNK_SIZE = 1000
+
+ROLES = ['buyer', 'merchant', 'delivery_office']
+
+# معاملات دوال اشتقاق المفاتيح البطيئة
+PBKDF2_ITERATIONS = 310_000
+SCRYPT_PARAMS = {'n': 2 ** 14, 'r': 8, 'p': 1}
+
+FACTORY_CITIES = {
+    'الخرطوم': ['الخرطوم', 'الخرطوم 2', 'الخرطوم 3', 'أركويت'],
+    'أم درمان': ['أم درمان', 'أم درمان الشرقية', 'أم درمان الغربية'],
+    'بحري': ['بحري', 'بحري الشمالية', 'بحري الجنوبية'],
+}
+ROLE_NAMES = {
+    'buyer': 'مشتري تجريبي',
+    'merchant': 'تاجر تجريبي',
+    'delivery_office': 'مكتب توصيل تجريبي',
+}
 
-db = firestore.client()
 
 def hash_password(password):
     """تشفير كلمة المرور بـ SHA-256"""
     return hashlib.sha256(password.encode()).hexdigest()
 
+
+def hash_credential(job):
+    """
+    حساب بصمة كلمة المرور حسب الخوارزمية (تعمل داخل عملية منفصلة)
+    job = (password, kdf, salt)
+
+    sha256 هي ما يتحقق منه AuthManager.hashPassword في التطبيق؛
+    pbkdf2 و scrypt أبطأ عمداً لاختبار تكلفة التحقق على الخادم.
+    """
+    password, kdf, salt = job
+    if kdf == 'sha256':
+        return {'passwordHash': hash_password(password)}
+    if kdf == 'pbkdf2':
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, PBKDF2_ITERATIONS)
+        return {
+            'passwordHash': digest.hex(),
+            'hashAlgorithm': 'pbkdf2_sha256',
+            'salt': salt.hex(),
+            'iterations': PBKDF2_ITERATIONS,
+        }
+    digest = hashlib.scrypt(password.encode(), salt=salt, dklen=32, **SCRYPT_PARAMS)
+    return {
+        'passwordHash': digest.hex(),
+        'hashAlgorithm': 'scrypt',
+        'salt': salt.hex(),
+        **{f'scrypt_{k}': v for k, v in SCRYPT_PARAMS.items()},
+    }
+
+
 # مستخدمين تجريبيين
 test_users = [
     {
@@ -57,48 +113,210 @@ test_users = [
     },
 ]
 
-print("\n🔄 جاري إنشاء المستخدمين التجريبيين...")
-print("="*60)
 
-for user_data in test_users:
+def write_user(batch, db, user_data, credential):
+    """إضافة المستخدم وبيانات اعتماده إلى نفس الدفعة (كتابة ذرية)"""
+    userId = user_data['userId']
+    batch.set(db.collection('users').document(userId), user_data)
+    batch.set(db.collection('user_credentials').document(userId), {
+        'userId': userId,
+        'createdAt': user_data['createdAt'],
+        **credential,
+    })
+
+
+def create_sample_users(db):
+    """إنشاء المستخدمين الثلاثة الثابتين"""
+    print("\n🔄 جاري إنشاء المستخدمين التجريبيين...")
+    print("="*60)
+
+    for user_data in test_users:
+        user_data = dict(user_data)
+        try:
+            password = user_data.pop('password')
+
+            # إضافة بيانات إضافية
+            user_data['createdAt'] = datetime.now().isoformat()
+            user_data['isEmailVerified'] = True
+            user_data['isActive'] = True
+
+            # حفظ المستخدم وكلمة المرور المشفرة معاً
+            batch = db.batch()
+            write_user(batch, db, user_data, {'passwordHash': hash_password(password)})
+            batch.commit()
+
+            print(f"\n✅ تم إنشاء المستخدم: {user_data['name']}")
+            print(f"   📧 البريد: {user_data['email']}")
+            print(f"   🔑 كلمة المرور: 12345678")
+            print(f"   👤 النوع: {user_data['role']}")
+
+        except Exception as e:
+            print(f"\n❌ خطأ في إنشاء المستخدم {user_data.get('name', 'Unknown')}: {e}")
+
+    print("\n" + "="*60)
+    print("✅ تم إنشاء جميع المستخدمين التجريبيين بنجاح!")
+    print("\n📋 معلومات تسجيل الدخول:")
+    print("-"*60)
+    print("1️⃣  مشتري:")
+    print("   البريد: buyer@test.com")
+    print("   كلمة المرور: 12345678")
+    print("\n2️⃣  تاجر:")
+    print("   البريد: merchant@test.com")
+    print("   كلمة المرور: 12345678")
+    print("\n3️⃣  مكتب توصيل:")
+    print("   البريد: delivery@test.com")
+    print("   كلمة المرور: 12345678")
+    print("="*60)
+
+
+def generate_users(count, roles, seed=0):
+    """توليد بيانات المستخدمين بشكل كسول، موزعين على الأدوار بالتناوب"""
+    cities = list(FACTORY_CITIES)
+    created_at = datetime.now().isoformat()
+    for i in range(count):
+        role = roles[i % len(roles)]
+        city = cities[i % len(cities)]
+        districts = FACTORY_CITIES[city]
+        yield {
+            'userId': f'USR-LOAD-{role.upper()}-{seed}-{i:06d}',
+            'name': f'{ROLE_NAMES[role]} {i + 1}',
+            'email': f'load.{role}.{seed}.{i}@test.com',
+            'phone': f'+249 9{i % 10} {(i // 10) % 1000:03d} {i % 10000:04d}',
+            'city': city,
+            'district': districts[(i // len(cities)) % len(districts)],
+            'role': role,
+            'createdAt': created_at,
+            'isEmailVerified': True,
+            'isActive': True,
+        }
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def create_users_factory(db, count, roles=ROLES, password='12345678', kdf='sha256',
+                         seed=0, hash_workers=None, batch_size=MAX_BATCH_SIZE):
+    """
+    إنشاء عدد كبير من المستخدمين لاختبارات الحمل
+    Bulk-create users with credential hashing on a process pool
+
+    تُحسب البصمات للدفعة التالية بينما تُكتب الدفعة الحالية، ويُكتب كل
+    مستخدم مع وثيقة user_credentials الخاصة به في نفس الـ batch.
+    """
+    users_per_commit = max(1, min(batch_size, MAX_BATCH_SIZE) // 2)
+    started = time.perf_counter()
+    created = 0
+    commits = 0
+
+    workers = hash_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, HASH_CHUNK_SIZE // (workers * 4))
+        pending = deque()
+        chunks = _chunks(generate_users(count, roles, seed), HASH_CHUNK_SIZE)
+
+        def submit_next():
+            chunk = next(chunks, None)
+            if chunk is None:
+                return
+            jobs = [(password, kdf, os.urandom(16)) for _ in chunk]
+            pending.append((chunk, pool.map(hash_credential, jobs, chunksize=chunksize)))
+
+        # إبقاء مجموعة العمليات مشغولة بجزء إضافي أثناء الكتابة
+        submit_next()
+        submit_next()
+        while pending:
+            chunk, results = pending.popleft()
+            credentials_list = list(results)
+            submit_next()
+
+            for group in _chunks(zip(chunk, credentials_list), users_per_commit):
+                batch = db.batch()
+                for user_data, credential in group:
+                    write_user(batch, db, user_data, credential)
+                batch.commit()
+                commits += 1
+                created += len(group)
+
+            elapsed = time.perf_counter() - started
+            print(f"   ⏳ {created}/{count} مستخدم ({created / elapsed:.0f} مستخدم/ث)")
+
+    elapsed = time.perf_counter() - started
+    return {
+        'users': created,
+        'commits': commits,
+        'elapsed': elapsed,
+        'users_per_sec': created / elapsed if elapsed > 0 else 0.0,
+        'hash_workers': workers,
+        'kdf': kdf,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Create test users in Firestore')
+    parser.add_argument('--factory', type=int, default=0, metavar='N',
+                        help='bulk-create N load-test users instead of the three sample users')
+    parser.add_argument('--roles', default=','.join(ROLES),
+                        help='comma-separated roles to spread users across (default: all)')
+    parser.add_argument('--password', default='12345678', help='password for generated users')
+    parser.add_argument('--kdf', choices=['sha256', 'pbkdf2', 'scrypt'], default='sha256',
+                        help='credential hash; only sha256 is accepted by the app login (default: sha256)')
+    parser.add_argument('--hash-workers', type=int, default=None,
+                        help='processes used for hashing (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE,
+                        help=f'writes per batch commit, two per user, max {MAX_BATCH_SIZE}')
+    parser.add_argument('--seed', type=int, default=0, help='namespace for generated user ids (default: 0)')
+    profiling.add_arguments(parser)
+    args = parser.parse_args(argv)
+    args.roles = [r.strip() for r in args.roles.split(',') if r.strip()]
+    if not args.roles:
+        parser.error(f"--roles needs at least one of: {', '.join(ROLES)}")
+    unknown = set(args.roles) - set(ROLES)
+    if unknown:
+        parser.error(f"unknown roles: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with profiling.session('create_test_users', args):
+        run(args)
+
+
+def run(args):
+    roles = args.roles
+
+    # تهيئة Firebase
     try:
-        userId = user_data['userId']
-        password = user_data.pop('password')
-        
-        # إضافة بيانات إضافية
-        user_data['createdAt'] = datetime.now().isoformat()
-        user_data['isEmailVerified'] = True
-        user_data['isActive'] = True
-        
-        # حفظ المستخدم
-        db.collection('users').document(userId).set(user_data)
-        
-        # حفظ كلمة المرور المشفرة
-        db.collection('user_credentials').document(userId).set({
-            'userId': userId,
-            'passwordHash': hash_password(password),
-            'createdAt': datetime.now().isoformat(),
-        })
-        
-        print(f"\n✅ تم إنشاء المستخدم: {user_data['name']}")
-        print(f"   📧 البريد: {user_data['email']}")
-        print(f"   🔑 كلمة المرور: 12345678")
-        print(f"   👤 النوع: {user_data['role']}")
-        
+        db = firestore_session.get_db()
     except Exception as e:
-        print(f"\n❌ خطأ في إنشاء المستخدم {user_data.get('name', 'Unknown')}: {e}")
-
-print("\n" + "="*60)
-print("✅ تم إنشاء جميع المستخدمين التجريبيين بنجاح!")
-print("\n📋 معلومات تسجيل الدخول:")
-print("-"*60)
-print("1️⃣  مشتري:")
-print("   البريد: buyer@test.com")
-print("   كلمة المرور: 12345678")
-print("\n2️⃣  تاجر:")
-print("   البريد: merchant@test.com")
-print("   كلمة المرور: 12345678")
-print("\n3️⃣  مكتب توصيل:")
-print("   البريد: delivery@test.com")
-print("   كلمة المرور: 12345678")
-print("="*60)
+        print(f"❌ خطأ في الاتصال بـ Firebase: {e}")
+        sys.exit(1)
+
+    if not args.factory:
+        create_sample_users(db)
+        return
+
+    print(f"\n🏭 إنشاء {args.factory} مستخدم ({', '.join(roles)}) بخوارزمية {args.kdf}...")
+    if args.kdf != 'sha256':
+        print("⚠️  تسجيل الدخول في التطبيق يتحقق من SHA-256 فقط؛ هذه الحسابات لاختبار تكلفة التشفير")
+    print("="*60)
+
+    report = create_users_factory(db, args.factory, roles, args.password, args.kdf,
+                                  args.seed, args.hash_workers, args.batch_size)
+
+    print("="*60)
+    print(f"✅ تم إنشاء {report['users']} مستخدم في {report['elapsed']:.2f} ث")
+    print(f"⚡ {report['users_per_sec']:.0f} مستخدم/ث "
+          f"({report['commits']} دفعة، {report['hash_workers']} عملية تشفير)")
+    print(f"🔑 كلمة المرور لجميع الحسابات: {args.password}")
+    print("="*60)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,40 +2,302 @@
 """
 إنشاء QR Code لرابط تحميل التطبيق
 Generate QR Code for app download link
+
+وضع الدفعات (--batch) ينشئ رمزاً لكل متجر ومكتب توصيل من Firestore أو من
+ملف CSV (kind,id,name[,payload]) على مجموعة عمليات. الرموز التي لم تتغير
+بياناتها ولا تنسيقها تُتخطى عبر ذاكرة تخزين مؤقت، والناتج مجلد صور أو
+ملف zip واحد.
+
+    python generate_qr_code.py
+    python generate_qr_code.py --batch firestore --out-dir build/qr
+    python generate_qr_code.py --batch targets.csv --zip build/qr.zip
+    python generate_qr_code.py --batch firestore --url-template '{base}/#/{kind}/{id}'
+
+ملاحظة: التطبيق لا يقرأ معاملات الرابط بعد (لا يوجد توجيه لروابط المتاجر أو
+المكاتب في lib/)، فالرابط الافتراضي يفتح تطبيق الويب فقط. عند إضافة التوجيه
+مرّر شكل الرابط الذي يفهمه عبر --url-template.
 """
 
-try:
-    import qrcode
-    from PIL import Image, ImageDraw, ImageFont
-except ImportError:
-    print("⚠️  جاري تثبيت المكتبات المطلوبة...")
-    import subprocess
-    subprocess.run(['pip', 'install', 'qrcode[pil]', '-q'])
-    import qrcode
-    from PIL import Image, ImageDraw, ImageFont
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
 
 # رابط تحميل التطبيق
 download_url = "https://www.genspark.ai/api/code_sandbox/download_file_stream?project_id=052749b7-ebc7-41d0-b451-a85adb835e96&file_path=%2Fhome%2Fuser%2Fflutter_app%2Fbuild%2Fapp%2Foutputs%2Fflutter-apk%2Fapp-release.apk&file_name=ZahratAmal-v6.2.0.apk"
 
-# إنشاء QR Code
-qr = qrcode.QRCode(
-    version=1,
-    error_correction=qrcode.constants.ERROR_CORRECT_H,
-    box_size=10,
-    border=4,
-)
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ZahratAmal_QRCode.png')
+
+# رابط المتجر / المكتب داخل تطبيق الويب؛ الحقول المتاحة {base} و {kind} و {id}
+# التطبيق لا يقرأ kind/id من الرابط بعد، فهذا الشكل مؤقت حتى يُضاف التوجيه
+DEFAULT_BASE_URL = 'https://zahratamal-36602.web.app'
+URL_TEMPLATE = '{base}/?{kind}={id}'
+
+# تنسيق الرمز؛ أي تغيير هنا يعيد توليد كل الصور
+STYLE = {
+    'error_correction': 'H',
+    'box_size': 10,
+    'border': 4,
+    'fill_color': '#6B9AC4',
+    'back_color': 'white',
+}
+
+# يرفع عند تغيير طريقة الرسم نفسها
+CACHE_VERSION = 1
+CACHE_FILE = '.qr-cache.json'
+ZIP_MANIFEST = 'qr-manifest.json'
+
+# المجموعات التي تُقرأ منها الأهداف في وضع firestore
+FIRESTORE_SOURCES = {
+    'merchant': ('merchants', 'merchant_name'),
+    'office': ('delivery_offices', 'office_name'),
+}
+
+QrTarget = namedtuple('QrTarget', 'kind id name payload')
+
+
+def _require_qrcode():
+    try:
+        import qrcode
+    except ImportError:
+        raise SystemExit("❌ مكتبة qrcode غير مثبتة. ثبّتها مرة واحدة: pip install 'qrcode[pil]'")
+    return qrcode
+
+
+def render_png(job):
+    """رسم رمز واحد وإعادة بايتات PNG (تعمل داخل عملية منفصلة)"""
+    payload, style = job
+    qrcode = _require_qrcode()
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=getattr(qrcode.constants, f"ERROR_CORRECT_{style['error_correction']}"),
+        box_size=style['box_size'],
+        border=style['border'],
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color=style['fill_color'], back_color=style['back_color'])
+    buffer = io.BytesIO()
+    img.save(buffer)
+    return buffer.getvalue()
+
+
+def cache_key(payload, style):
+    """مفتاح التخزين المؤقت: المحتوى + التنسيق + نسخة طريقة الرسم"""
+    encoded = json.dumps([CACHE_VERSION, payload, style], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def file_name(target):
+    """اسم ملف آمن؛ بصمة المعرف الأصلي تمنع تصادم m/1 و m_1 أو المعرفات العربية"""
+    safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', target.id)
+    digest = hashlib.blake2b(target.id.encode('utf-8'), digest_size=4).hexdigest()
+    return f'{target.kind}-{safe_id}-{digest}.png'
+
+
+# ---------------------------------------------------------------------------
+# مصادر الأهداف
+# ---------------------------------------------------------------------------
+
+def targets_from_firestore(db, kinds=tuple(FIRESTORE_SOURCES), base_url=DEFAULT_BASE_URL,
+                           url_template=URL_TEMPLATE):
+    """قراءة المتاجر ومكاتب التوصيل (الاسم فقط) وتوليد رابط لكل منها"""
+    for kind in kinds:
+        collection_name, name_field = FIRESTORE_SOURCES[kind]
+        for snapshot in db.collection(collection_name).select([name_field]).stream():
+            name = (snapshot.to_dict() or {}).get(name_field, '')
+            payload = url_template.format(base=base_url, kind=kind, id=snapshot.id)
+            yield QrTarget(kind, snapshot.id, name, payload)
+
+
+def targets_from_csv(path, base_url=DEFAULT_BASE_URL, url_template=URL_TEMPLATE):
+    """أعمدة CSV: kind,id,name وعمود payload اختياري"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            payload = row.get('payload') or url_template.format(
+                base=base_url, kind=row['kind'], id=row['id'])
+            yield QrTarget(row['kind'], row['id'], row.get('name', ''), payload)
+
+
+# ---------------------------------------------------------------------------
+# الرسم على دفعات
+# ---------------------------------------------------------------------------
+
+def _render_pending(pending, workers):
+    """رسم الأهداف المتغيرة فقط على مجموعة عمليات؛ pending = [(target, name)] ويعيد (name, png)"""
+    if not pending:
+        return
+    names = [name for _, name in pending]
+    jobs = [(target.payload, STYLE) for target, _ in pending]
+    if workers == 1 or len(jobs) < 8:
+        yield from zip(names, map(render_png, jobs))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(jobs) // (workers * 8))
+        yield from zip(names, pool.map(render_png, jobs, chunksize=chunksize))
+
+
+def generate_to_directory(targets, out_dir, workers=None, force=False):
+    """كتابة الصور في مجلد مع ملف .qr-cache.json لتخطي غير المتغير"""
+    os.makedirs(out_dir, exist_ok=True)
+    cache_path = os.path.join(out_dir, CACHE_FILE)
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    stats = {'targets': 0, 'rendered': 0, 'skipped': 0}
+    pending = []
+    new_cache = {}
+    for target in targets:
+        stats['targets'] += 1
+        name = file_name(target)
+        key = cache_key(target.payload, STYLE)
+        new_cache[name] = key
+        if not force and cache.get(name) == key and os.path.exists(os.path.join(out_dir, name)):
+            stats['skipped'] += 1
+        else:
+            pending.append((target, name))
+
+    for name, png in _render_pending(pending, workers or os.cpu_count() or 1):
+        with open(os.path.join(out_dir, name), 'wb') as f:
+            f.write(png)
+        stats['rendered'] += 1
+
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(new_cache, f, indent=0, sort_keys=True)
+    return stats
+
+
+def generate_to_zip(targets, zip_path, workers=None, force=False):
+    """
+    كتابة الصور في ملف zip واحد
+
+    الصور غير المتغيرة تُنسخ من الأرشيف السابق كما هي (بدون إعادة رسم)،
+    ويُكتب الأرشيف الجديد إلى ملف مؤقت ثم يستبدل القديم.
+    """
+    previous = None
+    cache = {}
+    if not force and os.path.exists(zip_path):
+        previous = zipfile.ZipFile(zip_path)
+        try:
+            cache = json.loads(previous.read(ZIP_MANIFEST))
+        except (KeyError, ValueError):
+            cache = {}
+
+    stats = {'targets': 0, 'rendered': 0, 'skipped': 0}
+    tmp_path = zip_path + '.tmp'
+    manifest = {}
+    try:
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_STORED) as archive:
+            pending = []
+            for target in targets:
+                stats['targets'] += 1
+                name = file_name(target)
+                key = cache_key(target.payload, STYLE)
+                manifest[name] = {'key': key, 'kind': target.kind, 'id': target.id,
+                                  'name': target.name, 'payload': target.payload}
+                if previous is not None and cache.get(name, {}).get('key') == key:
+                    # PNG مضغوط أصلاً؛ ZIP_STORED يتجنب ضغطه مرة ثانية
+                    archive.writestr(name, previous.read(name))
+                    stats['skipped'] += 1
+                else:
+                    pending.append((target, name))
+
+            for name, png in _render_pending(pending, workers or os.cpu_count() or 1):
+                archive.writestr(name, png)
+                stats['rendered'] += 1
+            archive.writestr(ZIP_MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=1))
+    finally:
+        if previous is not None:
+            previous.close()
+    os.replace(tmp_path, zip_path)
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# واجهة سطر الأوامر
+# ---------------------------------------------------------------------------
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate QR codes for the app')
+    parser.add_argument('--url', default=download_url, help='payload for single mode (default: APK link)')
+    parser.add_argument('--out', default=DEFAULT_OUTPUT, help='output image for single mode')
+    parser.add_argument('--batch', metavar='SOURCE',
+                        help="'firestore' or a CSV file with kind,id,name[,payload] columns")
+    parser.add_argument('--kinds', nargs='+', choices=sorted(FIRESTORE_SOURCES),
+                        default=list(FIRESTORE_SOURCES), help='Firestore targets (default: all)')
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL,
+                        help=f'web app URL used in generated links (default: {DEFAULT_BASE_URL})')
+    parser.add_argument('--url-template', default=URL_TEMPLATE,
+                        help='link format with {base}, {kind} and {id} fields; the app does not route '
+                             f'these links yet (default: {URL_TEMPLATE})')
+    parser.add_argument('--out-dir', default='qr_codes', help='output directory (default: qr_codes)')
+    parser.add_argument('--zip', metavar='PATH', help='write a single zip archive instead of a directory')
+    parser.add_argument('--workers', type=int, default=None, help='render processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='ignore the cache and render everything')
+    args = parser.parse_args(argv)
+    try:
+        args.url_template.format(base='', kind='', id='')
+    except (KeyError, IndexError, ValueError) as e:
+        parser.error(f'invalid --url-template: {e}')
+    return args
+
+
+def generate_single(url, output_path):
+    with open(output_path, 'wb') as f:
+        f.write(render_png((url, STYLE)))
+
+    print("✅ تم إنشاء QR Code بنجاح!")
+    print(f"📍 الموقع: {output_path}")
+    print("\n📱 استخدم هذا الـ QR Code لتحميل التطبيق مباشرة!")
+    print("🔗 رابط التحميل:", url[:100] + "...")
+
+
+def generate_batch(args):
+    _require_qrcode()
+    if args.batch == 'firestore':
+        import firestore_session
+        try:
+            db = firestore_session.get_db()
+        except Exception as e:
+            print(f"❌ خطأ في الاتصال بـ Firebase: {e}")
+            sys.exit(1)
+        targets = targets_from_firestore(db, args.kinds, args.base_url, args.url_template)
+    else:
+        targets = targets_from_csv(args.batch, args.base_url, args.url_template)
+
+    started = time.perf_counter()
+    if args.zip:
+        stats = generate_to_zip(targets, args.zip, args.workers, args.force)
+        destination = args.zip
+    else:
+        stats = generate_to_directory(targets, args.out_dir, args.workers, args.force)
+        destination = args.out_dir
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ {stats['targets']} رمز QR في {destination}: "
+          f"{stats['rendered']} جديد/متغير، {stats['skipped']} من الذاكرة المؤقتة ({elapsed:.2f} ث)")
 
-qr.add_data(download_url)
-qr.make(fit=True)
 
-# إنشاء الصورة
-img = qr.make_image(fill_color="#6B9AC4", back_color="white")
+def main(argv=None):
+    args = parse_args(argv)
+    if args.batch:
+        generate_batch(args)
+    else:
+        generate_single(args.url, args.out)
 
-# حفظ الصورة
-output_path = '/home/user/flutter_app/ZahratAmal_QRCode.png'
-img.save(output_path)
 
-print("✅ تم إنشاء QR Code بنجاح!")
-print(f"📍 الموقع: {output_path}")
-print("\n📱 استخدم هذا الـ QR Code لتحميل التطبيق مباشرة!")
-print("🔗 رابط التحميل:", download_url[:100] + "...")
+if __name__ == '__main__':
+    main()
@@ -2,43 +2,1320 @@
 """
 خادم HTTP بدون تخزين مؤقت - يجبر المتصفح على تحميل أحدث نسخة
 HTTP Server with no-cache headers - forces browser to load latest version
+
+الوضع الافتراضي متعدد الخيوط مع HTTP/1.1 keep-alive وعدد محدود من العمال،
+ويتضمن اختبار حمل مدمج (--loadtest) يقيس الطلبات/ث وزمن الاستجابة p99.
+طلبات Range (مقطع واحد أو عدة مقاطع) تُجاب بـ 206، فالتحميل المتقطع لملف
+كبير (canvaskit.wasm أو APK) يُستأنف من حيث توقف.
 """
 
+import argparse
+import email.utils
+import hashlib
+import http.client
+import gzip
 import http.server
+import io
+import json
+import math
+import mimetypes
+import os
+import posixpath
+import re
+import queue
 import socketserver
-from datetime import datetime
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http import HTTPStatus
+from types import MappingProxyType
+from urllib.parse import quote, unquote, urlsplit, urlunsplit
+
+try:
+    import brotli
+except ImportError:
+    # بدون مكتبة brotli نستخدم ملفات .br الجاهزة فقط
+    brotli = None
 
 PORT = 5060
 
+# عدد العمال الافتراضي (كل اتصال keep-alive يشغل عاملاً واحداً)
+DEFAULT_WORKERS = 32
+
+# مهلة الاتصال الخامل قبل إغلاقه وتحرير العامل (بالثواني)
+KEEPALIVE_TIMEOUT = 15
+
+# سياسات التخزين المؤقت
+NO_STORE_POLICY = 'no-store, no-cache, must-revalidate, max-age=0'
+REVALIDATE_POLICY = 'no-cache'
+# نفس السياسة التي يعلنها netlify.toml لملفات *.js و *.css و *.wasm
+IMMUTABLE_POLICY = 'public, max-age=31536000, immutable'
+
+# ملفات تحمل بصمة المحتوى في اسمها، مثل main.dart.3f2a9c1b.js
+HASHED_ASSET_RE = re.compile(r'[.-][0-9a-fA-F]{8,64}\.(?:js|mjs|css|wasm)$')
+
+
+# الضغط: الترتيب المفضل، لاحقة الملفات المضغوطة مسبقاً، ودوال الضغط المتاحة
+ENCODING_PREFERENCE = ('br', 'gzip')
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+COMPRESSORS = {'gzip': lambda data: gzip.compress(data, compresslevel=6)}
+if brotli is not None:
+    COMPRESSORS['br'] = lambda data: brotli.compress(data, quality=5)
+
+# أنواع الملفات التي يفيد ضغطها (الصور والخطوط woff2 مضغوطة أصلاً)
+COMPRESSIBLE_TYPES = {
+    'application/javascript', 'application/json', 'application/manifest+json',
+    'application/wasm', 'application/xml', 'image/svg+xml', 'font/ttf', 'font/otf',
+    'application/x-font-ttf', 'application/vnd.ms-fontobject',
+}
+MIN_COMPRESS_SIZE = 1024
+# لا فائدة من نسخة مضغوطة أكبر من 90% من الأصل
+MIN_COMPRESSION_GAIN = 0.9
+DEFAULT_COMPRESSION_CACHE_MB = 64
+
+# الملفات غير المضغوطة من هذا الحجم فما فوق تُرسل عبر sendfile
+SENDFILE_MIN_SIZE = 64 * 1024
+
+# Range: أقصى عدد مقاطع بعد الدمج؛ أكثر من ذلك يُتجاهل ويُرسل الملف كاملاً
+MAX_RANGES = 16
+RANGE_SPEC_RE = re.compile(r'(\d*)-(\d*)', re.ASCII)
+
+# المراقبة: مسار مقاييس Prometheus وحدود مدرج زمن الاستجابة (بالثواني)
+METRICS_PATH = '/metrics'
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# أقصى عدد مسارات مميزة في المقاييس (روابط SPA العميقة لا نهاية لها)
+MAX_METRIC_PATHS = 500
+
+# جدول الأصول: الملفات حتى هذا الحجم تُحفظ في الذاكرة، والأكبر تبقى مفتوحة لـ sendfile
+PRELOAD_INLINE_MAX = 512 * 1024
+WATCH_INTERVAL = 2.0
+
+
+class ETagCache:
+    """
+    ذاكرة ETag قوية لكل ملف، تُعاد حسابها فقط عند تغير mtime أو الحجم
+    Strong ETags per file, recomputed only when mtime or size changes
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, fs, f):
+        key = (fs.st_mtime_ns, fs.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry and entry[0] == key:
+            return entry[1]
+        digest = hashlib.blake2b(digest_size=16)
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+        f.seek(0)
+        etag = f'"{digest.hexdigest()}"'
+        with self._lock:
+            self._entries[path] = (key, etag)
+        return etag
+
+
+class CompressionCache:
+    """
+    ذاكرة LRU محدودة الحجم للنسخ المضغوطة، تُبطل عند تغير mtime أو الحجم
+    Size-bounded LRU of compressed file bodies keyed by (path, encoding)
+
+    الملفات التي لا يقلل الضغط حجمها تُسجل كـ None فتُرسل كما هي.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        # قفل لكل ملف حتى لا يضغط عدة عمال نفس الملف في الطلب الأول
+        self._key_locks = {}
+
+    def _lookup(self, key, stamp):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                return True, entry[1]
+        return False, None
+
+    def get(self, path, encoding, stamp, read_bytes):
+        """stamp = (mtime_ns, size)؛ read_bytes() تعيد محتوى الملف كاملاً"""
+        key = (path, encoding)
+        found, data = self._lookup(key, stamp)
+        if found:
+            return data
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            found, data = self._lookup(key, stamp)
+            if found:
+                return data
+            data = COMPRESSORS[encoding](read_bytes())
+            if len(data) >= stamp[1] * MIN_COMPRESSION_GAIN:
+                data = None
+            self._store(key, stamp, data)
+        return data
+
+    def _store(self, key, stamp, data):
+        size = len(data) if data else 0
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old and old[1]:
+                self._size -= len(old[1])
+            if size <= self.max_bytes:
+                self._entries[key] = (stamp, data)
+                self._size += size
+                while self._size > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    if evicted:
+                        self._size -= len(evicted)
+
+
+def is_compressible(ctype, size):
+    return size >= MIN_COMPRESS_SIZE and (ctype.startswith('text/') or ctype in COMPRESSIBLE_TYPES)
+
+
+def parse_accept_encoding(header):
+    """تحليل Accept-Encoding إلى {ترميز: q}"""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def is_content_hashed(path):
+    """هل يحمل اسم الملف بصمة محتواه؟ (آمن للتخزين الدائم)"""
+    return HASHED_ASSET_RE.search(os.path.basename(path)) is not None
+
+
+def etag_matches(header, etag):
+    """مقارنة If-None-Match (مقارنة ضعيفة كما يحددها RFC 9110)"""
+    if header.strip() == '*':
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(candidate.strip().removeprefix('W/') == opaque
+               for candidate in header.split(','))
+
+
+def not_modified_since(header, mtime):
+    """هل الملف لم يتغير منذ تاريخ If-Modified-Since؟"""
+    try:
+        ims = email.utils.parsedate_to_datetime(header)
+    except (TypeError, IndexError, OverflowError, ValueError):
+        return False
+    if ims.tzinfo is None:
+        ims = ims.replace(tzinfo=timezone.utc)
+    last_modified = datetime.fromtimestamp(mtime, timezone.utc).replace(microsecond=0)
+    return last_modified <= ims
+
+
+def parse_range(header, size):
+    """
+    تحليل Range: bytes=... إلى مقاطع (start, end) شاملة، مرتبة ومدمجة
+    Parse a bytes Range header against a representation of `size` bytes
+
+    None = header غير صالح أو مقاطع كثيرة (يُتجاهل ويُرسل التمثيل كاملاً)،
+    [] = لا يوجد مقطع قابل للتلبية (416).
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes':
+        return None
+    items = [item.strip() for item in spec.split(',') if item.strip()]
+    if not items:
+        return None
+    ranges = []
+    for item in items:
+        match = RANGE_SPEC_RE.fullmatch(item)
+        if match is None or match.group(0) == '-':
+            return None
+        first, last = match.groups()
+        if not first:
+            # bytes=-500: آخر 500 بايت
+            suffix = int(last)
+            if suffix and size:
+                ranges.append((max(0, size - suffix), size - 1))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start < size:
+            ranges.append((start, min(int(last), size - 1) if last else size - 1))
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged if len(merged) <= MAX_RANGES else None
+
+
+def if_range_matches(header, etag, last_modified):
+    """If-Range: ETag قوي مطابق تماماً، أو نفس تاريخ Last-Modified المرسل سابقاً"""
+    header = header.strip()
+    if header.startswith(('"', 'W/')):
+        return etag is not None and header == etag
+    return header == last_modified
+
+
+class FileRegion:
+    """
+    مقطع من ملف مفتوح يُقرأ بإزاحات صريحة (os.pread / sendfile)
+    A byte range of an open file read with explicit offsets
+
+    لا يحرك موضع القراءة في الملف المشترك، فيمكن لعدة خيوط إرسال نفس الملف معاً.
+    """
+
+    def __init__(self, file, offset, length):
+        self._file = file
+        self.offset = offset
+        self.length = length
+        self._pos = offset
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def seek(self, pos, whence=0):
+        self._pos = pos
+        return pos
+
+    def tell(self):
+        return self._pos
+
+    def read(self, size=-1):
+        end = self.offset + self.length
+        if size is None or size < 0:
+            size = end - self._pos
+        size = max(0, min(size, end - self._pos))
+        data = os.pread(self.fileno(), size, self._pos) if size else b''
+        self._pos += len(data)
+        return data
+
+    def close(self):
+        # الملف مملوك لجدول الأصول أو للطلب، لا لهذا المقطع
+        pass
+
+
+class MemoryRegion:
+    """
+    محتوى في الذاكرة يُكتب إلى المقبس كـ memoryview بدون نسخ
+    In-memory body written straight from a memoryview
+    """
+
+    def __init__(self, data):
+        self.view = memoryview(data)
+
+    def close(self):
+        pass
+
+
+def body_slice(body, start, length):
+    """مقطع من جسم استجابة بدون قراءته: memoryview أو FileRegion"""
+    if isinstance(body, MemoryRegion):
+        return body.view[start:start + length]
+    if isinstance(body, FileRegion):
+        return FileRegion(body._file, body.offset + start, length)
+    return FileRegion(body, start, length)
+
+
+class RangeBody:
+    """
+    جسم استجابة 206: مقاطع (وحدود multipart) تُرسل بالترتيب
+    Parts of a 206 response; closing it closes the underlying body
+    """
+
+    def __init__(self, source, parts):
+        self._source = source
+        self.parts = parts
+        self.length = sum(part.length if isinstance(part, FileRegion) else len(part) for part in parts)
+
+    def close(self):
+        self._source.close()
+
+
+class Asset(namedtuple('Asset', 'key path mime size mtime_ns etag data file')):
+    """
+    ملف جاهز للإرسال: المحتوى في الذاكرة (data) أو ملف مفتوح (file)
+    A servable file: bytes held in memory, or an open file sent with sendfile
+    """
+
+    __slots__ = ()
+
+    @property
+    def mtime(self):
+        return self.mtime_ns / 1e9
+
+    def open(self):
+        """جسم الاستجابة لطلب واحد"""
+        if self.data is not None:
+            return MemoryRegion(self.data)
+        return FileRegion(self.file, 0, self.size)
+
+    def read(self):
+        """المحتوى كاملاً (للضغط)"""
+        if self.data is not None:
+            return self.data
+        return FileRegion(self.file, 0, self.size).read()
+
+
+def guess_mime(path):
+    """نوع MIME بنفس قواعد SimpleHTTPRequestHandler"""
+    ext = posixpath.splitext(path)[1]
+    extensions_map = http.server.SimpleHTTPRequestHandler.extensions_map
+    if ext in extensions_map:
+        return extensions_map[ext]
+    if ext.lower() in extensions_map:
+        return extensions_map[ext.lower()]
+    guess, _ = mimetypes.guess_type(path)
+    return guess or 'application/octet-stream'
+
+
+def is_hosting_ignored(rel_path):
+    """نفس قائمة ignore في firebase.json"""
+    parts = rel_path.split('/')
+    return (rel_path == 'firebase.json'
+            or any(part.startswith('.') for part in parts)
+            or 'node_modules' in parts)
+
+
+def load_asset(key, path, inline_max=PRELOAD_INLINE_MAX):
+    """قراءة ملف إلى Asset مع حساب ETag قوي"""
+    f = open(path, 'rb')
+    try:
+        fs = os.fstat(f.fileno())
+        digest = hashlib.blake2b(digest_size=16)
+        if fs.st_size <= inline_max:
+            data = f.read()
+            digest.update(data)
+            f.close()
+            f = None
+        else:
+            data = None
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return Asset(key, path, guess_mime(path), fs.st_size, fs.st_mtime_ns,
+                     f'"{digest.hexdigest()}"', data, f)
+    except:
+        if f is not None:
+            f.close()
+        raise
+
+
+class AssetStore:
+    """
+    جدول أصول ثابت لمجلد البناء: المسار -> Asset
+    Immutable path -> Asset table for a build directory
+
+    يُبنى مرة واحدة عند التشغيل فيصبح كل طلب بحثاً في قاموس، ويطبق نفس
+    إعادة التوجيه التي يعلنها firebase.json (** -> /index.html). عند تغير
+    المجلد يُبنى جدول جديد ويُستبدل بعملية إسناد واحدة (ذرية).
+    """
+
+    def __init__(self, root, inline_max=PRELOAD_INLINE_MAX):
+        self.root = os.path.abspath(root)
+        self.inline_max = inline_max
+        self.table = MappingProxyType({})
+        self.signature = None
+        self.rebuild()
+
+    def scan(self):
+        """قائمة (key, path, stat) لكل ملف يُنشر"""
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.') and d != 'node_modules']
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                rel = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if is_hosting_ignored(rel):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append(('/' + rel, path, st))
+        return entries
+
+    @staticmethod
+    def _signature(entries):
+        return frozenset((key, st.st_mtime_ns, st.st_size) for key, _, st in entries)
+
+    def rebuild(self, entries=None):
+        """بناء جدول جديد، مع إعادة استخدام الأصول التي لم تتغير"""
+        entries = self.scan() if entries is None else entries
+        old = self.table
+        table = {}
+        for key, path, st in entries:
+            previous = old.get(key)
+            if previous and previous.mtime_ns == st.st_mtime_ns and previous.size == st.st_size:
+                table[key] = previous
+                continue
+            try:
+                table[key] = load_asset(key, path, self.inline_max)
+            except OSError:
+                continue
+        self.table = MappingProxyType(table)
+        self.signature = self._signature(entries)
+        return len(table)
+
+    def resolve(self, url_path):
+        """
+        إيجاد الأصل لمسار URL
+        Returns (asset, redirect_path); unknown paths fall back to /index.html
+        """
+        table = self.table
+        path = unquote(url_path)
+        trailing_slash = path.endswith('/')
+        key = posixpath.normpath('/' + path.lstrip('/'))
+        if key == '/':
+            key = ''
+        asset = table.get(key)
+        if asset is not None and not trailing_slash:
+            return asset, None
+        index = table.get(key + '/index.html')
+        if index is not None:
+            if not trailing_slash:
+                return None, url_path + '/'
+            return index, None
+        # SPA: كل مسار غير موجود يعيد index.html كما في Firebase Hosting
+        return table.get('/index.html'), None
+
+    def watch(self, interval):
+        """مراقبة المجلد في خيط خلفي وإعادة البناء عند التغيير"""
+        def loop():
+            pending = None
+            while True:
+                time.sleep(interval)
+                entries = self.scan()
+                signature = self._signature(entries)
+                if signature == self.signature:
+                    pending = None
+                    continue
+                if signature != pending:
+                    # انتظار دورة أخرى حتى يكتمل البناء الجاري
+                    pending = signature
+                    continue
+                count = self.rebuild(entries)
+                pending = None
+                print(f"🔄 تم تحديث جدول الأصول ({count} ملف)")
+
+        thread = threading.Thread(target=loop, name='asset-watcher', daemon=True)
+        thread.start()
+        return thread
+
+
+class AccessLog:
+    """
+    سجل طلبات غير حاجب: الخيط الخادم يضع السجل في طابور فقط
+    Non-blocking access log: a background thread formats and writes records
+
+    التنسيق والكتابة يحدثان في خيط الكاتب، والتفريغ (flush) عند فراغ الطابور.
+    """
+
+    _STOP = object()
+
+    def __init__(self, stream=None, fmt='json'):
+        self.stream = stream or sys.stdout
+        self.fmt = fmt
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='access-log', daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        self._queue.put(record)
+
+    def _format(self, record):
+        if self.fmt == 'json':
+            return json.dumps(record, ensure_ascii=False)
+        timestamp = datetime.fromtimestamp(record['ts']).strftime('%Y-%m-%d %H:%M:%S')
+        if 'message' in record:
+            return f"[{timestamp}] {record['message']}"
+        return (f"[{timestamp}] \"{record['request']}\" {record['status']} {record['bytes']} "
+                f"{record['duration_ms']:.1f}ms")
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is self._STOP:
+                break
+            try:
+                self.stream.write(self._format(record) + '\n')
+                if self._queue.empty():
+                    self.stream.flush()
+            except (OSError, ValueError):
+                pass
+        try:
+            self.stream.flush()
+        except (OSError, ValueError):
+            pass
+
+    def close(self):
+        self._queue.put(self._STOP)
+        self._thread.join(timeout=5)
+
+
+class Metrics:
+    """
+    مقاييس الطلبات لكل مسار: العدد حسب الحالة، البايتات، ومدرج زمن الاستجابة
+    Per-path request counts, bytes sent, status codes and latency histograms
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, max_paths=MAX_METRIC_PATHS):
+        self.buckets = buckets
+        self.max_paths = max_paths
+        self._lock = threading.Lock()
+        self._requests = {}   # (path, status) -> count
+        self._bytes = {}      # path -> bytes
+        self._latency = {}    # path -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, path, status, size, duration):
+        with self._lock:
+            if path not in self._bytes and len(self._bytes) >= self.max_paths:
+                path = 'other'
+            key = (path, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            self._bytes[path] = self._bytes.get(path, 0) + size
+            hist = self._latency.get(path)
+            if hist is None:
+                hist = self._latency[path] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    hist[i] += 1
+            hist[len(self.buckets)] += 1
+            hist[-1] += duration
+
+    def render(self):
+        """صيغة نصية متوافقة مع Prometheus"""
+        with self._lock:
+            requests = sorted(self._requests.items())
+            sent = sorted(self._bytes.items())
+            latency = sorted((path, list(hist)) for path, hist in self._latency.items())
+
+        lines = [
+            '# HELP nocache_http_requests_total HTTP requests by path and status code.',
+            '# TYPE nocache_http_requests_total counter',
+        ]
+        for (path, status), count in requests:
+            lines.append(f'nocache_http_requests_total{{path="{_label(path)}",status="{status}"}} {count}')
+        lines += [
+            '# HELP nocache_http_response_bytes_total Response body bytes sent by path.',
+            '# TYPE nocache_http_response_bytes_total counter',
+        ]
+        for path, size in sent:
+            lines.append(f'nocache_http_response_bytes_total{{path="{_label(path)}"}} {size}')
+        lines += [
+            '# HELP nocache_http_request_duration_seconds Time from request line to last byte.',
+            '# TYPE nocache_http_request_duration_seconds histogram',
+        ]
+        for path, hist in latency:
+            label = _label(path)
+            for bound, count in zip(self.buckets, hist):
+                lines.append(f'nocache_http_request_duration_seconds_bucket{{path="{label}",le="{bound}"}} {count}')
+            total = hist[len(self.buckets)]
+            lines.append(f'nocache_http_request_duration_seconds_bucket{{path="{label}",le="+Inf"}} {total}')
+            lines.append(f'nocache_http_request_duration_seconds_sum{{path="{label}"}} {hist[-1]:.6f}')
+            lines.append(f'nocache_http_request_duration_seconds_count{{path="{label}"}} {total}')
+        return '\n'.join(lines) + '\n'
+
+
+def _label(value):
+    """تهريب قيمة label في صيغة Prometheus"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
 class NoCacheHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     """معالج طلبات HTTP مع headers لمنع التخزين المؤقت"""
-    
+
+    # المجلد المخدوم (None = المجلد الحالي)
+    serve_directory = None
+
+    # سجل الطلبات والمقاييس (None = معطل)
+    access_log = None
+    metrics = None
+    metrics_path = METRICS_PATH
+
+    # وضع التحقق: ETag/Last-Modified و 304 بدلاً من no-store
+    revalidate = False
+    etag_cache = None
+
+    # ضغط gzip/brotli حسب Accept-Encoding
+    compress = False
+    compression_cache = None
+
+    # SPA: المسارات غير الموجودة تعيد index.html
+    spa = False
+
+    # جدول الأصول المحمل مسبقاً (None = القراءة من نظام الملفات)
+    asset_store = None
+
+    def __init__(self, *args, directory=None, **kwargs):
+        # سياسة التخزين للطلب الحالي (None = no-store)
+        self._cache_control = None
+        self._reset_request_state()
+        super().__init__(*args, directory=directory or self.serve_directory, **kwargs)
+
+    def _reset_request_state(self):
+        self._request_started = None
+        self._status = None
+        self._bytes_sent = 0
+
+    def handle_one_request(self):
+        # الاتصال المفتوح يعالج عدة طلبات، فلا تنتقل السياسة من طلب لآخر
+        self._cache_control = None
+        self._reset_request_state()
+        super().handle_one_request()
+        if self._request_started is not None:
+            self._record_request()
+
+    def parse_request(self):
+        # يبدأ القياس بعد وصول سطر الطلب، فلا يُحسب وقت انتظار الاتصال الخامل
+        self._request_started = time.perf_counter()
+        return super().parse_request()
+
+    def do_GET(self):
+        if self.metrics is not None and urlsplit(self.path).path == self.metrics_path:
+            return self._send_metrics()
+        return super().do_GET()
+
+    def do_HEAD(self):
+        # نفس headers طلب GET بدون الجسم
+        if self.metrics is not None and urlsplit(self.path).path == self.metrics_path:
+            return self._send_metrics()
+        return super().do_HEAD()
+
+    def _send_metrics(self):
+        body = self.metrics.render().encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def send_header(self, keyword, value):
+        if keyword.lower() == 'content-length':
+            self._bytes_sent = int(value)
+        super().send_header(keyword, value)
+
+    def _record_request(self):
+        duration = time.perf_counter() - self._request_started
+        status = self._status or 0
+        size = 0 if self.command == 'HEAD' or status in (204, 304) else self._bytes_sent
+        path = urlsplit(self.path).path if self.path else '-'
+        if self.metrics is not None:
+            self.metrics.observe(path, status, size, duration)
+        if self.access_log is not None:
+            self.access_log.write({
+                'ts': time.time(),
+                'client': self.client_address[0],
+                'method': self.command,
+                'path': path,
+                'request': self.requestline,
+                'status': status,
+                'bytes': size,
+                'duration_ms': round(duration * 1000, 3),
+            })
+
+    def send_head(self):
+        if self.asset_store is not None:
+            return self._send_head_from_table()
+
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not urlsplit(self.path).path.endswith('/'):
+                # إعادة التوجيه إلى المسار مع / كما في الأصل
+                return super().send_head()
+            for index in ('index.html', 'index.htm'):
+                index_path = os.path.join(path, index)
+                if os.path.isfile(index_path):
+                    path = index_path
+                    break
+            else:
+                # عرض محتوى المجلد كما في الأصل
+                return super().send_head()
+        elif self.spa and not os.path.isfile(path):
+            # SPA: المسارات غير الموجودة تعيد index.html كما في Firebase Hosting
+            path = os.path.join(self.directory, 'index.html')
+        if path.endswith('/'):
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        try:
+            fs = os.fstat(f.fileno())
+            etag = self.etag_cache.get(path, fs, f) if self.revalidate else None
+            asset = Asset(None, path, self.guess_type(path), fs.st_size, fs.st_mtime_ns, etag, None, f)
+            return self._send_asset(asset, f)
+        except:
+            f.close()
+            raise
+
+    def _send_head_from_table(self):
+        """وضع جدول الأصول: كل طلب بحث في قاموس بدون stat أو فتح ملفات"""
+        parts = urlsplit(self.path)
+        asset, redirect = self.asset_store.resolve(parts.path)
+        if redirect is not None:
+            self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+            self.send_header('Location', urlunsplit(('', '', redirect, parts.query, parts.fragment)))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return None
+        if asset is None:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        return self._send_asset(asset, asset.open())
+
+    def _send_asset(self, asset, body):
+        """إرسال headers للأصل مع التحقق والضغط والمقاطع، ويعيد جسم الاستجابة أو None"""
+        try:
+            last_modified = self.date_time_string(asset.mtime)
+            etag = asset.etag if self.revalidate else None
+            if self.revalidate:
+                self._cache_control = IMMUTABLE_POLICY if is_content_hashed(asset.path) else REVALIDATE_POLICY
+
+            length, encoding = asset.size, None
+            negotiable = self.compress and is_compressible(asset.mime, asset.size)
+            if negotiable:
+                variant = self._compressed_variant(asset)
+                if variant is not None:
+                    encoding, compressed, length = variant
+                    body.close()
+                    body = compressed
+                    if etag:
+                        # لكل ترميز تمثيل مختلف، فله ETag مختلف
+                        etag = f'{etag[:-1]}-{encoding}"'
+
+            if self._is_not_modified(etag, asset.mtime):
+                body.close()
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                if etag:
+                    self.send_header('ETag', etag)
+                self.send_header('Last-Modified', last_modified)
+                if negotiable:
+                    self.send_header('Vary', 'Accept-Encoding')
+                self.end_headers()
+                return None
+
+            # المقاطع تُحسب على التمثيل المختار نفسه (المضغوط إن وُجد)، فلا
+            # يخلط التحميل المستأنف بايتات ترميزين مختلفين
+            ranges = self._requested_ranges(length, etag, last_modified)
+            if ranges is not None:
+                return self._send_ranges(body, ranges, length, asset.mime, encoding,
+                                         negotiable, etag, last_modified)
+
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-type', asset.mime)
+            self.send_header('Content-Length', str(length))
+            self.send_header('Last-Modified', last_modified)
+            self.send_header('Accept-Ranges', 'bytes')
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+            if negotiable:
+                self.send_header('Vary', 'Accept-Encoding')
+            if etag:
+                self.send_header('ETag', etag)
+            self.end_headers()
+            return body
+        except:
+            body.close()
+            raise
+
+    def _requested_ranges(self, size, etag, last_modified):
+        """مقاطع Range المطلوبة، أو None لإرسال التمثيل كاملاً (Range لطلبات GET فقط)"""
+        header = self.headers.get('Range')
+        if header is None or self.command != 'GET':
+            return None
+        if_range = self.headers.get('If-Range')
+        if if_range is not None and not if_range_matches(if_range, etag, last_modified):
+            # تغير الملف منذ بدء التحميل: يبدأ العميل من جديد
+            return None
+        return parse_range(header, size)
+
+    def _send_ranges(self, body, ranges, size, mime, encoding, negotiable, etag, last_modified):
+        """206 لمقطع واحد أو multipart/byteranges لعدة مقاطع، أو 416"""
+        if not ranges:
+            body.close()
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header('Content-Range', f'bytes */{size}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return None
+
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            partial = RangeBody(body, [body_slice(body, start, end - start + 1)])
+            content_type = mime
+        else:
+            boundary = os.urandom(12).hex()
+            parts = []
+            for start, end in ranges:
+                delimiter = '\r\n' if parts else ''
+                parts.append(f'{delimiter}--{boundary}\r\nContent-Type: {mime}\r\n'
+                             f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'.encode('latin-1'))
+                parts.append(body_slice(body, start, end - start + 1))
+            parts.append(f'\r\n--{boundary}--\r\n'.encode('latin-1'))
+            partial = RangeBody(body, parts)
+            content_type = f'multipart/byteranges; boundary={boundary}'
+
+        self.send_response(HTTPStatus.PARTIAL_CONTENT)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(partial.length))
+        if len(ranges) == 1:
+            self.send_header('Content-Range', f'bytes {ranges[0][0]}-{ranges[0][1]}/{size}')
+        self.send_header('Last-Modified', last_modified)
+        self.send_header('Accept-Ranges', 'bytes')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        if negotiable:
+            self.send_header('Vary', 'Accept-Encoding')
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        return partial
+
+    def _open_sibling(self, asset, suffix):
+        """نسخة مضغوطة مسبقاً بجانب الملف، إن كانت أحدث منه"""
+        if self.asset_store is not None:
+            sibling = self.asset_store.table.get(asset.key + suffix)
+            if sibling is not None and sibling.mtime_ns >= asset.mtime_ns:
+                return sibling.open(), sibling.size
+            return None
+        try:
+            sibling_file = open(asset.path + suffix, 'rb')
+        except OSError:
+            return None
+        sibling_stat = os.fstat(sibling_file.fileno())
+        if sibling_stat.st_mtime_ns >= asset.mtime_ns:
+            return sibling_file, sibling_stat.st_size
+        # نسخة قديمة من بناء سابق
+        sibling_file.close()
+        return None
+
+    def _compressed_variant(self, asset):
+        """
+        اختيار نسخة مضغوطة حسب Accept-Encoding
+        Pick a compressed representation: a fresh .br/.gz sibling, else the LRU cache
+
+        يعيد (encoding, file-like, length) أو None لإرسال الملف كما هو.
+        """
+        accepted = parse_accept_encoding(self.headers.get('Accept-Encoding', ''))
+        for encoding in ENCODING_PREFERENCE:
+            if accepted.get(encoding, accepted.get('*', 0)) <= 0:
+                continue
+            sibling = self._open_sibling(asset, ENCODING_SUFFIXES[encoding])
+            if sibling is not None:
+                return (encoding,) + sibling
+            if encoding in COMPRESSORS:
+                data = self.compression_cache.get(asset.path, encoding,
+                                                  (asset.mtime_ns, asset.size), asset.read)
+                if data is None:
+                    return None
+                return encoding, MemoryRegion(data), len(data)
+        return None
+
+    def copyfile(self, source, outputfile):
+        """الملفات الكبيرة تُرسل عبر sendfile دون المرور بذاكرة Python"""
+        if isinstance(source, RangeBody):
+            for part in source.parts:
+                if isinstance(part, FileRegion):
+                    self.copyfile(part, outputfile)
+                else:
+                    outputfile.write(part)
+            return
+        if isinstance(source, MemoryRegion):
+            outputfile.write(source.view)
+            return
+        if isinstance(source, FileRegion):
+            if source.length:
+                self.connection.sendfile(source, source.offset, source.length)
+            return
+        try:
+            fd = source.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            return super().copyfile(source, outputfile)
+        remaining = os.fstat(fd).st_size - source.tell()
+        if remaining < SENDFILE_MIN_SIZE:
+            return super().copyfile(source, outputfile)
+        self.connection.sendfile(source)
+
+    def _is_not_modified(self, etag, mtime):
+        """If-None-Match له الأولوية على If-Modified-Since"""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag is not None and etag_matches(if_none_match, etag)
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since is not None:
+            return not_modified_since(if_modified_since, mtime)
+        return False
+
     def end_headers(self):
-        # منع التخزين المؤقت تماماً
-        self.send_header('Cache-Control', 'no-store, no-cache, must-revalidate, max-age=0')
-        self.send_header('Pragma', 'no-cache')
-        self.send_header('Expires', '0')
-        
+        if self._cache_control:
+            # وضع التحقق: المتصفح يخزن الملف ويتحقق من حداثته قبل كل استخدام
+            self.send_header('Cache-Control', self._cache_control)
+        else:
+            # منع التخزين المؤقت تماماً
+            self.send_header('Cache-Control', NO_STORE_POLICY)
+            self.send_header('Pragma', 'no-cache')
+            self.send_header('Expires', '0')
+
         # CORS headers
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        
+
         # Frame headers
         self.send_header('X-Frame-Options', 'ALLOWALL')
         self.send_header('Content-Security-Policy', "frame-ancestors *")
-        
+
         super().end_headers()
-    
+
+    def log_request(self, code='-', size='-'):
+        # السجل يُكتب بعد انتهاء الطلب في _record_request مع زمن الاستجابة
+        self._status = code.value if isinstance(code, HTTPStatus) else code
+
     def log_message(self, format, *args):
-        """تسجيل الطلبات مع الوقت"""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        print(f"[{timestamp}] {format % args}")
+        """تسجيل الرسائل الأخرى (أخطاء، مهلات) عبر السجل غير الحاجب"""
+        if self.access_log is None:
+            return
+        self.access_log.write({'ts': time.time(), 'client': self.client_address[0],
+                               'message': format % args})
 
-if __name__ == '__main__':
-    with socketserver.TCPServer(("0.0.0.0", PORT), NoCacheHTTPRequestHandler) as httpd:
-        print(f"🚀 خادم بدون تخزين مؤقت يعمل على المنفذ {PORT}")
-        print(f"🚀 No-cache server running on port {PORT}")
+
+def make_handler(directory=None, keep_alive=True, timeout=KEEPALIVE_TIMEOUT, quiet=False,
+                 revalidate=False, compress=False, compression_cache_mb=DEFAULT_COMPRESSION_CACHE_MB,
+                 spa=False, preload=False, watch_interval=WATCH_INTERVAL,
+                 log_format='json', access_log_path='-', metrics_path=METRICS_PATH):
+    """
+    إنشاء صنف معالج بالإعدادات المطلوبة
+    Build a NoCacheHTTPRequestHandler subclass for the given options
+    """
+    attrs = {'serve_directory': directory}
+    if not quiet:
+        stream = None
+        if access_log_path and access_log_path != '-':
+            stream = open(access_log_path, 'a', encoding='utf-8', buffering=1 << 16)
+        attrs['access_log'] = AccessLog(stream, log_format)
+    if metrics_path:
+        attrs['metrics'] = Metrics()
+        attrs['metrics_path'] = metrics_path
+    if revalidate:
+        attrs['revalidate'] = True
+        attrs['etag_cache'] = ETagCache()
+    if compress:
+        attrs['compress'] = True
+        attrs['compression_cache'] = CompressionCache(int(compression_cache_mb * 1024 * 1024))
+    if spa:
+        attrs['spa'] = True
+    if preload:
+        store = AssetStore(directory or os.getcwd())
+        if watch_interval > 0:
+            store.watch(watch_interval)
+        attrs['asset_store'] = store
+    if keep_alive:
+        # HTTP/1.1 يبقي الاتصال مفتوحاً بين الطلبات، والمهلة تغلق الاتصالات الخاملة
+        attrs['protocol_version'] = 'HTTP/1.1'
+        attrs['timeout'] = timeout
+        # بدون Nagle حتى لا تتأخر الاستجابات الصغيرة على الاتصال المفتوح (delayed ACK)
+        attrs['disable_nagle_algorithm'] = True
+    return type('NoCacheHTTPRequestHandler', (NoCacheHTTPRequestHandler,), attrs)
+
+
+class BoundedThreadingHTTPServer(http.server.HTTPServer):
+    """
+    خادم يعالج الاتصالات على مجموعة محدودة من العمال
+    HTTP server that handles connections on a bounded thread pool
+
+    الاتصالات الزائدة عن عدد العمال تنتظر في الطابور حتى يتحرر عامل.
+    """
+
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers=DEFAULT_WORKERS):
+        super().__init__(server_address, handler_class)
+        self.workers = max(1, workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix='http-worker')
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process_request_worker, request, client_address)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_server(bind='0.0.0.0', port=PORT, directory=None, workers=DEFAULT_WORKERS,
+                  single_threaded=False, keepalive_timeout=KEEPALIVE_TIMEOUT, quiet=False,
+                  **handler_options):
+    """إنشاء الخادم حسب الوضع المطلوب"""
+    handler = make_handler(directory, keep_alive=not single_threaded,
+                           timeout=keepalive_timeout, quiet=quiet, **handler_options)
+    if single_threaded:
+        return socketserver.TCPServer((bind, port), handler)
+    return BoundedThreadingHTTPServer((bind, port), handler, workers=workers)
+
+
+# ========== اختبار الحمل ==========
+
+def collect_paths(directory):
+    """جمع مسارات جميع الملفات في مجلد البناء كروابط URL"""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            full = os.path.join(root, name)
+            rel = os.path.relpath(full, directory).replace(os.sep, '/')
+            paths.append('/' + quote(rel))
+    paths.sort()
+    return paths
+
+
+def percentile(sorted_values, pct):
+    """النسبة المئوية (nearest-rank) من قائمة مرتبة"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_load_test(base_url, paths, concurrency=16, total_requests=2000, headers=None):
+    """
+    تشغيل اختبار حمل: عدة عملاء متوازيين، كل عميل يعيد استخدام اتصاله
+    Fire total_requests GETs over `concurrency` keep-alive clients
+    """
+    parts = urlsplit(base_url)
+    host, port = parts.hostname, parts.port or 80
+    prefix = parts.path.rstrip('/')
+    counter = iter(range(total_requests))
+    counter_lock = threading.Lock()
+    latencies = []
+    stats = {'errors': 0, 'bytes': 0, 'connections': 0}
+    stats_lock = threading.Lock()
+
+    def next_index():
+        with counter_lock:
+            return next(counter, None)
+
+    def client():
+        local_latencies = []
+        local = {'errors': 0, 'bytes': 0, 'connections': 0}
+        conn = None
+        while True:
+            i = next_index()
+            if i is None:
+                break
+            path = prefix + paths[i % len(paths)]
+            started = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection(host, port, timeout=30)
+                    local['connections'] += 1
+                conn.request('GET', path, headers=headers or {})
+                response = conn.getresponse()
+                body = response.read()
+                local_latencies.append(time.perf_counter() - started)
+                local['bytes'] += len(body)
+                if response.status >= 400:
+                    local['errors'] += 1
+                if response.will_close:
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException):
+                local['errors'] += 1
+                if conn is not None:
+                    conn.close()
+                conn = None
+        if conn is not None:
+            conn.close()
+        with stats_lock:
+            latencies.extend(local_latencies)
+            for key, value in local.items():
+                stats[key] += value
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(max(1, concurrency))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': stats['errors'],
+        'connections': stats['connections'],
+        'bytes': stats['bytes'],
+        'elapsed': elapsed,
+        'requests_per_sec': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p90_ms': percentile(latencies, 90) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': (latencies[-1] * 1000) if latencies else 0.0,
+    }
+
+
+def print_load_test_report(report):
+    print("="*60)
+    print("📊 نتائج اختبار الحمل / Load test results")
+    print(f"   الطلبات: {report['requests']} (أخطاء: {report['errors']}، "
+          f"اتصالات: {report['connections']})")
+    print(f"   البيانات: {report['bytes'] / 1_048_576:.1f} MB في {report['elapsed']:.2f} ث")
+    print(f"   ⚡ {report['requests_per_sec']:.0f} طلب/ث")
+    print(f"   ⏱️  p50 {report['p50_ms']:.1f} ms | p90 {report['p90_ms']:.1f} ms | "
+          f"p99 {report['p99_ms']:.1f} ms | max {report['max_ms']:.1f} ms")
+    print("="*60)
+
+
+def load_test_main(args):
+    directory = args.directory or 'build/web'
+    paths = collect_paths(directory)
+    if not paths:
+        print(f"❌ لا توجد ملفات في '{directory}'")
+        return 1
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        # تشغيل خادم داخلي على منفذ عشوائي بنفس إعدادات الوضع المطلوب
+        server = create_server('127.0.0.1', 0, directory=directory, workers=args.workers,
+                               single_threaded=args.single_threaded,
+                               keepalive_timeout=args.keepalive_timeout, quiet=True,
+                               **handler_options(args))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    mode = describe_mode(args)
+    print(f"🔥 اختبار حمل على {base_url} ({len(paths)} ملف، {mode})")
+    print(f"   {args.requests} طلب عبر {args.concurrency} عميل متوازي")
+    try:
+        headers = {'Accept-Encoding': args.accept_encoding} if args.accept_encoding else None
+        report = run_load_test(base_url, paths, args.concurrency, args.requests, headers)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    print_load_test_report(report)
+    return 0
+
+
+def handler_options(args):
+    """خيارات المعالج من سطر الأوامر"""
+    return {
+        'revalidate': args.revalidate,
+        'compress': args.compress,
+        'compression_cache_mb': args.compression_cache_mb,
+        'spa': args.spa,
+        'preload': args.preload,
+        'watch_interval': args.watch_interval,
+        'log_format': args.log_format,
+        'access_log_path': args.access_log,
+        'metrics_path': args.metrics_path,
+    }
+
+
+def describe_mode(args):
+    """وصف مختصر لإعدادات الخادم"""
+    parts = ['single-threaded' if args.single_threaded else f"{args.workers} workers, keep-alive"]
+    if args.revalidate:
+        parts.append('revalidate')
+    if args.compress:
+        parts.append('gzip+br' if brotli is not None else 'gzip')
+    if args.preload:
+        parts.append('preloaded, spa')
+    elif args.spa:
+        parts.append('spa')
+    return ', '.join(parts)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='No-cache HTTP server for Flutter web builds')
+    parser.add_argument('--port', type=int, default=PORT, help=f'port to listen on (default: {PORT})')
+    parser.add_argument('--bind', default='0.0.0.0', help='address to bind (default: 0.0.0.0)')
+    parser.add_argument('--directory', default=None,
+                        help='directory to serve (default: current directory; build/web for --loadtest)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'maximum concurrent connections (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--keepalive-timeout', type=float, default=KEEPALIVE_TIMEOUT,
+                        help=f'seconds before an idle keep-alive connection is closed (default: {KEEPALIVE_TIMEOUT})')
+    parser.add_argument('--single-threaded', action='store_true',
+                        help='serve one request at a time over HTTP/1.0 (previous behaviour)')
+    parser.add_argument('--revalidate', action='store_true',
+                        help='send ETag/Last-Modified and answer 304 instead of no-store; '
+                             'content-hashed *.js/*.css/*.wasm are served as immutable')
+    parser.add_argument('--compress', action='store_true',
+                        help='negotiate Accept-Encoding: serve .br/.gz siblings or compress on first request')
+    parser.add_argument('--compression-cache-mb', type=float, default=DEFAULT_COMPRESSION_CACHE_MB,
+                        help=f'memory bound for on-the-fly compressed files (default: {DEFAULT_COMPRESSION_CACHE_MB})')
+    parser.add_argument('--spa', action='store_true',
+                        help='serve /index.html for unknown paths, like the firebase.json rewrite')
+    parser.add_argument('--preload', action='store_true',
+                        help='load the directory into an in-memory asset table at startup '
+                             '(implies SPA fallback; rebuilt when files change)')
+    parser.add_argument('--watch-interval', type=float, default=WATCH_INTERVAL,
+                        help=f'seconds between change checks in --preload mode, 0 disables (default: {WATCH_INTERVAL})')
+
+    parser.add_argument('--log-format', choices=['json', 'text'], default='json',
+                        help='access log format: JSON lines or the previous text lines (default: json)')
+    parser.add_argument('--access-log', default='-', metavar='PATH',
+                        help="access log destination, '-' for stdout (default: -)")
+    parser.add_argument('--metrics-path', default=METRICS_PATH,
+                        help=f"Prometheus metrics endpoint, '' disables (default: {METRICS_PATH})")
+
+    load = parser.add_argument_group('load test')
+    load.add_argument('--loadtest', action='store_true',
+                      help='run the built-in load test against the build/web tree and exit')
+    load.add_argument('--url', default=None,
+                      help='server to test (default: start an in-process server)')
+    load.add_argument('--concurrency', type=int, default=16, help='parallel clients (default: 16)')
+    load.add_argument('--requests', type=int, default=2000, help='total requests (default: 2000)')
+    load.add_argument('--accept-encoding', default=None, metavar='CODINGS',
+                      help="Accept-Encoding sent by the clients, e.g. 'gzip, br'")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.loadtest:
+        return load_test_main(args)
+
+    with create_server(args.bind, args.port, directory=args.directory, workers=args.workers,
+                       single_threaded=args.single_threaded,
+                       keepalive_timeout=args.keepalive_timeout,
+                       **handler_options(args)) as httpd:
+        mode = describe_mode(args)
+        print(f"🚀 خادم بدون تخزين مؤقت يعمل على المنفذ {args.port}")
+        print(f"🚀 No-cache server running on port {args.port} ({mode})")
         print(f"⏰ بدأ في: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"⏰ Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("="*60)
@@ -47,3 +1324,12 @@ if __name__ == '__main__':
         except KeyboardInterrupt:
             print("\n🛑 إيقاف الخادم...")
             print("🛑 Stopping server...")
+        finally:
+            access_log = httpd.RequestHandlerClass.access_log
+            if access_log is not None:
+                access_log.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -5,21 +5,15 @@
 Add Sample Data for Drivers and Vehicles
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
 from datetime import datetime, timedelta
+import argparse
 import random
 
-# تهيئة Firebase
-try:
-    cred = credentials.Certificate('/opt/flutter/firebase-admin-sdk.json')
-    firebase_admin.initialize_app(cred)
-    print("✅ تم تهيئة Firebase بنجاح")
-except Exception as e:
-    print(f"❌ خطأ في تهيئة Firebase: {e}")
-    exit(1)
-
-db = firestore.client()
+import firestore_session
+import profiling
+from batch_writer import BatchWriter
+from assignment import NO_VEHICLE, assign_fleet, assign_office
+from upsert import document_id, format_upsert, upsert_documents
 
 # أسماء السائقين السودانيين
 driver_names = [
@@ -65,195 +59,353 @@ capacities = {
     "شاحنة صغيرة": [500, 750, 1000, 1500],
 }
 
-def generate_phone_number():
+# تاريخ مرجعي ثابت لوضع --upsert حتى لا تتغير تواريخ الانتهاء بين التشغيلات
+SEED_EPOCH = datetime(2025, 1, 1)
+
+def generate_phone_number(rng=random):
     """توليد رقم هاتف سوداني"""
     prefixes = ["0912", "0911", "0915", "0916", "0918", "0919"]
-    return f"{random.choice(prefixes)}{random.randint(1000000, 9999999)}"
+    return f"{rng.choice(prefixes)}{rng.randint(1000000, 9999999)}"
 
-def generate_plate_number():
+def generate_plate_number(rng=random):
     """توليد رقم لوحة سودانية"""
     letters = ['أ', 'ب', 'ج', 'د', 'هـ', 'و', 'ز']
-    return f"{random.choice(letters)} {random.randint(1000, 9999)} {random.choice(letters)}"
+    return f"{rng.choice(letters)} {rng.randint(1000, 9999)} {rng.choice(letters)}"
 
-def generate_license_number():
+def generate_license_number(rng=random):
     """توليد رقم رخصة قيادة"""
-    return f"SD-{random.randint(100000, 999999)}"
+    return f"SD-{rng.randint(100000, 999999)}"
+
+def _unique(generate, used, rng):
+    """توليد قيمة لم تُستخدم بعد في هذا التشغيل (أرقام اللوحات والرخص مفاتيح طبيعية)"""
+    value = generate(rng)
+    while value in used:
+        value = generate(rng)
+    used.add(value)
+    return value
+
+def _office_rng(seed, office_id, kind):
+    """مولد أرقام خاص بكل مكتب: إضافة مكتب جديد لا تغيّر بيانات المكاتب الأخرى"""
+    return random.Random(f'{seed}-{office_id}-{kind}')
+
+def initialize_firebase():
+    """تهيئة Firebase عبر الجلسة المشتركة"""
+    try:
+        return firestore_session.get_db()
+    except Exception as e:
+        print(f"❌ خطأ في تهيئة Firebase: {e}")
+        exit(1)
+
+def load_offices(db):
+    """
+    قراءة مكاتب التوصيل مرة واحدة فقط وبناء فهرس في الذاكرة
+    Read delivery offices once and build the in-memory office index
+
+    الفهرس: office_id -> {'name', 'active_drivers', 'vehicles': [(id, data)], 'drivers': [(id, data)]}
+    """
+    index = {}
+    for office in db.collection('delivery_offices').select(['office_name', 'active_drivers']).stream():
+        data = office.to_dict() or {}
+        index[office.id] = {
+            'name': data.get('office_name', ''),
+            'active_drivers': data.get('active_drivers'),
+            'vehicles': [],
+            'drivers': [],
+        }
+    return index
 
-def add_vehicles_data():
-    """إضافة بيانات المركبات"""
+def add_vehicles_data(db, offices, upsert=False, seed=0):
+    """
+    إضافة بيانات المركبات
+
+    upsert=True: المعرّف مشتق من رقم اللوحة والبيانات محددة بالبذرة، فإعادة
+    التشغيل لا تنشئ مركبات مكررة.
+    """
     print("\n🚗 إضافة بيانات المركبات...")
     
-    # الحصول على جميع مكاتب التوصيل
-    offices_ref = db.collection('delivery_offices')
-    offices = offices_ref.stream()
-    
-    vehicles_added = 0
+    vehicles_ref = db.collection('vehicles')
+    used_plates = set()
+    records = []
+    today = SEED_EPOCH if upsert else datetime.now()
     
-    for office in offices:
-        office_id = office.id
-        office_data = office.to_dict()
-        office_name = office_data.get('office_name', '')
-        
-        # إضافة 3-5 مركبات لكل مكتب
-        num_vehicles = random.randint(3, 5)
-        print(f"   📋 إضافة {num_vehicles} مركبات لمكتب: {office_name}")
-        
-        for i in range(num_vehicles):
-            # اختيار نوع المركبة
-            vehicle_type = random.choice(vehicle_types)
-            
-            # اختيار الماركة بناءً على النوع
-            brand = random.choice(vehicle_brands[vehicle_type])
-            
-            # اختيار الموديل بناءً على الماركة
-            model = random.choice(vehicle_models[brand])
-            
-            # اختيار السعة بناءً على النوع
-            capacity = random.choice(capacities[vehicle_type])
-            
-            # توليد رقم اللوحة
-            plate_number = generate_plate_number()
+    with BatchWriter(db, label='المركبات') as writer:
+        for office_id, office in offices.items():
+            office_name = office['name']
+            rng = _office_rng(seed, office_id, 'vehicles') if upsert else random
             
-            # اختيار اللون
-            color = random.choice(colors)
+            # إضافة 3-5 مركبات لكل مكتب
+            num_vehicles = rng.randint(3, 5)
+            print(f"   📋 إضافة {num_vehicles} مركبات لمكتب: {office_name}")
             
-            # تاريخ انتهاء التأمين (سنة واحدة من الآن)
-            insurance_expiry = (datetime.now() + timedelta(days=random.randint(180, 730))).strftime('%Y-%m-%d')
-            
-            vehicle_data = {
-                'office_id': office_id,
-                'type': vehicle_type,
-                'brand': brand,
-                'model': model,
-                'plate_number': plate_number,
-                'color': color,
-                'capacity': capacity,
-                'is_active': True,
-                'insurance_expiry': insurance_expiry,
-                'created_at': firestore.SERVER_TIMESTAMP,
-            }
-            
-            # إضافة المركبة إلى Firestore
-            db.collection('vehicles').add(vehicle_data)
-            vehicles_added += 1
-            print(f"      ✅ {brand} {model} ({plate_number}) - {capacity} كجم")
+            for i in range(num_vehicles):
+                # اختيار نوع المركبة
+                vehicle_type = rng.choice(vehicle_types)
+                
+                # اختيار الماركة بناءً على النوع
+                brand = rng.choice(vehicle_brands[vehicle_type])
+                
+                # اختيار الموديل بناءً على الماركة
+                model = rng.choice(vehicle_models[brand])
+                
+                # اختيار السعة بناءً على النوع
+                capacity = rng.choice(capacities[vehicle_type])
+                
+                # توليد رقم اللوحة (فريد لأنه المفتاح الطبيعي للمركبة)
+                plate_number = _unique(generate_plate_number, used_plates, rng)
+                
+                # اختيار اللون
+                color = rng.choice(colors)
+                
+                # تاريخ انتهاء التأمين (سنة واحدة من الآن)
+                insurance_expiry = (today + timedelta(days=rng.randint(180, 730))).strftime('%Y-%m-%d')
+                
+                vehicle_data = {
+                    'office_id': office_id,
+                    'type': vehicle_type,
+                    'brand': brand,
+                    'model': model,
+                    'plate_number': plate_number,
+                    'color': color,
+                    'capacity': capacity,
+                    'is_active': True,
+                    'insurance_expiry': insurance_expiry,
+                }
+                
+                # إضافة المركبة إلى الدفعة وتسجيلها في الفهرس
+                if upsert:
+                    vehicle_id = document_id('veh', plate_number)
+                    records.append((vehicle_id, vehicle_data))
+                else:
+                    vehicle_ref = vehicles_ref.document()
+                    vehicle_id = vehicle_ref.id
+                    writer.set(vehicle_ref, {**vehicle_data,
+                                             'created_at': firestore_session.server_timestamp()})
+                office['vehicles'].append((vehicle_id, vehicle_data))
+                print(f"      ✅ {brand} {model} ({plate_number}) - {capacity} كجم")
+    
+    if upsert:
+        # الكتابة الفعلية: الجديد أو المتغير فقط، و created_at للجديد فقط
+        stats = upsert_documents(db, 'vehicles', records, label='المركبات',
+                                 on_create={'created_at': firestore_session.server_timestamp()})
+        print(f"\n✅ {format_upsert(stats)}")
+        return len(records)
     
-    print(f"\n✅ تمت إضافة {vehicles_added} مركبة بنجاح")
-    return vehicles_added
+    print(f"\n✅ تمت إضافة {writer.writes} مركبة بنجاح ({writer.summary()})")
+    return writer.writes
 
-def add_drivers_data():
-    """إضافة بيانات السائقين"""
+def add_drivers_data(db, offices, upsert=False, seed=0):
+    """إضافة بيانات السائقين (upsert=True: المعرّف مشتق من رقم الرخصة)"""
     print("\n👤 إضافة بيانات السائقين...")
     
-    # الحصول على جميع مكاتب التوصيل
-    offices_ref = db.collection('delivery_offices')
-    offices = offices_ref.stream()
-    
-    drivers_added = 0
+    drivers_ref = db.collection('drivers')
+    used_licenses = set()
+    records = []
+    today = SEED_EPOCH if upsert else datetime.now()
     
-    for office in offices:
-        office_id = office.id
-        office_data = office.to_dict()
-        office_name = office_data.get('office_name', '')
-        
-        # الحصول على مركبات هذا المكتب
-        vehicles_ref = db.collection('vehicles').where('office_id', '==', office_id)
-        vehicles = list(vehicles_ref.stream())
-        
-        if not vehicles:
-            print(f"   ⚠️ لا توجد مركبات لمكتب: {office_name}")
-            continue
-        
-        # إضافة سائق لكل مركبة + سائقين إضافيين
-        num_drivers = len(vehicles) + random.randint(0, 2)
-        print(f"   📋 إضافة {num_drivers} سائقين لمكتب: {office_name}")
-        
-        available_names = driver_names.copy()
-        random.shuffle(available_names)
-        
-        for i in range(min(num_drivers, len(available_names))):
-            driver_name = available_names[i]
-            
-            # اختيار مركبة عشوائية
-            vehicle = random.choice(vehicles)
-            vehicle_id = vehicle.id
+    with BatchWriter(db, label='السائقون') as writer:
+        for office_id, office in offices.items():
+            office_name = office['name']
+            rng = _office_rng(seed, office_id, 'drivers') if upsert else random
             
-            # توليد رقم هاتف
-            phone = generate_phone_number()
-            emergency_phone = generate_phone_number()
+            # مركبات هذا المكتب من الفهرس بدلاً من استعلام لكل مكتب
+            vehicles = office['vehicles']
             
-            # توليد رقم رخصة
-            license_number = generate_license_number()
+            if not vehicles:
+                print(f"   ⚠️ لا توجد مركبات لمكتب: {office_name}")
+                continue
             
-            # تاريخ انتهاء الرخصة (1-3 سنوات من الآن)
-            license_expiry = (datetime.now() + timedelta(days=random.randint(365, 1095))).strftime('%Y-%m-%d')
+            # إضافة سائق لكل مركبة + سائقين إضافيين
+            num_drivers = len(vehicles) + rng.randint(0, 2)
+            print(f"   📋 إضافة {num_drivers} سائقين لمكتب: {office_name}")
             
-            # تقييم عشوائي
-            rating = round(random.uniform(4.0, 5.0), 1)
+            available_names = driver_names.copy()
+            rng.shuffle(available_names)
+            office_drivers = []
             
-            # عدد عمليات التوصيل
-            total_deliveries = random.randint(50, 500)
+            for i in range(min(num_drivers, len(available_names))):
+                driver_name = available_names[i]
+                
+                # توليد رقم هاتف
+                phone = generate_phone_number(rng)
+                emergency_phone = generate_phone_number(rng)
+                
+                # توليد رقم رخصة (فريد لأنه المفتاح الطبيعي للسائق)
+                license_number = _unique(generate_license_number, used_licenses, rng)
+                
+                # تاريخ انتهاء الرخصة (1-3 سنوات من الآن)
+                license_expiry = (today + timedelta(days=rng.randint(365, 1095))).strftime('%Y-%m-%d')
+                
+                # تقييم عشوائي
+                rating = round(rng.uniform(4.0, 5.0), 1)
+                
+                # عدد عمليات التوصيل
+                total_deliveries = rng.randint(50, 500)
+                
+                driver_data = {
+                    'office_id': office_id,
+                    'full_name': driver_name,
+                    'phone': phone,
+                    'emergency_phone': emergency_phone,
+                    'license_number': license_number,
+                    'license_expiry': license_expiry,
+                    'vehicle_id': NO_VEHICLE,
+                    'is_active': True,
+                    'rating': rating,
+                    'total_deliveries': total_deliveries,
+                }
+                
+                driver_id = document_id('drv', license_number) if upsert else drivers_ref.document().id
+                office_drivers.append((driver_id, driver_data))
             
-            driver_data = {
-                'office_id': office_id,
-                'full_name': driver_name,
-                'phone': phone,
-                'emergency_phone': emergency_phone,
-                'license_number': license_number,
-                'license_expiry': license_expiry,
-                'vehicle_id': vehicle_id,
-                'is_active': True,
-                'rating': rating,
-                'total_deliveries': total_deliveries,
-                'created_at': firestore.SERVER_TIMESTAMP,
-            }
+            # توزيع المركبات: كل مركبة لسائق واحد، والباقون احتياط بدون مركبة
+            assigned = assign_office(office_drivers, vehicles, today.date())
             
-            # إضافة السائق إلى Firestore
-            db.collection('drivers').add(driver_data)
-            drivers_added += 1
-            print(f"      ✅ {driver_name} - {phone} (⭐ {rating})")
+            for driver_id, driver_data in office_drivers:
+                driver_data['vehicle_id'] = assigned[driver_id]
+                
+                # إضافة السائق إلى الدفعة وتسجيله في الفهرس
+                if upsert:
+                    records.append((driver_id, driver_data))
+                else:
+                    writer.set(drivers_ref.document(driver_id), {
+                        **driver_data, 'created_at': firestore_session.server_timestamp()})
+                office['drivers'].append((driver_id, driver_data))
+                print(f"      ✅ {driver_data['full_name']} - {driver_data['phone']} (⭐ {driver_data['rating']})")
     
-    print(f"\n✅ تمت إضافة {drivers_added} سائق بنجاح")
-    return drivers_added
+    if upsert:
+        # الكتابة الفعلية: الجديد أو المتغير فقط، و created_at للجديد فقط
+        stats = upsert_documents(db, 'drivers', records, label='السائقون',
+                                 on_create={'created_at': firestore_session.server_timestamp()})
+        print(f"\n✅ {format_upsert(stats)}")
+        return len(records)
+    
+    print(f"\n✅ تمت إضافة {writer.writes} سائق بنجاح ({writer.summary()})")
+    return writer.writes
+
+def count_active_drivers(db, office_id):
+    """عد السائقين النشطين في الخادم (aggregation) بدون تنزيل المستندات"""
+    query = (db.collection('drivers')
+             .where('office_id', '==', office_id)
+             .where('is_active', '==', True))
+    result = query.count(alias='active_drivers').get()
+    return int(result[0][0].value)
+
+def update_office_driver_counts(db, offices, count_from='aggregate'):
+    """
+    تحديث عدد السائقين في كل مكتب
 
-def update_office_driver_counts():
-    """تحديث عدد السائقين في كل مكتب"""
+    count_from='index': العد من الفهرس في الذاكرة (بدون أي قراءة إضافية)،
+    count_from='aggregate': استعلام count() في الخادم يشمل السائقين السابقين أيضاً.
+    """
     print("\n🔄 تحديث عدد السائقين في مكاتب التوصيل...")
     
     offices_ref = db.collection('delivery_offices')
-    offices = offices_ref.stream()
     
-    for office in offices:
-        office_id = office.id
-        
-        # عد السائقين النشطين
-        drivers_ref = db.collection('drivers').where('office_id', '==', office_id).where('is_active', '==', True)
-        driver_count = len(list(drivers_ref.stream()))
-        
-        # تحديث المكتب
-        offices_ref.document(office_id).update({
-            'active_drivers': driver_count
-        })
-        
-        print(f"   ✅ تم تحديث عدد السائقين: {driver_count}")
+    with BatchWriter(db, label='المكاتب') as writer:
+        for office_id, office in offices.items():
+            # عد السائقين النشطين
+            if count_from == 'index':
+                driver_count = sum(1 for _, data in office['drivers'] if data.get('is_active'))
+            else:
+                driver_count = count_active_drivers(db, office_id)
+            
+            # تحديث المكتب فقط إذا تغير العدد (القيمة الحالية مقروءة في load_offices)
+            if office.get('active_drivers') == driver_count:
+                print(f"   ℹ️  عدد السائقين بدون تغيير: {driver_count}")
+                continue
+            writer.update(offices_ref.document(office_id), {
+                'active_drivers': driver_count
+            })
+            office['active_drivers'] = driver_count
+            
+            print(f"   ✅ تم تحديث عدد السائقين: {driver_count}")
     
     print("✅ تم تحديث جميع المكاتب بنجاح")
 
-def main():
+def load_fleet(db):
+    """قراءة السائقين والمركبات الحاليين (حقول التوزيع فقط) مجمعين حسب المكتب"""
+    offices = {}
+    fields = {
+        'drivers': ['office_id', 'rating', 'license_expiry', 'is_active', 'vehicle_id'],
+        'vehicles': ['office_id', 'capacity', 'insurance_expiry', 'is_active'],
+    }
+    for collection_name, field_paths in fields.items():
+        for doc in db.collection(collection_name).select(field_paths).stream():
+            data = doc.to_dict() or {}
+            office = offices.setdefault(data.get('office_id', ''), {'drivers': [], 'vehicles': []})
+            office[collection_name].append((doc.id, data))
+    return offices
+
+def reassign_vehicles(db, today=None):
+    """
+    إعادة توزيع المركبات على السائقين الحاليين في كل المكاتب
+    وكتابة vehicle_id للسائقين الذين تغيرت مركباتهم فقط، عبر دفعات
+    """
+    print("\n🔁 إعادة توزيع المركبات على السائقين...")
+    offices = load_fleet(db)
+    assignments = assign_fleet(offices, today)
+    
+    current = {driver_id: data.get('vehicle_id', NO_VEHICLE)
+               for office in offices.values() for driver_id, data in office['drivers']}
+    drivers_ref = db.collection('drivers')
+    with BatchWriter(db, label='السائقون') as writer:
+        for driver_id, vehicle_id in assignments.items():
+            if current.get(driver_id) != vehicle_id:
+                writer.update(drivers_ref.document(driver_id), {'vehicle_id': vehicle_id})
+    
+    standby = sum(1 for vehicle_id in assignments.values() if vehicle_id == NO_VEHICLE)
+    print(f"✅ {len(offices)} مكتب، {len(assignments)} سائق ({standby} احتياط)، "
+          f"{writer.writes} تحديث ({writer.summary()})")
+    return writer.writes
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Add sample drivers and vehicles to Firestore')
+    parser.add_argument('--count-from', choices=['aggregate', 'index'], default='aggregate',
+                        help="'aggregate' counts all active drivers server-side, "
+                             "'index' counts only drivers written by this run (no extra reads)")
+    parser.add_argument('--upsert', action='store_true',
+                        help='derive IDs from plate/license numbers and write only new or changed documents')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='random seed for --upsert so reruns produce the same data (default: 0)')
+    parser.add_argument('--reassign', action='store_true',
+                        help='only re-run the driver/vehicle assignment for existing data')
+    profiling.add_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """الوظيفة الرئيسية"""
+    args = parse_args(argv)
+    with profiling.session('add_drivers_vehicles_data', args):
+        run(args)
+
+def run(args):
     print("=" * 60)
     print("🚀 بدء إضافة بيانات السائقين والمركبات")
     print("=" * 60)
     
+    db = initialize_firebase()
+    
+    if args.reassign:
+        with profiling.phase('reassign_vehicles'):
+            reassign_vehicles(db)
+        return
+    
     try:
+        # قراءة المكاتب مرة واحدة
+        with profiling.phase('load_offices'):
+            offices = load_offices(db)
+        
         # إضافة المركبات أولاً
-        vehicles_count = add_vehicles_data()
+        with profiling.phase('add_vehicles_data'):
+            vehicles_count = add_vehicles_data(db, offices, args.upsert, args.seed)
         
         # إضافة السائقين
-        drivers_count = add_drivers_data()
+        with profiling.phase('add_drivers_data'):
+            drivers_count = add_drivers_data(db, offices, args.upsert, args.seed)
         
         # تحديث عدد السائقين في المكاتب
-        update_office_driver_counts()
+        with profiling.phase('update_office_driver_counts'):
+            update_office_driver_counts(db, offices, args.count_from)
         
         print("\n" + "=" * 60)
         print("✅ تمت العملية بنجاح!")
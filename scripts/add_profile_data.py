@@ -5,48 +5,26 @@
 Add Profile Data to Firebase Firestore
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
-from datetime import datetime
+from datetime import date, timedelta
+import argparse
+import random
 import sys
+import time
+
+import firestore_session
+import profiling
+from batch_writer import BatchWriter, MAX_BATCH_SIZE, format_throughput
+from upsert import document_id, format_upsert, upsert_documents
 
 def initialize_firebase():
-    """تهيئة Firebase"""
+    """تهيئة Firebase عبر الجلسة المشتركة"""
     try:
-        # البحث عن ملف Firebase Admin SDK
-        import os
-        import glob
-        
-        # البحث في /opt/flutter/
-        firebase_files = glob.glob('/opt/flutter/*adminsdk*.json')
-        if not firebase_files:
-            firebase_files = glob.glob('/opt/flutter/firebase-*.json')
-        
-        if not firebase_files:
-            print("❌ لم يتم العثور على ملف Firebase Admin SDK")
-            return None
-        
-        firebase_key_path = firebase_files[0]
-        print(f"✅ تم العثور على ملف Firebase: {firebase_key_path}")
-        
-        # تهيئة Firebase
-        cred = credentials.Certificate(firebase_key_path)
-        
-        # التحقق من عدم تهيئة Firebase مسبقاً
-        try:
-            firebase_admin.get_app()
-            print("✅ Firebase مهيأ مسبقاً")
-        except ValueError:
-            firebase_admin.initialize_app(cred)
-            print("✅ تم تهيئة Firebase بنجاح")
-        
-        return firestore.client()
-    
+        return firestore_session.get_db()
     except Exception as e:
         print(f"❌ خطأ في تهيئة Firebase: {e}")
         return None
 
-def add_merchant_profiles(db):
+def add_merchant_profiles(db, upsert=False):
     """إضافة ملفات التجار"""
     print("\n📦 جاري إضافة ملفات التجار...")
     
@@ -129,6 +107,10 @@ def add_merchant_profiles(db):
         },
     ]
     
+    if upsert:
+        upsert_profiles(db, 'merchants', merchants)
+        return
+    
     for merchant in merchants:
         try:
             doc_ref = db.collection('merchants').add(merchant)
@@ -138,7 +120,7 @@ def add_merchant_profiles(db):
     
     print(f"✅ تمت إضافة {len(merchants)} تاجر بنجاح")
 
-def add_buyer_profiles(db):
+def add_buyer_profiles(db, upsert=False):
     """إضافة ملفات المشترين"""
     print("\n🛒 جاري إضافة ملفات المشترين...")
     
@@ -215,6 +197,10 @@ def add_buyer_profiles(db):
         },
     ]
     
+    if upsert:
+        upsert_profiles(db, 'buyers', buyers)
+        return
+    
     for buyer in buyers:
         try:
             doc_ref = db.collection('buyers').add(buyer)
@@ -224,7 +210,7 @@ def add_buyer_profiles(db):
     
     print(f"✅ تمت إضافة {len(buyers)} مشتري بنجاح")
 
-def add_delivery_office_profiles(db):
+def add_delivery_office_profiles(db, upsert=False):
     """إضافة ملفات مكاتب التوصيل"""
     print("\n🚚 جاري إضافة ملفات مكاتب التوصيل...")
     
@@ -319,6 +305,10 @@ def add_delivery_office_profiles(db):
         },
     ]
     
+    if upsert:
+        upsert_profiles(db, 'delivery_offices', delivery_offices)
+        return
+    
     for office in delivery_offices:
         try:
             doc_ref = db.collection('delivery_offices').add(office)
@@ -328,8 +318,239 @@ def add_delivery_office_profiles(db):
     
     print(f"✅ تمت إضافة {len(delivery_offices)} مكتب توصيل بنجاح")
 
-def main():
+# ========== توليد بيانات اصطناعية بحجم كبير ==========
+
+# المدن والأحياء التي يغطيها التطبيق
+CITY_DISTRICTS = {
+    'الخرطوم': ['الخرطوم', 'الخرطوم 2', 'الخرطوم 3', 'أركويت', 'الديوم', 'الرياض', 'العمارات', 'الصحافة'],
+    'أم درمان': ['أم درمان', 'أم درمان الشرقية', 'أم درمان الغربية', 'الموردة', 'الثورة', 'ود نوباوي'],
+    'بحري': ['بحري', 'بحري الشمالية', 'بحري الجنوبية', 'الخرطوم الشمالية', 'شمبات', 'الحلفايا'],
+}
+
+FIRST_NAMES = [
+    'محمد', 'أحمد', 'علي', 'عمر', 'عثمان', 'إبراهيم', 'خالد', 'يوسف', 'حسن', 'عبدالله',
+    'فاطمة', 'سارة', 'مريم', 'آمنة', 'هبة', 'نسرين', 'رحاب', 'سلمى', 'إيمان', 'منى',
+]
+FAMILY_NAMES = [
+    'محمد', 'أحمد', 'علي', 'حسن', 'محمود', 'إبراهيم', 'عبدالله', 'الأمين', 'صالح', 'الحسن',
+    'الفاتح', 'عبدالرحمن', 'عثمان', 'الطيب', 'النور',
+]
+
+STORE_TYPES = ['متجر', 'معرض', 'مكتبة', 'سوبر ماركت', 'بوتيك', 'مركز']
+STORE_NAMES = ['الفاخر', 'الأناقة', 'النور', 'الخير', 'الأمل', 'السلام', 'البركة', 'النيل', 'الوفاء', 'الزهرة']
+OFFICE_TYPES = ['للتوصيل السريع', 'للشحن والتوصيل', 'للخدمات اللوجستية', 'للتوصيل المضمون']
+OFFICE_NAMES = ['سريع', 'البرق', 'النجم الساطع', 'الأمانة', 'الصقر', 'الرواد', 'المسار', 'الوصول']
+
+CATEGORY_GROUPS = [
+    ['إلكترونيات', 'هواتف', 'حواسيب', 'ملحقات'],
+    ['ملابس', 'أزياء', 'إكسسوارات', 'أحذية'],
+    ['أدوات مكتبية', 'كتب', 'قرطاسية', 'مطبوعات'],
+    ['مواد غذائية', 'خضروات', 'فواكه', 'منتجات منزلية'],
+]
+
+MEMBERSHIP_LEVELS = [(20000, 'Platinum'), (10000, 'Gold'), (5000, 'Silver'), (0, 'Bronze')]
+# عدد المستندات بين كل سطر تقدم وآخر
+PROGRESS_EVERY = 10000
+
+WORKING_HOURS = ['7:00 صباحاً - 11:00 مساءً', '8:00 صباحاً - 10:00 مساءً',
+                 '8:00 صباحاً - 9:00 مساءً', '9:00 صباحاً - 8:00 مساءً']
+
+
+def _person_name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(FAMILY_NAMES)} {rng.choice(FAMILY_NAMES)}"
+
+
+def _phone(rng):
+    return f"+249 9{rng.randint(1, 9)} {rng.randint(100, 999)} {rng.randint(1000, 9999)}"
+
+
+def _join_date(rng):
+    return (date(2024, 1, 1) + timedelta(days=rng.randint(0, 540))).isoformat()
+
+
+def _location(rng):
+    city = rng.choice(list(CITY_DISTRICTS))
+    return city, rng.choice(CITY_DISTRICTS[city])
+
+
+def generate_merchants(count, seed=0):
+    """توليد ملفات تجار بشكل كسول (مولّد) - الذاكرة ثابتة مهما كان العدد"""
+    rng = random.Random(f'{seed}-merchants')
+    for i in range(count):
+        city, district = _location(rng)
+        total_orders = rng.randint(0, 800)
+        yield {
+            'merchant_name': f"{rng.choice(STORE_TYPES)} {rng.choice(STORE_NAMES)} {i + 1}",
+            'owner_name': _person_name(rng),
+            'email': f'merchant{seed}.{i}@seed.zahrat.sd',
+            'phone': _phone(rng),
+            'business_license': f'TRD-{seed}-{i:07d}',
+            'address': f"شارع {rng.randint(1, 60)}، مربع {rng.randint(1, 90)}، محل رقم {rng.randint(1, 120)}",
+            'city': city,
+            'district': district,
+            'profile_image': 'https://via.placeholder.com/200',
+            'store_logo': 'https://via.placeholder.com/150',
+            'rating': round(rng.uniform(3.5, 5.0), 1),
+            'total_sales': total_orders * rng.randint(150, 600),
+            'total_products': rng.randint(5, 500),
+            'total_orders': total_orders,
+            'join_date': _join_date(rng),
+            'is_verified': rng.random() < 0.8,
+            'categories': list(rng.choice(CATEGORY_GROUPS)),
+        }
+
+
+def generate_buyers(count, seed=0):
+    """توليد ملفات مشترين بشكل كسول"""
+    rng = random.Random(f'{seed}-buyers')
+    for i in range(count):
+        city, district = _location(rng)
+        total_orders = rng.randint(0, 40)
+        total_spent = float(total_orders * rng.randint(200, 1200))
+        membership = next(level for threshold, level in MEMBERSHIP_LEVELS if total_spent >= threshold)
+        yield {
+            'full_name': _person_name(rng),
+            'email': f'buyer{seed}.{i}@seed.zahrat.sd',
+            'phone': _phone(rng),
+            'city': city,
+            'district': district,
+            'profile_image': 'https://via.placeholder.com/200',
+            'total_orders': total_orders,
+            'total_spent': total_spent,
+            'loyalty_points': int(total_spent // 10),
+            'join_date': _join_date(rng),
+            'favorite_categories': rng.sample(rng.choice(CATEGORY_GROUPS), 2),
+            'membership_level': membership,
+        }
+
+
+def generate_delivery_offices(count, seed=0):
+    """توليد ملفات مكاتب توصيل بشكل كسول"""
+    rng = random.Random(f'{seed}-offices')
+    for i in range(count):
+        city = rng.choice(list(CITY_DISTRICTS))
+        coverage_areas = rng.sample(CITY_DISTRICTS[city], 4)
+        base_price = rng.randint(20, 35)
+        yield {
+            'office_name': f"{rng.choice(OFFICE_NAMES)} {rng.choice(OFFICE_TYPES)} {i + 1}",
+            'manager_name': _person_name(rng),
+            'email': f'office{seed}.{i}@seed.zahrat.sd',
+            'phone': _phone(rng),
+            'address': f"شارع {rng.randint(1, 60)}، مبنى رقم {rng.randint(1, 200)}",
+            'city': city,
+            'coverage_areas': coverage_areas,
+            'profile_image': 'https://via.placeholder.com/200',
+            'rating': round(rng.uniform(3.5, 5.0), 1),
+            'total_deliveries': rng.randint(0, 2000),
+            'active_drivers': rng.randint(3, 20),
+            'delivery_prices': {
+                area: float(base_price + 5 * rank + rng.randint(0, 4))
+                for rank, area in enumerate(coverage_areas)
+            },
+            'join_date': _join_date(rng),
+            'is_active': True,
+            'working_hours': rng.choice(WORKING_HOURS),
+        }
+
+
+# وضع --upsert: المفتاح الطبيعي وبادئة المعرّف الثابت لكل مجموعة
+NATURAL_KEYS = {
+    'merchants': ('business_license', 'mer'),
+    'buyers': ('email', 'buy'),
+    'delivery_offices': ('email', 'off'),
+}
+
+
+def with_stable_ids(collection_name, records):
+    """إرفاق معرّف ثابت مشتق من المفتاح الطبيعي بكل سجل"""
+    field, prefix = NATURAL_KEYS[collection_name]
+    for record in records:
+        yield document_id(prefix, record[field]), record
+
+
+def upsert_profiles(db, collection_name, records, batch_size=MAX_BATCH_SIZE):
+    """كتابة الملفات الجديدة أو المتغيرة فقط؛ إعادة التشغيل بدون تغيير = قراءات فقط"""
+    stats = upsert_documents(db, collection_name, with_stable_ids(collection_name, records),
+                             batch_size=batch_size)
+    print(f"✅ {format_upsert(stats)}")
+    return stats
+
+
+def write_generated(db, collection_name, records, batch_size=MAX_BATCH_SIZE, label=None):
+    """كتابة سجلات مولّدة عبر دفعات، مع طباعة التقدم والأداء"""
+    writer = BatchWriter(db, batch_size=batch_size, label=label or collection_name)
+    collection = db.collection(collection_name)
+    reported = 0
+    with writer:
+        for record in records:
+            writer.set(collection.document(), record)
+            if writer.writes - reported >= PROGRESS_EVERY:
+                reported = writer.writes
+                print(f"   ⏳ {writer.summary()}")
+    print(f"✅ {writer.summary()}")
+    return writer
+
+
+def generate_profiles(db, merchants=0, buyers=0, offices=0, seed=0, batch_size=MAX_BATCH_SIZE,
+                      upsert=False):
+    """
+    وضع التوليد: إنشاء N تاجر ومشتري ومكتب توصيل عبر دفعات
+
+    مع upsert=True تُشتق المعرّفات من المفاتيح الطبيعية ولا يُكتب إلا الجديد
+    أو المتغير. يعيد عدد السجلات المعالجة.
+    """
+    print(f"\n🧪 توليد بيانات اصطناعية (seed={seed})...")
+    started = time.perf_counter()
+    jobs = [
+        ('merchants', merchants, generate_merchants, 'التجار'),
+        ('buyers', buyers, generate_buyers, 'المشترون'),
+        ('delivery_offices', offices, generate_delivery_offices, 'مكاتب التوصيل'),
+    ]
+    total = writes = commits = 0
+    for collection_name, count, generate, label in jobs:
+        if not count:
+            continue
+        with profiling.phase(collection_name):
+            records = generate(count, seed)
+            if upsert:
+                stats = upsert_profiles(db, collection_name, records, batch_size)
+                total += stats['examined']
+                writes += stats['writes']
+                commits += stats['commits']
+            else:
+                writer = write_generated(db, collection_name, records, batch_size, label)
+                total += writer.writes
+                writes += writer.writes
+                commits += writer.commits
+    elapsed = time.perf_counter() - started
+    print(f"\n📈 {format_throughput('الإجمالي', total, elapsed, commits)}")
+    if upsert:
+        print(f"✍️  {writes} كتابة من أصل {total} سجل")
+    return total
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Add profile data to Firestore')
+    parser.add_argument('--generate', action='store_true',
+                        help='generate synthetic profiles instead of the fixed sample set')
+    parser.add_argument('--merchants', type=int, default=1000, help='merchants to generate (default: 1000)')
+    parser.add_argument('--buyers', type=int, default=10000, help='buyers to generate (default: 10000)')
+    parser.add_argument('--offices', type=int, default=100, help='delivery offices to generate (default: 100)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for reproducible data (default: 0)')
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE,
+                        help=f'writes per batch commit, max {MAX_BATCH_SIZE}')
+    parser.add_argument('--upsert', action='store_true',
+                        help='use stable IDs from natural keys and write only new or changed documents')
+    profiling.add_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """الوظيفة الرئيسية"""
+    args = parse_args(argv)
+    with profiling.session('add_profile_data', args):
+        run(args)
+
+def run(args):
     print("=" * 60)
     print("🔥 إضافة بيانات الملفات الشخصية إلى Firebase")
     print("=" * 60)
@@ -340,10 +561,19 @@ def main():
         print("❌ فشل تهيئة Firebase. الخروج...")
         sys.exit(1)
     
+    if args.generate:
+        generate_profiles(db, args.merchants, args.buyers, args.offices, args.seed, args.batch_size,
+                          upsert=args.upsert)
+        print("\n🎉 تم توليد البيانات بنجاح!")
+        return
+    
     # إضافة البيانات
-    add_merchant_profiles(db)
-    add_buyer_profiles(db)
-    add_delivery_office_profiles(db)
+    with profiling.phase('merchants'):
+        add_merchant_profiles(db, args.upsert)
+    with profiling.phase('buyers'):
+        add_buyer_profiles(db, args.upsert)
+    with profiling.phase('delivery_offices'):
+        add_delivery_office_profiles(db, args.upsert)
     
     print("\n" + "=" * 60)
     print("✅ تمت إضافة جميع البيانات بنجاح!")
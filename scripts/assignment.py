@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+توزيع السائقين على المركبات داخل كل مكتب
+Capacity-aware one-to-one driver/vehicle assignment
+
+لكل مكتب تُبنى مصفوفة تكلفة (سائق × مركبة) ويُحل التوزيع الأمثل بخوارزمية
+المجري (Hungarian)، فلا تبقى مركبة صالحة بدون سائق ولا تُحجز مركبة لسائقين.
+السائق ذو التقييم الأعلى يحصل على المركبة الأكبر سعة، وتُفضّل الأزواج التي
+تبقى رخصتها وتأمينها ساريين مدة أطول. الرخص والتأمينات المنتهية تُستبعد.
+
+المصفوفات صغيرة (3-7 لكل مكتب)، لذلك الحل بلغة Python الخالصة يعالج آلاف
+المكاتب في ثوانٍ بدون numpy.
+"""
+
+from datetime import date
+
+# السائقون بدون مركبة: نفس القيمة الافتراضية التي يقرؤها التطبيق
+NO_VEHICLE = ''
+
+# وزن مدة الصلاحية المتبقية مقارنة بتوافق التقييم والسعة
+EXPIRY_WEIGHT = 0.25
+EXPIRY_HORIZON_DAYS = 365
+
+
+def _days_until(value, today):
+    """عدد الأيام حتى تاريخ الانتهاء ('YYYY-MM-DD')؛ None إذا لم يُعرف"""
+    if not value:
+        return None
+    try:
+        return (date.fromisoformat(value[:10]) - today).days
+    except (TypeError, ValueError):
+        return None
+
+
+def _usable(data, expiry_field, today):
+    """نشط وتاريخ انتهائه لم يمض؛ يعيد الأيام المتبقية أو None إذا لم يكن صالحاً"""
+    if not data.get('is_active', True):
+        return None
+    days = _days_until(data.get(expiry_field), today)
+    if days is None:
+        return EXPIRY_HORIZON_DAYS
+    return days if days >= 0 else None
+
+
+def hungarian(cost):
+    """
+    أقل تكلفة لتوزيع الصفوف على الأعمدة (عدد الصفوف <= عدد الأعمدة)
+    Minimum-cost assignment; returns the column chosen for each row
+    """
+    rows = len(cost)
+    if rows == 0:
+        return []
+    cols = len(cost[0])
+    inf = float('inf')
+    u = [0.0] * (rows + 1)
+    v = [0.0] * (cols + 1)
+    match = [0] * (cols + 1)     # match[col] = الصف (مرقّم من 1)
+    way = [0] * (cols + 1)
+    for row in range(1, rows + 1):
+        match[0] = row
+        col0 = 0
+        min_v = [inf] * (cols + 1)
+        used = [False] * (cols + 1)
+        while True:
+            used[col0] = True
+            row0 = match[col0]
+            delta = inf
+            col1 = 0
+            cost_row = cost[row0 - 1]
+            u_row0 = u[row0]
+            for col in range(1, cols + 1):
+                if not used[col]:
+                    current = cost_row[col - 1] - u_row0 - v[col]
+                    if current < min_v[col]:
+                        min_v[col] = current
+                        way[col] = col0
+                    if min_v[col] < delta:
+                        delta = min_v[col]
+                        col1 = col
+            for col in range(cols + 1):
+                if used[col]:
+                    u[match[col]] += delta
+                    v[col] -= delta
+                else:
+                    min_v[col] -= delta
+            col0 = col1
+            if match[col0] == 0:
+                break
+        while col0:
+            col1 = way[col0]
+            match[col0] = match[col1]
+            col0 = col1
+
+    result = [None] * rows
+    for col in range(1, cols + 1):
+        if match[col]:
+            result[match[col] - 1] = col - 1
+    return result
+
+
+def assign_office(drivers, vehicles, today=None):
+    """
+    توزيع مكتب واحد: drivers و vehicles قوائم (id, data)
+    Return {driver_id: vehicle_id or NO_VEHICLE}
+    """
+    today = today or date.today()
+    result = {driver_id: NO_VEHICLE for driver_id, _ in drivers}
+
+    # خصائص كل سائق ومركبة تُحسب مرة واحدة، ثم تُركّب منها مصفوفة التكلفة.
+    # الترتيب بالمعرّف يجعل النتيجة ثابتة عند تساوي التكلفة مهما كان ترتيب القراءة
+    driver_features = []
+    for driver_id, data in sorted(drivers, key=lambda item: item[0]):
+        days = _usable(data, 'license_expiry', today)
+        if days is not None:
+            driver_features.append((driver_id, float(data.get('rating') or 0) / 5.0,
+                                    min(days, EXPIRY_HORIZON_DAYS)))
+    vehicle_features = []
+    for vehicle_id, data in sorted(vehicles, key=lambda item: item[0]):
+        days = _usable(data, 'insurance_expiry', today)
+        if days is not None:
+            vehicle_features.append((vehicle_id, float(data.get('capacity') or 0),
+                                     min(days, EXPIRY_HORIZON_DAYS)))
+    if not driver_features or not vehicle_features:
+        return result
+
+    max_capacity = max(capacity for _, capacity, _ in vehicle_features) or 1.0
+    scale = EXPIRY_WEIGHT / EXPIRY_HORIZON_DAYS
+    cost = [[-(rating * capacity / max_capacity + scale * min(d_days, v_days))
+             for _, capacity, v_days in vehicle_features]
+            for _, rating, d_days in driver_features]
+
+    # الخوارزمية تتطلب صفوفاً أقل من الأعمدة أو مساوية لها
+    if len(driver_features) <= len(vehicle_features):
+        for (driver_id, _, _), col in zip(driver_features, hungarian(cost)):
+            result[driver_id] = vehicle_features[col][0]
+    else:
+        transposed = [list(column) for column in zip(*cost)]
+        for (vehicle_id, _, _), row in zip(vehicle_features, hungarian(transposed)):
+            result[driver_features[row][0]] = vehicle_id
+    return result
+
+
+def assign_fleet(offices, today=None):
+    """
+    توزيع كل المكاتب
+    offices: {office_id: {'drivers': [(id, data)], 'vehicles': [(id, data)]}}
+    """
+    today = today or date.today()
+    assignments = {}
+    for office in offices.values():
+        assignments.update(assign_office(office['drivers'], office['vehicles'], today))
+    return assignments
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+كاتب دفعات Firestore مع إحصائيات الأداء
+Batched Firestore writer with throughput statistics
+"""
+
+import time
+
+# الحد الأقصى لعمليات الكتابة في دفعة واحدة في Firestore
+MAX_BATCH_SIZE = 500
+
+
+class BatchWriter:
+    """
+    يجمع عمليات الكتابة ويرسلها كدفعات بدلاً من طلب لكل مستند
+
+    Usage:
+        with BatchWriter(db) as writer:
+            for data in records:
+                writer.set(db.collection('buyers').document(), data)
+        print(writer.summary())
+    """
+
+    def __init__(self, db, batch_size=MAX_BATCH_SIZE, label='writes'):
+        self.db = db
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        self.label = label
+        self.writes = 0
+        self.commits = 0
+        self._batch = None
+        self._pending = 0
+        self._started = None
+        self._finished = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        self._finished = time.perf_counter()
+        return False
+
+    def _current_batch(self):
+        if self._started is None:
+            self._started = time.perf_counter()
+        if self._batch is None:
+            self._batch = self.db.batch()
+        return self._batch
+
+    def _after_write(self):
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def set(self, ref, data, merge=False):
+        self._current_batch().set(ref, data, merge=merge)
+        self._after_write()
+
+    def update(self, ref, data):
+        self._current_batch().update(ref, data)
+        self._after_write()
+
+    def delete(self, ref):
+        self._current_batch().delete(ref)
+        self._after_write()
+
+    def flush(self):
+        """إرسال الدفعة الحالية إن وجدت"""
+        if self._batch is None or self._pending == 0:
+            return
+        self._batch.commit()
+        self.commits += 1
+        self.writes += self._pending
+        self._batch = None
+        self._pending = 0
+
+    @property
+    def elapsed(self):
+        if self._started is None:
+            return 0.0
+        end = self._finished if self._finished is not None else time.perf_counter()
+        return end - self._started
+
+    @property
+    def rate(self):
+        elapsed = self.elapsed
+        return self.writes / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        return format_throughput(self.label, self.writes, self.elapsed, self.commits)
+
+
+def format_throughput(label, count, elapsed, commits=None):
+    """تنسيق سطر ملخص الأداء"""
+    rate = count / elapsed if elapsed > 0 else 0.0
+    line = f"{label}: {count} في {elapsed:.2f} ث ({rate:.0f}/ث)"
+    if commits is not None:
+        line += f"، {commits} دفعة"
+    return line
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس أداء سكربتات البيانات بدون شبكة
+Offline benchmarks for the seed and cleanup scripts
+
+يشغّل add_profile_data و add_drivers_vehicles_data و cleanup_test_data على
+FakeFirestore بعدة أحجام، ويسجل المستندات/ث وعدد طلبات RPC وذروة الذاكرة.
+عدد الطلبات ثابت لنفس البذرة، لذلك أي استعلام جديد لكل مستند يظهر فوراً
+عند المقارنة مع --baseline.
+
+    python scripts/benchmark_scripts.py --sizes 1000,10000 --json bench.json
+    python scripts/benchmark_scripts.py --baseline bench.json --latency-ms 2
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, os.path.dirname(SCRIPTS_DIR))
+
+import firestore_session
+from fake_firestore import FakeFirestore
+
+import add_drivers_vehicles_data
+import add_profile_data
+import cleanup_test_data
+import geohash_index
+import ttl_sweeper
+
+DEFAULT_SIZES = (1000, 10000)
+DEFAULT_TOLERANCE = 0.25
+
+
+# ---------------------------------------------------------------------------
+# السيناريوهات: setup(db, size, seed) ثم run(db, size, seed) -> عدد المستندات
+# ---------------------------------------------------------------------------
+
+def _seed_offices(db, size, seed):
+    count = max(1, size // 10)
+    offices = add_profile_data.generate_delivery_offices(count, seed)
+    db.load('delivery_offices', ((f'office-{i:06d}', data) for i, data in enumerate(offices)))
+
+
+def _run_profiles(db, size, seed):
+    return add_profile_data.generate_profiles(
+        db, merchants=max(1, size // 10), buyers=size, offices=max(1, size // 100), seed=seed)
+
+
+def _run_profiles_upsert(db, size, seed):
+    return add_profile_data.generate_profiles(
+        db, merchants=max(1, size // 10), buyers=size, offices=max(1, size // 100), seed=seed,
+        upsert=True)
+
+
+def _seed_profiles_upsert(db, size, seed):
+    # تشغيل أول غير مقاس؛ القياس لإعادة التشغيل التي يجب ألا تكتب شيئاً
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        _run_profiles_upsert(db, size, seed)
+    db.stats.reset()
+
+
+def _run_drivers(count_from):
+    def run(db, size, seed):
+        random.seed(seed)
+        offices = add_drivers_vehicles_data.load_offices(db)
+        vehicles = add_drivers_vehicles_data.add_vehicles_data(db, offices)
+        drivers = add_drivers_vehicles_data.add_drivers_data(db, offices)
+        add_drivers_vehicles_data.update_office_driver_counts(db, offices, count_from)
+        return vehicles + drivers + len(offices)
+    return run
+
+
+def _seed_cleanup(db, size, seed):
+    rng = random.Random(seed)
+    half = size // 2
+    db.load('notifications', ((f'n{i:07d}', {'title': 'إشعار', 'read': rng.random() < 0.5})
+                              for i in range(half)))
+    chats = max(1, half // 20)
+    for c in range(chats):
+        db.load(f'chats/chat{c:05d}/messages',
+                ((f'm{i:04d}', {'text': 'مرحبا', 'sender': f'u{rng.randint(0, 99)}'})
+                 for i in range(half // chats)))
+
+
+def _run_cleanup(db, size, seed):
+    results = cleanup_test_data.purge_collections(db, ['notifications', 'chats'], workers=4)
+    return sum(r['deleted'] for r in results)
+
+
+def _seed_notifications_aged(db, size, seed):
+    # الشكلان اللذان يكتبهما التطبيق: timestamp (notifications_system) و
+    # created_at (merchant_order_confirmation)، بأعمار بين يوم و60 يوماً
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+
+    def notification(i):
+        field = 'timestamp' if i % 2 else 'created_at'
+        return {'title': 'إشعار', 'is_read': False, field: now - timedelta(days=rng.uniform(1, 60))}
+
+    db.load('notifications', ((f'n{i:07d}', notification(i)) for i in range(size)))
+
+
+def _run_ttl_sweep(db, size, seed):
+    results = ttl_sweeper.sweep(db, {'notifications': ttl_sweeper.TTL_RULES['notifications']})
+    return sum(r['deleted'] for r in results)
+
+
+def _seed_drivers_located(db, size, seed):
+    # أسطول موزع على نحو 60×60 كم حول الخرطوم
+    rng = random.Random(seed)
+    db.load('drivers', ((f'driver-{i:06d}', {'name': f'سائق {i}', 'is_active': rng.random() < 0.8,
+                                            'latitude': 15.55 + rng.uniform(-0.27, 0.27),
+                                            'longitude': 32.53 + rng.uniform(-0.27, 0.27)})
+                        for i in range(size)))
+
+
+def _seed_drivers_indexed(db, size, seed):
+    _seed_drivers_located(db, size, seed)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        geohash_index.index_collection(db, 'drivers', 'updated_at')
+    db.stats.reset()
+
+
+def _run_geo_backfill(db, size, seed):
+    return geohash_index.index_collection(db, 'drivers', 'updated_at')['updated']
+
+
+def _run_nearby(search):
+    # 20 بحثاً بنصف قطر 2 كم؛ المقارنة بين geo-nearby و geo-scan في عمود reads
+    def run(db, size, seed):
+        rng = random.Random(seed)
+        found = 0
+        for _ in range(20):
+            lat, lng = 15.55 + rng.uniform(-0.2, 0.2), 32.53 + rng.uniform(-0.2, 0.2)
+            found += len(search(db, 'drivers', lat, lng, 2000))
+        return found
+    return run
+
+
+SCENARIOS = {
+    'profiles': (None, _run_profiles),
+    'profiles-rerun': (_seed_profiles_upsert, _run_profiles_upsert),
+    'drivers': (_seed_offices, _run_drivers('aggregate')),
+    'drivers-index': (_seed_offices, _run_drivers('index')),
+    'cleanup': (_seed_cleanup, _run_cleanup),
+    'ttl-sweep': (_seed_notifications_aged, _run_ttl_sweep),
+    'geo-backfill': (_seed_drivers_located, _run_geo_backfill),
+    'geo-nearby': (_seed_drivers_indexed, _run_nearby(geohash_index.nearby)),
+    'geo-scan': (_seed_drivers_indexed, _run_nearby(geohash_index.nearby_by_scan)),
+}
+
+
+# ---------------------------------------------------------------------------
+# التشغيل والقياس
+# ---------------------------------------------------------------------------
+
+def _fresh_db(scenario, size, seed, latency):
+    setup, _ = SCENARIOS[scenario]
+    db = FakeFirestore(latency=latency, seed=seed)
+    # قبل setup، فالتهيئة التي تستدعي server_timestamp() تجد العميل البديل
+    firestore_session.set_client(db, 'fake')
+    if setup:
+        setup(db, size, seed)
+    return db
+
+
+def run_scenario(scenario, size, seed=0, latency=0.0, measure_memory=True):
+    """
+    تشغيل سيناريو واحد ويعيد قاموس النتائج
+
+    يُقاس الزمن في تشغيل أول بدون tracemalloc، ثم تُقاس ذروة الذاكرة في
+    تشغيل ثانٍ على بيانات جديدة حتى لا يؤثر التتبع على الزمن.
+    """
+    _, run = SCENARIOS[scenario]
+    db = _fresh_db(scenario, size, seed, latency)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        docs = run(db, size, seed)
+        elapsed = time.perf_counter() - started
+    result = {
+        'scenario': scenario,
+        'size': size,
+        'docs': docs,
+        'elapsed': elapsed,
+        'docs_per_sec': docs / elapsed if elapsed > 0 else 0.0,
+        **db.stats.snapshot(),
+    }
+
+    if measure_memory:
+        db = _fresh_db(scenario, size, seed, 0.0)
+        tracemalloc.start()
+        try:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                run(db, size, seed)
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        finally:
+            tracemalloc.stop()
+    firestore_session.reset()
+    return result
+
+
+def compare_with_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """قائمة رسائل التراجع مقارنة بنتائج سابقة"""
+    previous = {(r['scenario'], r['size']): r for r in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get((result['scenario'], result['size']))
+        if old is None:
+            continue
+        name = f"{result['scenario']}@{result['size']}"
+        if result['rpcs'] > old['rpcs']:
+            regressions.append(f"{name}: RPCs {old['rpcs']} -> {result['rpcs']}")
+        for counter in ('reads', 'writes'):
+            if result[counter] > old[counter]:
+                regressions.append(f"{name}: {counter} {old[counter]} -> {result[counter]}")
+        if result['docs_per_sec'] < old['docs_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: {old['docs_per_sec']:.0f} -> "
+                               f"{result['docs_per_sec']:.0f} docs/s")
+    return regressions
+
+
+def print_report(results):
+    header = (f"{'scenario':<15} {'size':>7} {'docs':>7} {'sec':>7} {'docs/s':>9} "
+              f"{'rpcs':>6} {'queries':>7} {'aggs':>6} {'commits':>7} {'reads':>7} {'writes':>7} {'peak MB':>8}")
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        peak = f"{r['peak_mb']:.1f}" if 'peak_mb' in r else '-'
+        print(f"{r['scenario']:<15} {r['size']:>7} {r['docs']:>7} {r['elapsed']:>7.2f} "
+              f"{r['docs_per_sec']:>9.0f} {r['rpcs']:>6} {r['queries']:>7} {r['aggregations']:>6} "
+              f"{r['commits']:>7} {r['reads']:>7} {r['writes']:>7} {peak:>8}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Firestore scripts against an in-process fake')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated data sizes (default: %(default)s)')
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS),
+                        help='scenarios to run (default: all)')
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help='simulated latency added to every RPC (default: 0)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--json', metavar='PATH', help='write results to a JSON file')
+    parser.add_argument('--baseline', metavar='PATH',
+                        help='compare with an earlier --json file and exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed docs/s drop against the baseline (default: %(default)s)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+
+    print(f"📊 قياس أداء السكربتات (تأخير {args.latency_ms:g} مللي ث لكل RPC)")
+    results = []
+    for scenario in args.scenarios:
+        for size in sizes:
+            print(f"   ⏳ {scenario} @ {size}...", flush=True)
+            results.append(run_scenario(scenario, size, args.seed, args.latency_ms / 1000,
+                                        measure_memory=not args.no_memory))
+    print()
+    print_report(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 تم حفظ النتائج في {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\n❌ تراجع في الأداء:")
+            for line in regressions:
+                print(f"   - {line}")
+            sys.exit(1)
+        print("\n✅ لا يوجد تراجع مقارنة بالنتائج السابقة")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+فهرس أسعار التوصيل حسب الحي
+Materialised district -> delivery office pricing index
+
+كل حي له مستند واحد district_offices/{الحي} يحتوي مكاتب التوصيل التي
+تغطيه مرتبة حسب السعر ثم التقييم، مع الحقول التي تحتاجها شاشة اختيار
+المكتب. اختيار مكتب لحي = قراءة مستند واحد بدلاً من مسح كل المكاتب.
+
+    python scripts/district_pricing_index.py                  # إعادة بناء كاملة
+    python scripts/district_pricing_index.py --offices ID ... # تحديث مكاتب محددة
+    python scripts/district_pricing_index.py --watch          # تحديث تلقائي عند تغير مكتب
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+import firestore_session
+import profiling
+from batch_writer import BatchWriter, MAX_BATCH_SIZE
+from upsert import format_upsert, upsert_documents
+
+INDEX_COLLECTION = 'district_offices'
+OFFICES_COLLECTION = 'delivery_offices'
+
+# الحقول المقروءة من مستندات المكاتب
+OFFICE_FIELDS = [
+    'office_name', 'city', 'coverage_areas', 'delivery_prices', 'rating',
+    'active_drivers', 'total_deliveries', 'phone', 'profile_image',
+    'working_hours', 'is_active',
+]
+
+# حد Firestore لعدد القيم في array-contains-any
+ARRAY_CONTAINS_ANY_LIMIT = 30
+
+WATCH_INTERVAL = 5.0
+
+
+def district_doc_id(district):
+    """معرّف مستند الحي هو اسمه نفسه ('/' غير مسموح في المعرّفات)"""
+    return district.strip().replace('/', '_')
+
+
+def office_entries(office_id, data):
+    """مدخلات المكتب لكل حي يغطيه: {district: entry}؛ المكاتب غير النشطة لا تظهر"""
+    if not data or not data.get('is_active', True):
+        return {}
+    prices = data.get('delivery_prices') or {}
+    entries = {}
+    for district in data.get('coverage_areas') or []:
+        price = prices.get(district)
+        entries[district] = {
+            'office_id': office_id,
+            'office_name': data.get('office_name', ''),
+            'city': data.get('city', ''),
+            'price': float(price) if price is not None else None,
+            'rating': float(data.get('rating') or 0),
+            'active_drivers': data.get('active_drivers', 0),
+            'total_deliveries': data.get('total_deliveries', 0),
+            'phone': data.get('phone', ''),
+            'profile_image': data.get('profile_image'),
+            'working_hours': data.get('working_hours', ''),
+        }
+    return entries
+
+
+def _entry_order(entry):
+    # الأرخص أولاً، ثم الأعلى تقييماً؛ المكاتب بدون سعر لهذا الحي في النهاية
+    price = entry['price']
+    return (price is None, price or 0.0, -entry['rating'], entry['office_name'], entry['office_id'])
+
+
+def build_district_doc(district, entries):
+    offices = sorted(entries, key=_entry_order)
+    prices = [e['price'] for e in offices if e['price'] is not None]
+    return {
+        'district': district,
+        'offices': offices,
+        'office_ids': [e['office_id'] for e in offices],
+        'office_count': len(offices),
+        'min_price': min(prices) if prices else None,
+    }
+
+
+def _write_districts(db, districts, batch_size):
+    """كتابة مستندات الأحياء المتغيرة فقط وحذف الأحياء التي لم يعد يغطيها أحد"""
+    records = [(district_doc_id(d), build_district_doc(d, entries))
+               for d, entries in districts.items() if entries]
+    stats = upsert_documents(db, INDEX_COLLECTION, records, batch_size=batch_size,
+                             on_create={'created_at': firestore_session.server_timestamp()},
+                             label='الأحياء')
+    empty = [d for d, entries in districts.items() if not entries]
+    with BatchWriter(db, batch_size=batch_size) as writer:
+        for district in empty:
+            writer.delete(db.collection(INDEX_COLLECTION).document(district_doc_id(district)))
+    stats['deleted'] = len(empty)
+    return stats
+
+
+def rebuild_index(db, batch_size=MAX_BATCH_SIZE):
+    """إعادة بناء كاملة: قراءة كل المكاتب مرة واحدة (الحقول المطلوبة فقط)"""
+    districts = {}
+    offices = 0
+    for snapshot in db.collection(OFFICES_COLLECTION).select(OFFICE_FIELDS).stream():
+        offices += 1
+        for district, entry in office_entries(snapshot.id, snapshot.to_dict()).items():
+            districts.setdefault(district, []).append(entry)
+
+    # الأحياء الموجودة في الفهرس ولم تعد مغطاة تُحذف
+    for snapshot in db.collection(INDEX_COLLECTION).select(['district']).stream():
+        district = (snapshot.to_dict() or {}).get('district', snapshot.id)
+        districts.setdefault(district, [])
+
+    stats = _write_districts(db, districts, batch_size)
+    stats['offices'] = offices
+    return stats
+
+
+def update_offices(db, office_ids, batch_size=MAX_BATCH_SIZE):
+    """
+    تحديث تدريجي لمكاتب محددة
+
+    يقرأ المكاتب المتغيرة، والأحياء التي تظهر فيها حالياً (array-contains-any
+    على office_ids)، والأحياء التي صارت تغطيها، ثم يعيد ترتيب تلك الأحياء فقط.
+    """
+    office_ids = sorted(set(office_ids))
+    offices_ref = db.collection(OFFICES_COLLECTION)
+    new_entries = {}
+    for snapshot in db.get_all([offices_ref.document(i) for i in office_ids], field_paths=OFFICE_FIELDS):
+        new_entries[snapshot.id] = office_entries(snapshot.id, snapshot.to_dict() if snapshot.exists else None)
+
+    index_ref = db.collection(INDEX_COLLECTION)
+    current = {}
+    for start in range(0, len(office_ids), ARRAY_CONTAINS_ANY_LIMIT):
+        group = office_ids[start:start + ARRAY_CONTAINS_ANY_LIMIT]
+        for snapshot in index_ref.where('office_ids', 'array-contains-any', group).stream():
+            current[snapshot.id] = snapshot.to_dict()
+
+    # الأحياء التي صار المكتب يغطيها ولم يكن فيها: نحتاج بقية مكاتبها أيضاً
+    wanted = {district_doc_id(d) for entries in new_entries.values() for d in entries}
+    missing = [index_ref.document(doc_id) for doc_id in wanted if doc_id not in current]
+    for snapshot in db.get_all(missing):
+        if snapshot.exists:
+            current[snapshot.id] = snapshot.to_dict()
+
+    changed = set(office_ids)
+    districts = {
+        doc['district']: [e for e in doc.get('offices', []) if e['office_id'] not in changed]
+        for doc in current.values()
+    }
+    for entries in new_entries.values():
+        for district, entry in entries.items():
+            districts.setdefault(district, []).append(entry)
+
+    stats = _write_districts(db, districts, batch_size)
+    stats['offices'] = len(office_ids)
+    return stats
+
+
+def watch_offices(db, interval=WATCH_INTERVAL, batch_size=MAX_BATCH_SIZE):
+    """الاستماع لتغييرات المكاتب وتحديث الأحياء المتأثرة كل interval ثانية"""
+    changed = set()
+    lock = threading.Lock()
+    initial = threading.Event()
+
+    def on_snapshot(collection_snapshot, changes, read_time):
+        # أول إشعار يحتوي كل المكاتب الحالية، وقد غطته إعادة البناء الكاملة
+        if not initial.is_set():
+            initial.set()
+            return
+        with lock:
+            changed.update(change.document.id for change in changes)
+
+    watch = db.collection(OFFICES_COLLECTION).on_snapshot(on_snapshot)
+    print(f"👀 مراقبة {OFFICES_COLLECTION} (كل {interval:g} ث)... Ctrl+C للإيقاف")
+    try:
+        while True:
+            time.sleep(interval)
+            with lock:
+                office_ids = list(changed)
+                changed.clear()
+            if office_ids:
+                stats = update_offices(db, office_ids, batch_size)
+                print(f"   🔄 {len(office_ids)} مكتب متغير: {format_upsert(stats)}، {stats['deleted']} حي محذوف")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watch.unsubscribe()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Build the district -> delivery office pricing index')
+    parser.add_argument('--offices', nargs='+', metavar='ID',
+                        help='update only these offices instead of a full rebuild')
+    parser.add_argument('--watch', action='store_true',
+                        help='after the rebuild, keep the index updated as offices change')
+    parser.add_argument('--interval', type=float, default=WATCH_INTERVAL,
+                        help=f'seconds between incremental updates in --watch mode (default: {WATCH_INTERVAL:g})')
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE,
+                        help=f'writes per batch commit, max {MAX_BATCH_SIZE}')
+    profiling.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with profiling.session('district_pricing_index', args):
+        run(args)
+
+
+def run(args):
+    try:
+        db = firestore_session.get_db()
+    except Exception as e:
+        print(f"❌ خطأ في الاتصال بـ Firebase: {e}")
+        sys.exit(1)
+
+    if args.offices:
+        print(f"🔄 تحديث {len(args.offices)} مكتب في فهرس الأحياء...")
+        with profiling.phase('update_offices'):
+            stats = update_offices(db, args.offices, args.batch_size)
+    else:
+        print("🏗️  إعادة بناء فهرس الأحياء من كل المكاتب...")
+        with profiling.phase('rebuild_index'):
+            stats = rebuild_index(db, args.batch_size)
+    print(f"✅ {stats['offices']} مكتب → {format_upsert(stats)}، {stats['deleted']} حي محذوف")
+
+    if args.watch:
+        watch_offices(db, args.interval, args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,748 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+عميل Firestore بديل داخل الذاكرة لقياس أداء السكربتات بدون شبكة
+In-process Firestore stand-in that counts RPCs and can inject latency
+
+يغطي الجزء من واجهة google-cloud-firestore الذي تستخدمه سكربتات الإدارة:
+المجموعات والمستندات والاستعلامات (where / select / order_by / limit /
+start_after / recursive) والدفعات و get_all و count() و get_partitions(). كل طلب RPC
+يُحسب في FakeFirestore.stats، ويمكن إضافة تأخير ثابت لكل طلب لمحاكاة الشبكة.
+"""
+
+import copy
+import functools
+import random
+import string
+import threading
+import time
+from datetime import datetime, timezone
+
+# الحد الأقصى لعمليات الكتابة في دفعة واحدة، كما في Firestore
+MAX_BATCH_WRITES = 500
+
+_AUTO_ID_CHARS = string.ascii_letters + string.digits
+
+
+class _Sentinel:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+SERVER_TIMESTAMP = _Sentinel('SERVER_TIMESTAMP')
+DELETE_FIELD = _Sentinel('DELETE_FIELD')
+
+
+class Increment:
+    """مثل firestore.Increment: إضافة قيمة إلى حقل رقمي عند الكتابة"""
+
+    def __init__(self, value):
+        self.value = value
+
+
+class NotFound(Exception):
+    pass
+
+
+class Conflict(Exception):
+    pass
+
+
+class RpcStats:
+    """عدادات طلبات RPC وعدد المستندات المقروءة والمكتوبة"""
+
+    FIELDS = ('queries', 'lookups', 'aggregations', 'commits', 'reads', 'writes')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            for name in self.FIELDS:
+                setattr(self, name, 0)
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    @property
+    def rpcs(self):
+        return self.queries + self.lookups + self.aggregations + self.commits
+
+    def snapshot(self):
+        with self._lock:
+            data = {name: getattr(self, name) for name in self.FIELDS}
+        data['rpcs'] = data['queries'] + data['lookups'] + data['aggregations'] + data['commits']
+        return data
+
+
+# ---------------------------------------------------------------------------
+# ترتيب القيم ومقارنتها (نفس ترتيب الأنواع في Firestore)
+# ---------------------------------------------------------------------------
+
+def _type_rank(value):
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, datetime):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, DocumentReference):
+        return 6
+    if isinstance(value, (list, tuple)):
+        return 8
+    return 9
+
+
+def compare_values(a, b):
+    rank_a, rank_b = _type_rank(a), _type_rank(b)
+    if rank_a != rank_b:
+        return -1 if rank_a < rank_b else 1
+    if rank_a == 6:
+        a, b = a.path, b.path
+    elif rank_a == 9:
+        a, b = repr(a), repr(b)
+    elif rank_a == 8:
+        for x, y in zip(a, b):
+            result = compare_values(x, y)
+            if result:
+                return result
+        a, b = len(a), len(b)
+    if a == b:
+        return 0
+    return -1 if a < b else 1
+
+
+_MISSING = object()
+
+
+def _get_field(data, field_path):
+    value = data
+    for part in field_path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _matches(value, op, expected):
+    if value is _MISSING:
+        return False
+    if op == '==':
+        return compare_values(value, expected) == 0
+    if op == '!=':
+        return value is not None and compare_values(value, expected) != 0
+    if op in ('<', '<=', '>', '>='):
+        if _type_rank(value) != _type_rank(expected):
+            return False
+        result = compare_values(value, expected)
+        return {'<': result < 0, '<=': result <= 0, '>': result > 0, '>=': result >= 0}[op]
+    if op == 'in':
+        return any(compare_values(value, item) == 0 for item in expected)
+    if op == 'not-in':
+        return value is not None and all(compare_values(value, item) != 0 for item in expected)
+    if op == 'array-contains':
+        return isinstance(value, list) and any(compare_values(v, expected) == 0 for v in value)
+    if op == 'array-contains-any':
+        return isinstance(value, list) and any(
+            compare_values(v, item) == 0 for v in value for item in expected)
+    raise ValueError(f'unsupported operator {op!r}')
+
+
+def _resolve_transforms(value, old=_MISSING):
+    """استبدال SERVER_TIMESTAMP و Increment بالقيم الفعلية"""
+    if value is SERVER_TIMESTAMP:
+        return datetime.now(timezone.utc)
+    if isinstance(value, Increment):
+        base = old if isinstance(old, (int, float)) and not isinstance(old, bool) else 0
+        return base + value.value
+    if isinstance(value, dict):
+        old = old if isinstance(old, dict) else {}
+        return {k: _resolve_transforms(v, old.get(k, _MISSING))
+                for k, v in value.items() if v is not DELETE_FIELD}
+    if isinstance(value, list):
+        return [_resolve_transforms(v) for v in value]
+    return copy.deepcopy(value)
+
+
+def _merge(target, updates):
+    for key, value in updates.items():
+        if value is DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = _resolve_transforms(value, target.get(key, _MISSING))
+
+
+def _apply_update(target, updates):
+    """update() يقبل مسارات منقّطة مثل 'stats.total'"""
+    for field_path, value in updates.items():
+        parts = field_path.split('.')
+        node = target
+        for part in parts[:-1]:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                child = node[part] = {}
+            node = child
+        if value is DELETE_FIELD:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = _resolve_transforms(value, node.get(parts[-1], _MISSING))
+
+
+def _project(data, field_paths):
+    if field_paths is None:
+        return copy.deepcopy(data)
+    result = {}
+    for field_path in field_paths:
+        if field_path == '__name__':
+            continue
+        value = _get_field(data, field_path)
+        if value is _MISSING:
+            continue
+        node = result
+        parts = field_path.split('.')
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = copy.deepcopy(value)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# المراجع واللقطات
+# ---------------------------------------------------------------------------
+
+class DocumentSnapshot:
+    def __init__(self, reference, data, create_time=None, update_time=None):
+        self.reference = reference
+        self._data = data
+        self.create_time = create_time
+        self.update_time = update_time
+        self.read_time = datetime.now(timezone.utc)
+
+    @property
+    def id(self):
+        return self.reference.id
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        if self._data is None:
+            return None
+        value = _get_field(self._data, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+
+class DocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+
+    def __eq__(self, other):
+        return isinstance(other, DocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def __repr__(self):
+        return f'DocumentReference({self.path!r})'
+
+    def __deepcopy__(self, memo):
+        # المراجع غير قابلة للتغيير وتشير إلى نفس العميل
+        return self
+
+    @property
+    def id(self):
+        return self.path.rsplit('/', 1)[-1]
+
+    @property
+    def parent(self):
+        return CollectionReference(self._client, self.path.rsplit('/', 1)[0])
+
+    def collection(self, collection_id):
+        return CollectionReference(self._client, f'{self.path}/{collection_id}')
+
+    def collections(self):
+        self._client._rpc(lookups=1)
+        return [self.collection(name) for name in self._client._child_collections(self.path)]
+
+    def get(self, field_paths=None):
+        self._client._rpc(lookups=1, reads=1)
+        return self._client._snapshot(self, field_paths)
+
+    def create(self, document_data):
+        return self._commit_single(('create', self, document_data, False))
+
+    def set(self, document_data, merge=False):
+        return self._commit_single(('set', self, document_data, merge))
+
+    def update(self, field_updates):
+        return self._commit_single(('update', self, field_updates, False))
+
+    def delete(self):
+        return self._commit_single(('delete', self, None, False))
+
+    def _commit_single(self, write):
+        return self._client._commit([write])[0]
+
+
+class _Cursor:
+    def __init__(self, values, before):
+        self.values = values
+        self.before = before
+
+
+class Query:
+    ASCENDING = 'ASCENDING'
+    DESCENDING = 'DESCENDING'
+
+    def __init__(self, client, parent_path, collection_id, all_descendants=False,
+                 filters=(), projection=None, orders=(), limit=None, offset=0,
+                 start=None, end=None):
+        self._client = client
+        self._parent_path = parent_path
+        self._collection_id = collection_id
+        self._all_descendants = all_descendants
+        self._filters = filters
+        self._projection = projection
+        self._orders = orders
+        self._limit = limit
+        self._offset = offset
+        self._start = start
+        self._end = end
+
+    def _copy(self, **changes):
+        state = {
+            'parent_path': self._parent_path,
+            'collection_id': self._collection_id,
+            'all_descendants': self._all_descendants,
+            'filters': self._filters,
+            'projection': self._projection,
+            'orders': self._orders,
+            'limit': self._limit,
+            'offset': self._offset,
+            'start': self._start,
+            'end': self._end,
+        }
+        state.update(changes)
+        return Query(self._client, **state)
+
+    # ---- بناء الاستعلام ----
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def select(self, field_paths):
+        return self._copy(projection=tuple(field_paths))
+
+    def order_by(self, field_path, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def offset(self, num_to_skip):
+        return self._copy(offset=num_to_skip)
+
+    def start_at(self, document_fields_or_snapshot):
+        return self._copy(start=_Cursor(self._cursor_values(document_fields_or_snapshot), True))
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(start=_Cursor(self._cursor_values(document_fields_or_snapshot), False))
+
+    def end_at(self, document_fields_or_snapshot):
+        return self._copy(end=_Cursor(self._cursor_values(document_fields_or_snapshot), False))
+
+    def end_before(self, document_fields_or_snapshot):
+        return self._copy(end=_Cursor(self._cursor_values(document_fields_or_snapshot), True))
+
+    def count(self, alias=None):
+        return AggregationQuery(self, alias or 'count')
+
+    def get_partitions(self, partition_count):
+        """مثل CollectionGroup.get_partitions: أجزاء متقاربة الحجم مرتبة بالمسار"""
+        self._client._rpc(queries=1)
+        with self._client._lock:
+            paths = sorted(p for p in self._client._candidates(self) if self._in_scope(p))
+        size = max(1, -(-len(paths) // max(1, partition_count)))
+        bounds = [DocumentReference(self._client, paths[i]) for i in range(size, len(paths), size)]
+        start = None
+        for end in bounds + [None]:
+            yield QueryPartition(self, start, end)
+            start = end
+
+    # ---- التنفيذ ----
+
+    def _effective_orders(self):
+        orders = list(self._orders)
+        if not any(field == '__name__' for field, _ in orders):
+            direction = orders[-1][1] if orders else self.ASCENDING
+            orders.append(('__name__', direction))
+        return orders
+
+    def _cursor_values(self, cursor):
+        if isinstance(cursor, DocumentSnapshot):
+            # القيم من اللقطة نفسها كما في العميل الحقيقي، حتى لو حُذف المستند بعدها
+            data = cursor._data or {}
+            return [cursor.reference if field == '__name__' else _get_field(data, field)
+                    for field, _ in self._effective_orders()]
+        if isinstance(cursor, DocumentReference):
+            return [cursor]
+        if isinstance(cursor, dict):
+            return [cursor[field] for field, _ in self._effective_orders() if field in cursor]
+        return list(cursor)
+
+    def _in_scope(self, path):
+        parts = path.split('/')
+        if self._collection_id is None:
+            # recursive(): كل المستندات تحت المجموعة مهما كان اسم المجموعة الفرعية
+            return path.startswith(self._parent_path + '/')
+        if parts[-2] != self._collection_id:
+            return False
+        if self._all_descendants:
+            return not self._parent_path or path.startswith(self._parent_path + '/')
+        return '/'.join(parts[:-2]) == self._parent_path
+
+    def _sort_values(self, path, data, orders):
+        values = []
+        for field, _ in orders:
+            if field == '__name__':
+                values.append(DocumentReference(self._client, path))
+            else:
+                values.append(_get_field(data, field))
+        return values
+
+    def _compare_keys(self, a, b, orders):
+        for (_, direction), x, y in zip(orders, a, b):
+            result = compare_values(x, y)
+            if result:
+                return -result if direction == self.DESCENDING else result
+        return 0
+
+    def _after_start(self, values, orders):
+        cursor = self._start.values
+        result = self._compare_keys(values[:len(cursor)], cursor, orders)
+        return result > 0 or (result == 0 and self._start.before)
+
+    def _before_end(self, values, orders):
+        cursor = self._end.values
+        result = self._compare_keys(values[:len(cursor)], cursor, orders)
+        return result < 0 or (result == 0 and not self._end.before)
+
+    def _accepts(self, path, data):
+        # الاستعلام على مجموعة واحدة يأخذ مرشحيه من فهرس المجموعات مباشرة
+        exact = self._collection_id is not None and not self._all_descendants
+        if not exact and not self._in_scope(path):
+            return False
+        for field, op, expected in self._filters:
+            value = DocumentReference(self._client, path) if field == '__name__' \
+                else _get_field(data, field)
+            if not _matches(value, op, expected):
+                return False
+        return True
+
+    def _count(self):
+        if self._orders or self._start or self._end or self._limit is not None or self._offset:
+            return len(self._run())
+        client = self._client
+        with client._lock:
+            return sum(1 for path in client._candidates(self) if self._accepts(path, client._docs[path]))
+
+    def _run(self):
+        orders = self._effective_orders()
+        rows = []
+        with self._client._lock:
+            for path in self._client._candidates(self):
+                data = self._client._docs[path]
+                if not self._accepts(path, data):
+                    continue
+                values = self._sort_values(path, data, orders)
+                if any(v is _MISSING for v in values):
+                    continue
+                rows.append((values, path, data, self._client._meta[path]))
+
+        compare = functools.cmp_to_key(lambda a, b: self._compare_keys(a[0], b[0], orders))
+        rows.sort(key=compare)
+
+        if self._start is not None:
+            rows = [r for r in rows if self._after_start(r[0], orders)]
+        if self._end is not None:
+            rows = [r for r in rows if self._before_end(r[0], orders)]
+
+        rows = rows[self._offset:]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        return [DocumentSnapshot(DocumentReference(self._client, path),
+                                 _project(data, self._projection), *meta)
+                for _, path, data, meta in rows]
+
+    def stream(self, transaction=None):
+        results = self._run()
+        # Firestore يحتسب قراءة واحدة على الأقل لكل استعلام
+        self._client._rpc(queries=1, reads=max(1, len(results)))
+        yield from results
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+
+class QueryPartition:
+    def __init__(self, query, start_at, end_at):
+        self._query = query
+        self.start_at = start_at
+        self.end_at = end_at
+
+    def query(self):
+        query = self._query.order_by('__name__')
+        if self.start_at is not None:
+            query = query.start_at(self.start_at)
+        if self.end_at is not None:
+            query = query.end_before(self.end_at)
+        return query
+
+
+class CollectionReference(Query):
+    def __init__(self, client, path):
+        parent_path, _, collection_id = path.rpartition('/')
+        super().__init__(client, parent_path, collection_id)
+        self.path = path
+
+    def __repr__(self):
+        return f'CollectionReference({self.path!r})'
+
+    @property
+    def id(self):
+        return self._collection_id
+
+    @property
+    def parent(self):
+        return DocumentReference(self._client, self._parent_path) if self._parent_path else None
+
+    def document(self, document_id=None):
+        if document_id is None:
+            document_id = ''.join(self._client._random.choice(_AUTO_ID_CHARS) for _ in range(20))
+        return DocumentReference(self._client, f'{self.path}/{document_id}')
+
+    def add(self, document_data, document_id=None):
+        ref = self.document(document_id)
+        result = ref.create(document_data)
+        return result.update_time, ref
+
+    def list_documents(self, page_size=None):
+        self._client._rpc(queries=1)
+        with self._client._lock:
+            paths = list(self._client._collections.get(self.path, ()))
+        return [DocumentReference(self._client, p) for p in sorted(paths)]
+
+    def recursive(self):
+        return Query(self._client, self.path, None, all_descendants=True)
+
+
+class AggregationResult:
+    def __init__(self, alias, value):
+        self.alias = alias
+        self.value = value
+
+
+class AggregationQuery:
+    def __init__(self, query, alias):
+        self._query = query
+        self._alias = alias
+
+    def get(self, transaction=None):
+        count = self._query._count()
+        # count() يُحتسب كقراءة واحدة لكل 1000 مستند
+        self._query._client._rpc(aggregations=1, reads=max(1, -(-count // 1000)))
+        return [[AggregationResult(self._alias, count)]]
+
+
+class WriteResult:
+    def __init__(self, update_time):
+        self.update_time = update_time
+
+
+class WriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def __len__(self):
+        return len(self._writes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        return False
+
+    def create(self, reference, document_data):
+        self._writes.append(('create', reference, document_data, False))
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(('set', reference, document_data, merge))
+
+    def update(self, reference, field_updates):
+        self._writes.append(('update', reference, field_updates, False))
+
+    def delete(self, reference):
+        self._writes.append(('delete', reference, None, False))
+
+    def commit(self):
+        writes, self._writes = self._writes, []
+        return self._client._commit(writes)
+
+
+class FakeFirestore:
+    """
+    بديل Firestore داخل الذاكرة مع عدادات RPC وتأخير اختياري
+
+    latency: تأخير ثابت (بالثواني) لكل طلب RPC
+    per_doc_latency: تأخير إضافي لكل مستند يُقرأ أو يُكتب
+    """
+
+    SERVER_TIMESTAMP = SERVER_TIMESTAMP
+    DELETE_FIELD = DELETE_FIELD
+
+    def __init__(self, latency=0.0, per_doc_latency=0.0, seed=None):
+        self.latency = latency
+        self.per_doc_latency = per_doc_latency
+        self.stats = RpcStats()
+        self._docs = {}
+        # فهرس المستندات حسب مسار المجموعة حتى لا يمسح كل استعلام قاعدة البيانات كاملة
+        self._collections = {}
+        self._meta = {}
+        self._lock = threading.RLock()
+        self._random = random.Random(seed)
+
+    # ---- الواجهة العامة ----
+
+    def collection(self, path):
+        return CollectionReference(self, path)
+
+    def document(self, path):
+        return DocumentReference(self, path)
+
+    def collection_group(self, collection_id):
+        return Query(self, '', collection_id, all_descendants=True)
+
+    def collections(self):
+        self._rpc(lookups=1)
+        return [self.collection(name) for name in self._child_collections('')]
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        references = list(references)
+        self._rpc(lookups=1, reads=len(references))
+        for ref in references:
+            yield self._snapshot(ref, field_paths)
+
+    def load(self, collection_path, documents):
+        """تعبئة البيانات مباشرة دون احتساب RPC (لتجهيز القياسات)"""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            for doc_id, data in documents:
+                path = f'{collection_path}/{doc_id}'
+                self._store(path, copy.deepcopy(data))
+                self._meta[path] = (now, now)
+
+    def document_count(self, collection_path=None):
+        with self._lock:
+            if collection_path is None:
+                return len(self._docs)
+            prefix = collection_path + '/'
+            return sum(1 for p in self._docs if p.startswith(prefix))
+
+    # ---- الداخلية ----
+
+    def _rpc(self, reads=0, writes=0, **counts):
+        delay = self.latency + self.per_doc_latency * (reads + writes)
+        if delay > 0:
+            time.sleep(delay)
+        self.stats.add(reads=reads, writes=writes, **counts)
+
+    def _store(self, path, data):
+        self._docs[path] = data
+        self._collections.setdefault(path.rsplit('/', 1)[0], {})[path] = None
+
+    def _remove(self, path):
+        if self._docs.pop(path, None) is None:
+            return
+        self._meta.pop(path, None)
+        collection_path = path.rsplit('/', 1)[0]
+        members = self._collections[collection_path]
+        del members[path]
+        if not members:
+            del self._collections[collection_path]
+
+    def _candidates(self, query):
+        """المسارات التي قد يطابقها الاستعلام (تُستدعى داخل القفل)"""
+        if query._collection_id is not None and not query._all_descendants:
+            path = f'{query._parent_path}/{query._collection_id}' if query._parent_path \
+                else query._collection_id
+            return list(self._collections.get(path, ()))
+        return list(self._docs)
+
+    def _child_collections(self, parent_path):
+        prefix = parent_path + '/' if parent_path else ''
+        depth = prefix.count('/')
+        with self._lock:
+            return sorted({p.split('/')[depth] for p in self._docs if p.startswith(prefix)})
+
+    def _snapshot(self, ref, field_paths=None):
+        with self._lock:
+            data = self._docs.get(ref.path)
+            meta = self._meta.get(ref.path, (None, None))
+            data = _project(data, field_paths) if data is not None else None
+        return DocumentSnapshot(ref, data, *meta)
+
+    def _commit(self, writes):
+        if len(writes) > MAX_BATCH_WRITES:
+            raise ValueError(f'maximum {MAX_BATCH_WRITES} writes allowed per request')
+        self._rpc(commits=1, writes=len(writes))
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            # التحقق أولاً حتى تكون الدفعة ذرية
+            for kind, ref, _, _ in writes:
+                if kind == 'create' and ref.path in self._docs:
+                    raise Conflict(f'document already exists: {ref.path}')
+                if kind == 'update' and ref.path not in self._docs:
+                    raise NotFound(f'no document to update: {ref.path}')
+            for kind, ref, data, merge in writes:
+                path = ref.path
+                if kind == 'delete':
+                    self._remove(path)
+                    continue
+                created = self._meta.get(path, (now, now))[0]
+                if kind == 'update':
+                    _apply_update(self._docs[path], data)
+                elif kind == 'set' and merge and path in self._docs:
+                    _merge(self._docs[path], data)
+                else:
+                    self._store(path, _resolve_transforms(data))
+                self._meta[path] = (created, now)
+        return [WriteResult(now) for _ in writes]
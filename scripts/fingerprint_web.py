@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+إضافة بصمة المحتوى لأسماء ملفات build/web (خطوة بعد flutter build web)
+Content-hash fingerprinting for the Flutter web build
+
+Flutter يكتب أسماء ثابتة مثل main.dart.js، فلا يمكن تخزينها طويلاً دون أن
+يبقى المتصفح على النسخة القديمة. هذه الخطوة تعيد تسمية الملفات إلى
+main.dart.<hash>.js وتحدّث الإشارات إليها في index.html و flutter_bootstrap.js
+وجدول flutter_service_worker.js، ثم تكتب asset-manifest.json وملف _headers
+(Netlify) يجعل الأسماء ذات البصمة وحدها immutable لمدة سنة. الملف الذي لم
+يتغير محتواه يحتفظ باسمه بين النشرات.
+
+    flutter build web --release && python scripts/fingerprint_web.py
+    python scripts/fingerprint_web.py build/web --previous last-deploy/asset-manifest.json
+
+تُعاد تسمية الملفات التي يشير إليها ملف نصي نعيد كتابته فقط. assets/ و
+canvaskit/ يحمّلها المحرك بأسماء ثابتة، فتبقى كما هي ولا تدخل في _headers.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+
+MANIFEST_NAME = 'asset-manifest.json'
+HEADERS_NAME = '_headers'
+IMMUTABLE_POLICY = 'public, max-age=31536000, immutable'
+SERVICE_WORKER = 'flutter_service_worker.js'
+HASH_LENGTH = 16
+
+# الملفات المرشحة لإضافة البصمة (مسارات نسبية من جذر البناء)
+CANDIDATE_PATTERNS = [
+    re.compile(r'main\.dart\.(?:js|mjs|wasm)'),
+    re.compile(r'main\.dart\.js_\d+\.part\.js'),
+    re.compile(r'(?:main\.dart\.(?:js|mjs)|[^/]+\.part\.js)\.map'),
+    re.compile(r'flutter(?:_bootstrap)?\.js'),
+    re.compile(r'[^/]+\.css'),
+]
+
+# الملفات النصية التي تُعاد كتابة الإشارات داخلها
+TEXT_EXTENSIONS = ('.html', '.js', '.mjs', '.css')
+
+# اسم يحمل بصمة مسبقاً (نفس النمط الذي يعتبره nocache_server.py ثابتاً)
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{8,64}\.[A-Za-z0-9]+(?:\.map)?$')
+SOURCE_MAP_RE = re.compile(r'(//[#@] sourceMappingURL=)(\S+)')
+SW_RESOURCES_RE = re.compile(r'(const RESOURCES = )(\{.*?\})(;)', re.S)
+SW_CORE_RE = re.compile(r'(const CORE = )(\[.*?\])(;)', re.S)
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=HASH_LENGTH // 2).hexdigest()
+
+
+def hashed_name(path, digest):
+    """main.dart.js -> main.dart.<hash>.js و main.dart.js.map -> main.dart.<hash>.js.map"""
+    directory, name = posixpath_split(path)
+    suffix = ''
+    if name.endswith('.map'):
+        name, suffix = name[:-4], '.map'
+    stem, ext = os.path.splitext(name)
+    return f'{directory}{stem}.{digest}{ext}{suffix}'
+
+
+def posixpath_split(path):
+    head, _, tail = path.rpartition('/')
+    return (head + '/' if head else ''), tail
+
+
+def is_candidate(path):
+    return (any(p.fullmatch(path) for p in CANDIDATE_PATTERNS)
+            and not HASHED_NAME_RE.search(path))
+
+
+def list_files(root):
+    files = []
+    for directory, dirs, names in os.walk(root):
+        dirs.sort()
+        for name in sorted(names):
+            files.append(os.path.relpath(os.path.join(directory, name), root).replace(os.sep, '/'))
+    return files
+
+
+def _quoted_pattern(name):
+    # "name" أو 'name' أو "./name" داخل HTML و JS
+    return re.compile(r'(["\'])(\./)?' + re.escape(name) + r'\1')
+
+
+def find_references(text, candidates):
+    """المرشحون المذكورون في نص بين علامتي تنصيص أو في تعليق sourceMappingURL"""
+    found = {name for name in candidates if _quoted_pattern(name).search(text)}
+    for match in SOURCE_MAP_RE.finditer(text):
+        target = match.group(2).removeprefix('./')
+        if target in candidates:
+            found.add(target)
+    return found
+
+
+def rewrite_references(text, renames):
+    for old, new in renames.items():
+        text = _quoted_pattern(old).sub(lambda m: f'{m.group(1)}{m.group(2) or ""}{new}{m.group(1)}', text)
+    return SOURCE_MAP_RE.sub(
+        lambda m: m.group(1) + renames.get(m.group(2).removeprefix('./'), m.group(2)), text)
+
+
+def plan_order(graph):
+    """ترتيب المعالجة: الملف بعد كل ما يشير إليه (بصمته تشمل الأسماء الجديدة)"""
+    order, state = [], {}
+
+    def visit(node, stack):
+        if state.get(node) == 'done':
+            return
+        if state.get(node) == 'visiting':
+            raise ValueError('circular references: ' + ' -> '.join(stack + [node]))
+        state[node] = 'visiting'
+        for dependency in sorted(graph.get(node, ())):
+            visit(dependency, stack + [node])
+        state[node] = 'done'
+        order.append(node)
+
+    for node in sorted(graph):
+        visit(node, [])
+    return order
+
+
+def _md5(data):
+    return hashlib.md5(data).hexdigest()
+
+
+def update_service_worker(text, renames, contents):
+    """
+    تحديث جدول RESOURCES (الاسم -> md5) وقائمة CORE في flutter_service_worker.js
+    حتى يخزن العامل الأسماء الجديدة ويكتشف تغير index.html
+    """
+    match = SW_RESOURCES_RE.search(text)
+    if match:
+        resources = json.loads(match.group(2))
+        updated = {}
+        for key, value in resources.items():
+            name = renames.get(key, key)
+            source = 'index.html' if key == '/' else name
+            updated[name] = _md5(contents[source]) if source in contents else value
+        text = text[:match.start(2)] + json.dumps(updated, separators=(',', ':')) + text[match.end(2):]
+    match = SW_CORE_RE.search(text)
+    if match:
+        core = [renames.get(name, name) for name in json.loads(match.group(2))]
+        text = text[:match.start(2)] + json.dumps(core) + text[match.end(2):]
+    return text
+
+
+def headers_rules(names):
+    """قواعد _headers لـ Netlify: كل اسم ذي بصمة يُخزن سنة كاملة"""
+    lines = ['', '# fingerprint_web.py: أسماء تحمل بصمة المحتوى']
+    for name in sorted(names):
+        lines += [f'/{name}', f'  Cache-Control: {IMMUTABLE_POLICY}']
+    return '\n'.join(lines) + '\n'
+
+
+def fingerprint(root, dry_run=False):
+    """
+    إضافة البصمات وإعادة كتابة الإشارات؛ يعيد (manifest, renames)
+
+    الملفات تُكتب بأسمائها الجديدة أولاً، ثم الملفات المعدلة في مكانها
+    (index.html آخرها)، ثم تُحذف الأسماء القديمة، فلا يشير أي ملف إلى اسم
+    غير موجود أثناء التنفيذ. قواعد immutable تُضاف إلى _headers (أو تُنشئه).
+    """
+    files = list_files(root)
+    if MANIFEST_NAME in files:
+        raise ValueError(f'{root} is already fingerprinted ({MANIFEST_NAME} exists); rebuild first')
+
+    def read(path):
+        with open(os.path.join(root, path), 'rb') as f:
+            return f.read()
+
+    contents = {}
+    # العامل يُحدّث جدوله بعد ذلك؛ ذكر ملف فيه وحده لا يبرر تغيير اسمه
+    texts = [f for f in files if f.endswith(TEXT_EXTENSIONS) and f != SERVICE_WORKER]
+    candidates = {f for f in files if is_candidate(f)}
+    for path in texts:
+        contents[path] = read(path)
+
+    # الرسم: ملف نصي -> المرشحون الذين يشير إليهم
+    graph = {}
+    referenced = set()
+    for path in texts:
+        refs = find_references(contents[path].decode('utf-8', 'replace'), candidates - {path})
+        graph[path] = refs
+        referenced |= refs
+    # المرشح الذي لا يشير إليه أحد قد يُحمّل من خارج البناء؛ لا نغيّر اسمه
+    to_rename = candidates & referenced
+    for path in to_rename:
+        graph.setdefault(path, set())
+        if path not in contents:
+            contents[path] = read(path)
+
+    renames = {}
+    outputs = {}
+    for path in plan_order(graph):
+        data = contents[path]
+        relevant = {old: new for old, new in renames.items() if old in graph[path]}
+        if relevant:
+            data = rewrite_references(data.decode('utf-8'), relevant).encode('utf-8')
+        if path in to_rename:
+            renames[path] = hashed_name(path, content_hash(data))
+            outputs[renames[path]] = data
+        elif relevant:
+            outputs[path] = data
+        contents[renames.get(path, path)] = data
+
+    if SERVICE_WORKER in files:
+        worker = read(SERVICE_WORKER).decode('utf-8')
+        rewritten = update_service_worker(worker, renames, contents)
+        if rewritten != worker:
+            outputs[SERVICE_WORKER] = contents[SERVICE_WORKER] = rewritten.encode('utf-8')
+
+    final_names = [renames.get(f, f) for f in files]
+    manifest = {
+        'files': renames,
+        'hashes': {name: content_hash(contents[name] if name in contents else read(name))
+                   for name in final_names},
+        'immutable': sorted(renames.values()),
+    }
+    if dry_run:
+        return manifest, renames
+
+    # الأسماء الجديدة أولاً، ثم الملفات التي تبقى بأسمائها (index.html آخرها)
+    ordered = sorted(outputs, key=lambda name: (name in files, name == 'index.html', name))
+    for name in ordered:
+        target = os.path.join(root, name)
+        tmp = target + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(outputs[name])
+        os.replace(tmp, target)
+    for old in renames:
+        os.remove(os.path.join(root, old))
+    with open(os.path.join(root, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    if manifest['immutable']:
+        with open(os.path.join(root, HEADERS_NAME), 'a', encoding='utf-8') as f:
+            f.write(headers_rules(manifest['immutable']))
+    return manifest, renames
+
+
+def compare_manifests(previous, current):
+    """ما تغير منذ النشر السابق: (changed, unchanged, removed)"""
+    old, new = previous.get('hashes', {}), current['hashes']
+    # الأسماء ذات البصمة تُقارن بالاسم الأصلي
+    old_sources = {v: k for k, v in previous.get('files', {}).items()}
+    new_sources = {v: k for k, v in current['files'].items()}
+    old_by_source = {old_sources.get(name, name): digest for name, digest in old.items()}
+    new_by_source = {new_sources.get(name, name): digest for name, digest in new.items()}
+    changed = sorted(n for n, d in new_by_source.items() if old_by_source.get(n) != d)
+    unchanged = sorted(n for n, d in new_by_source.items() if old_by_source.get(n) == d)
+    removed = sorted(set(old_by_source) - set(new_by_source))
+    return changed, unchanged, removed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Fingerprint Flutter web build assets with content hashes')
+    parser.add_argument('build_dir', nargs='?', default='build/web', help='Flutter web build (default: build/web)')
+    parser.add_argument('--previous', metavar='MANIFEST',
+                        help='asset-manifest.json of the last deploy, to report what changed')
+    parser.add_argument('--dry-run', action='store_true', help='print the renames without touching files')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.isfile(os.path.join(args.build_dir, 'index.html')):
+        print(f"❌ لا يوجد index.html في {args.build_dir}. شغّل flutter build web أولاً")
+        sys.exit(2)
+    try:
+        manifest, renames = fingerprint(args.build_dir, args.dry_run)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+    print(f"🔏 {len(renames)} ملف بأسماء ثابتة المحتوى في {args.build_dir}" + (" (تجربة)" if args.dry_run else ''))
+    for old, new in sorted(renames.items()):
+        print(f"   • {old} → {new}")
+
+    if args.previous:
+        with open(args.previous, encoding='utf-8') as f:
+            changed, unchanged, removed = compare_manifests(json.load(f), manifest)
+        print(f"\n📦 مقارنة بالنشر السابق: {len(changed)} متغير، {len(unchanged)} بدون تغيير، {len(removed)} محذوف")
+        for name in changed:
+            print(f"   ✏️  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+جلسة Firestore مشتركة لجميع سكربتات الإدارة
+Shared, lazily-initialised Firestore session for the admin scripts
+
+- لا يُستورد firebase_admin إلا عند أول طلب للعميل، فيبدأ السكربت فوراً.
+- تطبيق Firebase واحد وعميل واحد (قناة gRPC واحدة) لكل عملية، حتى عند
+  تشغيل عدة سكربتات متتالية في نفس العملية.
+- عند ضبط FIRESTORE_EMULATOR_HOST يُستخدم المحاكي تلقائياً (المنفذ 8080 في firebase.json).
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+
+EMULATOR_HOST_ENV = 'FIRESTORE_EMULATOR_HOST'
+# منفذ محاكي Firestore كما في firebase.json
+DEFAULT_EMULATOR_HOST = 'localhost:8080'
+
+# أماكن البحث عن ملف حساب الخدمة، بالترتيب
+CREDENTIAL_ENV_VARS = ('FIREBASE_CREDENTIALS', 'GOOGLE_APPLICATION_CREDENTIALS')
+CREDENTIAL_PATTERNS = (
+    '/opt/flutter/firebase-admin-sdk.json',
+    '/opt/flutter/*adminsdk*.json',
+    '/opt/flutter/firebase-*.json',
+)
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_lock = threading.Lock()
+_client = None
+_cold_start = None
+_mode = None
+_listeners = []
+
+
+def find_credentials():
+    """مسار ملف Firebase Admin SDK أو None"""
+    for name in CREDENTIAL_ENV_VARS:
+        path = os.environ.get(name)
+        if path and os.path.isfile(path):
+            return path
+    for pattern in CREDENTIAL_PATTERNS:
+        matches = sorted(glob.glob(pattern))
+        if matches:
+            return matches[0]
+    return None
+
+
+def default_project_id():
+    """معرّف المشروع من .firebaserc (يحتاجه المحاكي)"""
+    for name in ('GCLOUD_PROJECT', 'GOOGLE_CLOUD_PROJECT'):
+        if os.environ.get(name):
+            return os.environ[name]
+    try:
+        with open(os.path.join(_REPO_ROOT, '.firebaserc'), encoding='utf-8') as f:
+            return json.load(f)['projects']['default']
+    except (OSError, ValueError, KeyError):
+        return 'demo-zahrat-amal'
+
+
+def use_emulator(host=DEFAULT_EMULATOR_HOST):
+    """توجيه الجلسة إلى المحاكي (يجب استدعاؤها قبل get_db)"""
+    os.environ[EMULATOR_HOST_ENV] = host
+
+
+def _connect(verbose):
+    emulator = os.environ.get(EMULATOR_HOST_ENV)
+    if emulator:
+        # عميل المحاكي لا يحتاج بيانات اعتماد؛ google-cloud-firestore يقرأ
+        # FIRESTORE_EMULATOR_HOST ويستخدم اتصالاً غير مشفر
+        from google.cloud import firestore as gcloud_firestore
+        return gcloud_firestore.Client(project=default_project_id()), f'emulator {emulator}'
+
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    try:
+        app = firebase_admin.get_app()
+    except ValueError:
+        key_path = find_credentials()
+        if key_path is None:
+            raise RuntimeError("لم يتم العثور على ملف Firebase Admin SDK "
+                               f"(جرب ضبط {CREDENTIAL_ENV_VARS[0]})")
+        if verbose:
+            print(f"✅ تم العثور على ملف Firebase: {key_path}")
+        app = firebase_admin.initialize_app(credentials.Certificate(key_path))
+    return firestore.client(app), f'project {app.project_id}'
+
+
+def get_db(verbose=True):
+    """
+    عميل Firestore المشترك، يُنشأ عند أول استدعاء فقط
+    Return the process-wide Firestore client, creating it on first use
+    """
+    global _client, _cold_start, _mode
+    if _client is not None:
+        return _client
+    with _lock:
+        if _client is None:
+            started = time.perf_counter()
+            client, mode = _connect(verbose)
+            _cold_start = time.perf_counter() - started
+            _client, _mode = client, mode
+            if verbose:
+                print(f"✅ تم الاتصال بـ Firebase ({mode}) في {_cold_start:.2f} ث")
+            _notify(client)
+    return _client
+
+
+def set_client(client, mode='injected'):
+    """استخدام عميل جاهز (مثل عميل بديل للاختبارات) بدلاً من الاتصال"""
+    global _client, _cold_start, _mode
+    with _lock:
+        _client, _cold_start, _mode = client, 0.0, mode
+        _notify(client)
+
+
+def add_client_listener(callback):
+    """
+    استدعاء callback(client) لكل عميل تستخدمه الجلسة (الحالي فوراً إن وجد)
+    ويعيد دالة لإلغاء التسجيل؛ يستخدمه profiling.py لعد الطلبات
+    """
+    with _lock:
+        _listeners.append(callback)
+        if _client is not None:
+            callback(_client)
+
+    def remove():
+        with _lock:
+            if callback in _listeners:
+                _listeners.remove(callback)
+    return remove
+
+
+def _notify(client):
+    for callback in list(_listeners):
+        callback(client)
+
+
+def reset():
+    """نسيان العميل الحالي (التطبيق نفسه يبقى مهيأً في firebase_admin)"""
+    global _client, _cold_start, _mode
+    with _lock:
+        _client, _cold_start, _mode = None, None, None
+
+
+def cold_start_seconds():
+    """زمن الاستيراد والاتصال عند أول get_db، أو None قبل ذلك"""
+    return _cold_start
+
+
+def session_mode():
+    return _mode
+
+
+def server_timestamp():
+    """قيمة SERVER_TIMESTAMP دون استيراد المكتبة عند تحميل السكربت"""
+    # العميل البديل (set_client) يعرّف قيمته الخاصة
+    sentinel = getattr(_client, 'SERVER_TIMESTAMP', None)
+    if sentinel is not None:
+        return sentinel
+    from google.cloud.firestore import SERVER_TIMESTAMP
+    return SERVER_TIMESTAMP
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تصدير واستعادة لقطات Firestore
+Streaming snapshot export and parallel restore
+
+التصدير يقرأ كل مجموعة (مع مجموعاتها الفرعية) على صفحات ويكتبها إلى ملفات
+JSONL مضغوطة بـ gzip ومقسمة إلى أجزاء، فتبقى الذاكرة ثابتة مهما كان الحجم.
+الاستعادة تعيد كتابة الأجزاء بالتوازي عبر دفعات، فتُستنسخ بيئة الاختبار
+كما هي بدلاً من إعادة تشغيل سكربتات البذرة العشوائية.
+
+    python scripts/firestore_snapshot.py export --out snapshots/staging
+    python scripts/firestore_snapshot.py restore snapshots/staging --purge
+"""
+
+import argparse
+import base64
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPTS_DIR))
+
+import firestore_session
+import profiling
+from batch_writer import BatchWriter, MAX_BATCH_SIZE, format_throughput
+from cleanup_test_data import collections_to_clean
+
+# المجموعات التي يستخدمها التطبيق: نفس قائمة cleanup_test_data حتى تعيد
+# الاستعادة ما يحذفه التنظيف، ثم بقية المجموعات العليا في lib/ و admin_app/lib/.
+# otp و connection_test مؤقتة (ttl_sweeper) فلا تُصدّر افتراضياً
+APP_COLLECTIONS = [
+    'buyers',
+    'drivers',
+    'vehicles',
+    'delivery_tracking',
+    'payments',
+    'official_receipts',
+    'fcm_tokens',
+    'admins',
+]
+DEFAULT_COLLECTIONS = list(dict.fromkeys(collections_to_clean + APP_COLLECTIONS))
+
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+
+# عدد المستندات في كل صفحة قراءة وفي كل ملف جزئي
+PAGE_SIZE = 1000
+CHUNK_DOCS = 50000
+COMPRESS_LEVEL = 6
+
+
+# ---------------------------------------------------------------------------
+# ترميز أنواع Firestore إلى JSON
+# ---------------------------------------------------------------------------
+
+def _encode_value(value):
+    """يُستدعى من json.dumps للأنواع غير القياسية"""
+    if isinstance(value, datetime):
+        return {'__ts__': value.isoformat()}
+    if isinstance(value, bytes):
+        return {'__bytes__': base64.b64encode(value).decode('ascii')}
+    if hasattr(value, 'latitude') and hasattr(value, 'longitude'):
+        return {'__geo__': [value.latitude, value.longitude]}
+    if hasattr(value, 'path') and hasattr(value, 'collection'):
+        return {'__ref__': value.path}
+    raise TypeError(f'cannot export value of type {type(value).__name__}')
+
+
+def encode_document(path, data):
+    return json.dumps({'path': path, 'data': data}, ensure_ascii=False,
+                      separators=(',', ':'), default=_encode_value)
+
+
+def _make_decoder(db):
+    try:
+        from google.cloud.firestore import GeoPoint
+    except ImportError:
+        GeoPoint = None
+
+    def object_hook(obj):
+        if len(obj) != 1:
+            return obj
+        if '__ts__' in obj:
+            return datetime.fromisoformat(obj['__ts__'])
+        if '__bytes__' in obj:
+            return base64.b64decode(obj['__bytes__'])
+        if '__ref__' in obj:
+            return db.document(obj['__ref__'])
+        if '__geo__' in obj and GeoPoint is not None:
+            return GeoPoint(*obj['__geo__'])
+        return obj
+
+    return json.JSONDecoder(object_hook=object_hook)
+
+
+# ---------------------------------------------------------------------------
+# التصدير
+# ---------------------------------------------------------------------------
+
+def iter_collection(db, collection_name, page_size=PAGE_SIZE):
+    """قراءة المجموعة ومجموعاتها الفرعية على صفحات مرتبة بالمسار"""
+    query = db.collection(collection_name).recursive().order_by('__name__').limit(page_size)
+    last_doc = None
+    while True:
+        page_query = query.start_after(last_doc) if last_doc else query
+        page = list(page_query.stream())
+        yield from page
+        if len(page) < page_size:
+            return
+        last_doc = page[-1]
+
+
+def export_collection(db, collection_name, out_dir, page_size=PAGE_SIZE,
+                      chunk_docs=CHUNK_DOCS, level=COMPRESS_LEVEL):
+    """تصدير مجموعة واحدة إلى ملفات <name>-00000.jsonl.gz"""
+    started = time.perf_counter()
+    chunks = []
+    documents = 0
+    stream = None
+    try:
+        for snapshot in iter_collection(db, collection_name, page_size):
+            if stream is None or documents % chunk_docs == 0:
+                if stream is not None:
+                    stream.close()
+                file_name = f'{collection_name}-{len(chunks):05d}.jsonl.gz'
+                chunks.append(file_name)
+                stream = gzip.open(os.path.join(out_dir, file_name), 'wt',
+                                   encoding='utf-8', compresslevel=level)
+            stream.write(encode_document(snapshot.reference.path, snapshot.to_dict()))
+            stream.write('\n')
+            documents += 1
+    finally:
+        if stream is not None:
+            stream.close()
+    return {
+        'collection': collection_name,
+        'documents': documents,
+        'chunks': chunks,
+        'bytes': sum(os.path.getsize(os.path.join(out_dir, c)) for c in chunks),
+        'elapsed': time.perf_counter() - started,
+    }
+
+
+def export_snapshot(db, out_dir, collections=DEFAULT_COLLECTIONS, workers=4,
+                    page_size=PAGE_SIZE, chunk_docs=CHUNK_DOCS, level=COMPRESS_LEVEL,
+                    on_result=None):
+    """تصدير عدة مجموعات بالتوازي وكتابة manifest.json"""
+    os.makedirs(out_dir, exist_ok=True)
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(export_collection, db, name, out_dir, page_size, chunk_docs, level): name
+            for name in collections
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            results[result['collection']] = result
+            if on_result:
+                on_result(result)
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'source': firestore_session.session_mode(),
+        'collections': {
+            name: {key: results[name][key] for key in ('documents', 'chunks', 'bytes')}
+            for name in collections
+        },
+    }
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+# ---------------------------------------------------------------------------
+# الاستعادة
+# ---------------------------------------------------------------------------
+
+def load_manifest(snapshot_dir):
+    with open(os.path.join(snapshot_dir, MANIFEST_NAME), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT_VERSION:
+        raise ValueError(f"unsupported snapshot format: {manifest.get('format')}")
+    return manifest
+
+
+def restore_chunk(db, path, batch_size=MAX_BATCH_SIZE):
+    """إعادة كتابة ملف جزئي واحد عبر دفعات؛ يعيد (المستندات، الدفعات)"""
+    decoder = _make_decoder(db)
+    with BatchWriter(db, batch_size=batch_size) as writer:
+        with gzip.open(path, 'rt', encoding='utf-8') as stream:
+            for line in stream:
+                record = decoder.decode(line)
+                writer.set(db.document(record['path']), record['data'])
+    return writer.writes, writer.commits
+
+
+def restore_snapshot(db, snapshot_dir, collections=None, workers=8,
+                     batch_size=MAX_BATCH_SIZE, on_progress=None):
+    """استعادة اللقطة: كل ملف جزئي في عامل مستقل بدفعاته الخاصة"""
+    manifest = load_manifest(snapshot_dir)
+    selected = collections or list(manifest['collections'])
+    jobs = [
+        (name, os.path.join(snapshot_dir, chunk))
+        for name in selected
+        for chunk in manifest['collections'][name]['chunks']
+    ]
+
+    started = time.perf_counter()
+    totals = {'documents': 0, 'commits': 0}
+    lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(restore_chunk, db, path, batch_size): name for name, path in jobs}
+        for future in as_completed(futures):
+            documents, commits = future.result()
+            with lock:
+                totals['documents'] += documents
+                totals['commits'] += commits
+            if on_progress:
+                on_progress(futures[future], documents)
+    totals['elapsed'] = time.perf_counter() - started
+    totals['collections'] = selected
+    return totals
+
+
+# ---------------------------------------------------------------------------
+# واجهة سطر الأوامر
+# ---------------------------------------------------------------------------
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Export or restore a Firestore snapshot')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    export = sub.add_parser('export', help='stream collections to compressed JSONL chunks')
+    export.add_argument('--out', required=True, help='snapshot directory')
+    export.add_argument('--collections', nargs='+', default=DEFAULT_COLLECTIONS,
+                        help='top-level collections to export, with their subcollections')
+    export.add_argument('--workers', type=int, default=4,
+                        help='collections exported concurrently (default: 4)')
+    export.add_argument('--page-size', type=int, default=PAGE_SIZE,
+                        help=f'documents per read page (default: {PAGE_SIZE})')
+    export.add_argument('--chunk-docs', type=int, default=CHUNK_DOCS,
+                        help=f'documents per output file (default: {CHUNK_DOCS})')
+    export.add_argument('--level', type=int, default=COMPRESS_LEVEL, choices=range(1, 10),
+                        metavar='1-9', help=f'gzip level (default: {COMPRESS_LEVEL})')
+
+    restore = sub.add_parser('restore', help='replay a snapshot with parallel batched writes')
+    restore.add_argument('snapshot', help='snapshot directory')
+    restore.add_argument('--collections', nargs='+', default=None,
+                         help='restore only these collections (default: all in the manifest)')
+    restore.add_argument('--workers', type=int, default=8,
+                         help='chunk files restored concurrently (default: 8)')
+    restore.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE,
+                         help=f'writes per batch commit, max {MAX_BATCH_SIZE}')
+    restore.add_argument('--purge', action='store_true',
+                         help='delete the restored collections first so the result matches the snapshot')
+    for command in (export, restore):
+        profiling.add_arguments(command)
+    return parser.parse_args(argv)
+
+
+def run_export(db, args):
+    print(f"📤 تصدير {len(args.collections)} مجموعة إلى {args.out}...")
+    started = time.perf_counter()
+
+    def report(result):
+        print(f"   ✅ {format_throughput(result['collection'], result['documents'], result['elapsed'])}"
+              f"، {len(result['chunks'])} ملف، {result['bytes'] / 1024:.0f} ك.ب")
+
+    manifest = export_snapshot(db, args.out, args.collections, args.workers,
+                               args.page_size, args.chunk_docs, args.level, on_result=report)
+    total = sum(c['documents'] for c in manifest['collections'].values())
+    print(f"\n📈 {format_throughput('الإجمالي', total, time.perf_counter() - started)}")
+
+
+def run_restore(db, args):
+    manifest = load_manifest(args.snapshot)
+    collections = args.collections or list(manifest['collections'])
+    unknown = set(collections) - set(manifest['collections'])
+    if unknown:
+        print(f"❌ مجموعات غير موجودة في اللقطة: {', '.join(sorted(unknown))}")
+        sys.exit(2)
+
+    if args.purge:
+        from cleanup_test_data import purge_collections, print_result
+        print(f"🧹 حذف {len(collections)} مجموعة قبل الاستعادة...")
+        purge_collections(db, collections, workers=4, on_result=print_result)
+
+    print(f"📥 استعادة {args.snapshot} ({manifest['created_at']})...")
+    totals = restore_snapshot(db, args.snapshot, collections, args.workers, args.batch_size,
+                              on_progress=lambda name, n: print(f"   ✅ {name}: {n} مستند"))
+    print(f"\n📈 {format_throughput('الإجمالي', totals['documents'], totals['elapsed'], totals['commits'])}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with profiling.session(f'firestore_snapshot-{args.command}', args):
+        run(args)
+
+
+def run(args):
+    try:
+        db = firestore_session.get_db()
+    except Exception as e:
+        print(f"❌ خطأ في الاتصال بـ Firebase: {e}")
+        sys.exit(1)
+
+    if args.command == 'export':
+        run_export(db, args)
+    else:
+        run_restore(db, args)
+
+
+if __name__ == '__main__':
+    main()
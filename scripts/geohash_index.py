@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+فهرس geohash للبحث بالقرب (السائقون والمكاتب ومواقع التوصيل)
+Geohash backfill and proximity queries for location collections
+
+كل مستند يحمل إحداثيات يأخذ حقل geohash (نص base32 بدقة 9 ≈ 5 م). المواقع
+المتقاربة تشترك في بادئة النص، فالبحث في دائرة يصبح بضعة استعلامات نطاق
+على حقل واحد مفهرس بدل تحميل كل المستندات وحساب المسافات في التطبيق.
+
+    python scripts/geohash_index.py                  # تحديث تزايدي منذ آخر تشغيل
+    python scripts/geohash_index.py --full           # حساب كل المستندات
+    python scripts/geohash_index.py --near 15.5007,32.5599 --radius-km 3 --collection drivers
+
+التحديث التزايدي يقرأ المستندات حيث updated_at (أو timestamp في
+delivery_tracking) >= آخر قيمة رآها، والعلامة تُحفظ في geohash_index_state.
+المجموعة التي لا تحمل الحقل الزمني تُمسح كاملة في كل تشغيل، وتُكتب
+المستندات المتغيرة فقط.
+"""
+
+import argparse
+import math
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import firestore_session
+import profiling
+from batch_writer import BatchWriter, MAX_BATCH_SIZE, format_throughput
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_FIELD = 'geohash'
+GEOHASH_PRECISION = 9
+
+# المجموعة -> الحقل الزمني للتحديث التزايدي
+# delivery_tracking: timestamp من FieldValue.serverTimestamp() (order_tracking_gps.dart)
+GEO_COLLECTIONS = {
+    'drivers': 'updated_at',
+    'delivery_offices': 'updated_at',
+    'delivery_tracking': 'timestamp',
+}
+
+# أماكن الإحداثيات المقبولة: حقلان مسطحان أو GeoPoint/خريطة
+POINT_FIELDS = ('location', 'current_location')
+SOURCE_FIELDS = ['latitude', 'longitude', *POINT_FIELDS, GEOHASH_FIELD]
+
+STATE_COLLECTION = 'geohash_index_state'
+PAGE_SIZE = 500
+# أقصى عدد خلايا في تغطية دائرة (قبل دمج المتتالي منها)
+MAX_COVER_CELLS = 9
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+
+# ---------------------------------------------------------------------------
+# geohash
+# ---------------------------------------------------------------------------
+
+def encode(lat, lng, precision=GEOHASH_PRECISION):
+    """ترميز نقطة إلى geohash (البت الزوجي لخط الطول والفردي لخط العرض)"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = value = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def cell_degrees(precision):
+    """ارتفاع وعرض الخلية بالدرجات"""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def _bounding_box(lat, lng, radius_m):
+    """(lat_lo, lat_hi, lng_lo, lng_hi) حول الدائرة؛ خط الطول قد يتجاوز ±180"""
+    d_lat = radius_m / METERS_PER_DEGREE
+    lat_lo, lat_hi = max(-90.0, lat - d_lat), min(90.0, lat + d_lat)
+    # العرض يُقاس عند أبعد خط عرض تصل إليه الدائرة (الدرجة تضيق نحو القطبين)
+    cos_lat = math.cos(math.radians(max(abs(lat_lo), abs(lat_hi))))
+    if cos_lat < 1e-9 or d_lat / cos_lat >= 180:
+        return lat_lo, lat_hi, -180.0, 180.0
+    d_lng = d_lat / cos_lat
+    return lat_lo, lat_hi, lng - d_lng, lng + d_lng
+
+
+def _cell_span(box, precision):
+    """صفوف وأعمدة الخلايا التي تتقاطع مع المربع بهذه الدقة"""
+    lat_lo, lat_hi, lng_lo, lng_hi = box
+    height, width = cell_degrees(precision)
+    rows = round(180 / height)
+    columns = round(360 / width)
+    row_range = range(int((lat_lo + 90) // height), min(rows - 1, int((lat_hi + 90) // height)) + 1)
+    first = int((lng_lo + 180) // width)
+    column_range = range(first, min(first + columns - 1, int((lng_hi + 180) // width)) + 1)
+    return row_range, column_range, columns
+
+
+def covering_cells(lat, lng, radius_m, max_cells=MAX_COVER_CELLS):
+    """
+    خلايا geohash التي تغطي الدائرة بأعلى دقة لا تتجاوز فيها max_cells
+
+    الخلايا في الدقة الأعلى أصغر، فالمساحة الزائدة المقروءة حول الدائرة أقل.
+    """
+    box = _bounding_box(lat, lng, radius_m)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        rows, cols, columns = _cell_span(box, precision)
+        if len(rows) * len(cols) <= max_cells or precision == 1:
+            break
+    height, width = cell_degrees(precision)
+    return sorted({encode(-90 + (row + 0.5) * height, -180 + (col % columns + 0.5) * width, precision)
+                   for row in rows for col in cols})
+
+
+def _successor(geohash):
+    """الخلية التالية بنفس الطول في الترتيب النصي (None بعد zzz...)"""
+    chars = list(geohash)
+    for i in range(len(chars) - 1, -1, -1):
+        index = BASE32.index(chars[i])
+        if index < len(BASE32) - 1:
+            chars[i] = BASE32[index + 1]
+            return ''.join(chars[:i + 1]) + BASE32[0] * (len(chars) - i - 1)
+    return None
+
+
+def query_bounds(lat, lng, radius_m, max_cells=MAX_COVER_CELLS):
+    """
+    نطاقات geohash [start, end] التي تغطي دائرة، استعلام واحد لكل نطاق
+
+    الخلايا المتتالية في الترتيب النصي تُدمج في نطاق واحد، فيقل عدد
+    الاستعلامات عادة إلى 1-4.
+    """
+    ranges = []
+    for cell in covering_cells(lat, lng, radius_m, max_cells):
+        if ranges and _successor(ranges[-1][1]) == cell:
+            ranges[-1][1] = cell
+        else:
+            ranges.append([cell, cell])
+    # '~' بعد كل حروف base32، فالنطاق يشمل كل ما يبدأ بالبادئة الأخيرة
+    return [(start, end + '~') for start, end in ranges]
+
+
+def distance_m(lat1, lng1, lat2, lng2):
+    """المسافة على سطح الأرض بالأمتار (haversine)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+# ---------------------------------------------------------------------------
+# الإحداثيات في المستندات
+# ---------------------------------------------------------------------------
+
+def _valid(lat, lng):
+    numeric = all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (lat, lng))
+    return numeric and -90 <= lat <= 90 and -180 <= lng <= 180
+
+
+def extract_point(data):
+    """(lat, lng) من latitude/longitude أو من location/current_location؛ None إن لم توجد"""
+    lat, lng = data.get('latitude'), data.get('longitude')
+    if _valid(lat, lng):
+        return float(lat), float(lng)
+    for field in POINT_FIELDS:
+        value = data.get(field)
+        if value is None:
+            continue
+        if isinstance(value, dict):
+            lat = value.get('latitude', value.get('lat'))
+            lng = value.get('longitude', value.get('lng'))
+        else:
+            lat, lng = getattr(value, 'latitude', None), getattr(value, 'longitude', None)
+        if _valid(lat, lng):
+            return float(lat), float(lng)
+    return None
+
+
+def geohash_update(data, precision=GEOHASH_PRECISION):
+    """التعديل المطلوب لمستند: {} إذا كان محدثاً، None إذا لم تكن له إحداثيات"""
+    point = extract_point(data)
+    if point is None:
+        return None
+    geohash = encode(*point, precision)
+    return {} if data.get(GEOHASH_FIELD) == geohash else {GEOHASH_FIELD: geohash}
+
+
+# ---------------------------------------------------------------------------
+# التعبئة والتحديث التزايدي
+# ---------------------------------------------------------------------------
+
+def load_state(db, collection_name):
+    snapshot = db.collection(STATE_COLLECTION).document(collection_name).get()
+    return snapshot.to_dict() if snapshot.exists else {}
+
+
+def save_state(db, collection_name, field, watermark, precision, updated):
+    db.collection(STATE_COLLECTION).document(collection_name).set({
+        'field': field,
+        'watermark': watermark,
+        'precision': precision,
+        'last_updated': updated,
+        'last_run': firestore_session.server_timestamp(),
+    })
+
+
+def index_query(db, collection_name, field, watermark=None):
+    """المستندات المعدلة منذ watermark، أو كل المجموعة مرتبة بالمسار"""
+    query = db.collection(collection_name)
+    if watermark is not None:
+        query = query.where(field, '>=', watermark).order_by(field)
+    return query.order_by('__name__').select(SOURCE_FIELDS + [field])
+
+
+def index_collection(db, collection_name, field, full=False, dry_run=False,
+                     precision=GEOHASH_PRECISION, page_size=PAGE_SIZE, batch_size=MAX_BATCH_SIZE):
+    """
+    حساب geohash لمجموعة واحدة وكتابة المتغير فقط؛ يعيد إحصاءات التشغيل
+
+    العلامة الجديدة هي أكبر قيمة للحقل الزمني رآها المسح (وليست ساعة هذا
+    الجهاز)، والاستعلام التالي يبدأ منها بـ >=؛ المستندات على الحد تُقرأ
+    مرة ثانية ولا تُكتب لأن geohash الخاص بها محدث. كتابة geohash نفسها لا
+    تغير الحقل الزمني، فلا تعيد المستند إلى التشغيل التالي.
+    """
+    started = time.perf_counter()
+    state = {} if full else load_state(db, collection_name)
+    # تغيير الحقل أو الدقة يعني إعادة الحساب من البداية
+    resume = state.get('field') == field and state.get('precision') == precision
+    watermark = state.get('watermark') if resume else None
+    query = index_query(db, collection_name, field, watermark)
+    result = {'collection': collection_name, 'field': field, 'watermark': watermark,
+              'scanned': 0, 'updated': 0, 'missing': 0, 'commits': 0}
+
+    newest = watermark
+    page_size = max(1, page_size)
+    with BatchWriter(db, batch_size=batch_size, label=collection_name) as writer:
+        last_doc = None
+        while True:
+            page_query = query.start_after(last_doc) if last_doc else query
+            page = list(page_query.limit(page_size).stream())
+            for snapshot in page:
+                data = snapshot.to_dict() or {}
+                result['scanned'] += 1
+                stamp = data.get(field)
+                if stamp is not None and (newest is None or stamp > newest):
+                    newest = stamp
+                updates = geohash_update(data, precision)
+                if updates is None:
+                    result['missing'] += 1
+                elif updates:
+                    result['updated'] += 1
+                    if not dry_run:
+                        writer.update(snapshot.reference, updates)
+            if len(page) < page_size:
+                break
+            last_doc = page[-1]
+    result['commits'] = writer.commits
+
+    if not dry_run:
+        save_state(db, collection_name, field, newest, precision, result['updated'])
+    result['elapsed'] = time.perf_counter() - started
+    return result
+
+
+def index_all(db, collections=GEO_COLLECTIONS, workers=3, on_result=None, **options):
+    """تشغيل الفهرسة على كل المجموعات بالتوازي؛ المجموعات التي فشلت تحمل 'error'"""
+    def run(name, field):
+        with profiling.phase(name):
+            return index_collection(db, name, field, **options)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(run, name, field): name for name, field in collections.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'collection': name, 'updated': 0, 'error': e}
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# البحث بالقرب
+# ---------------------------------------------------------------------------
+
+def nearby(db, collection_name, lat, lng, radius_m, filters=(), limit=None):
+    """
+    المستندات داخل دائرة مرتبة بالمسافة؛ قائمة (distance_m, snapshot)
+
+    كل نطاق من query_bounds استعلام مستقل على geohash وتُرسل معاً. الخلايا
+    تغطي مربعاً حول الدائرة، فالنتائج تُصفى بالمسافة الفعلية. filters قائمة
+    (field, op, value) مثل ('is_active', '==', True)، وتحتاج فهرساً مركباً
+    (field, geohash) في Firestore.
+    """
+    bounds = query_bounds(lat, lng, radius_m)
+
+    def run(bound):
+        query = db.collection(collection_name)
+        for field, op, value in filters:
+            query = query.where(field, op, value)
+        start, end = bound
+        return list(query.where(GEOHASH_FIELD, '>=', start)
+                    .where(GEOHASH_FIELD, '<=', end)
+                    .order_by(GEOHASH_FIELD).stream())
+
+    matches = {}
+    with ThreadPoolExecutor(max_workers=len(bounds)) as executor:
+        for page in executor.map(run, bounds):
+            for snapshot in page:
+                point = extract_point(snapshot.to_dict() or {})
+                if point is None:
+                    continue
+                distance = distance_m(lat, lng, *point)
+                if distance <= radius_m:
+                    matches[snapshot.reference.path] = (distance, snapshot)
+
+    ordered = sorted(matches.values(), key=lambda item: item[0])
+    return ordered[:limit] if limit else ordered
+
+
+def nearby_by_scan(db, collection_name, lat, lng, radius_m):
+    """الطريقة القديمة (قراءة كل المجموعة)؛ للمقارنة في القياس فقط"""
+    matches = []
+    for snapshot in db.collection(collection_name).stream():
+        point = extract_point(snapshot.to_dict() or {})
+        if point is not None:
+            distance = distance_m(lat, lng, *point)
+            if distance <= radius_m:
+                matches.append((distance, snapshot))
+    return sorted(matches, key=lambda item: item[0])
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def print_result(result):
+    name = result['collection']
+    if 'error' in result:
+        print(f"⚠️  خطأ في فهرسة '{name}': {result['error']}")
+        return
+    since = f" منذ {result['watermark']}" if result['watermark'] is not None else ' (كاملة)'
+    missing = f"، {result['missing']} بدون إحداثيات" if result['missing'] else ''
+    print(f"✅ {format_throughput(name, result['updated'], result['elapsed'], result['commits'])}"
+          f" — {result['scanned']} مقروء{missing}{since}")
+
+
+def _point(value):
+    try:
+        lat, lng = (float(part) for part in value.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected LAT,LNG, got '{value}'")
+    if not _valid(lat, lng):
+        raise argparse.ArgumentTypeError(f"coordinates out of range: '{value}'")
+    return lat, lng
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Maintain geohash fields and run proximity queries')
+    parser.add_argument('--collections', nargs='+', choices=sorted(GEO_COLLECTIONS),
+                        default=list(GEO_COLLECTIONS), help='collections to index (default: all)')
+    parser.add_argument('--full', action='store_true',
+                        help='ignore saved watermarks and recompute every document')
+    parser.add_argument('--dry-run', action='store_true', help='count documents to update without writing')
+    parser.add_argument('--workers', type=int, default=3, help='collections indexed concurrently (default: 3)')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE,
+                        help=f'documents per query page (default: {PAGE_SIZE})')
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE,
+                        help=f'writes per batch commit, max {MAX_BATCH_SIZE}')
+    parser.add_argument('--near', type=_point, metavar='LAT,LNG',
+                        help='instead of indexing, list documents near this point')
+    parser.add_argument('--radius-km', type=float, default=5.0, help='search radius for --near (default: 5)')
+    parser.add_argument('--collection', choices=sorted(GEO_COLLECTIONS), default='drivers',
+                        help='collection searched by --near (default: drivers)')
+    parser.add_argument('--limit', type=int, default=10, help='results shown by --near (default: 10)')
+    profiling.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with profiling.session('geohash_index', args):
+        run(args)
+
+
+def run(args):
+    try:
+        db = firestore_session.get_db()
+    except Exception as e:
+        print(f"❌ خطأ في الاتصال بـ Firebase: {e}")
+        sys.exit(1)
+
+    if args.near:
+        lat, lng = args.near
+        radius_m = args.radius_km * 1000
+        started = time.perf_counter()
+        results = nearby(db, args.collection, lat, lng, radius_m, limit=args.limit)
+        elapsed = time.perf_counter() - started
+        print(f"📍 {args.collection} خلال {args.radius_km:g} كم من {lat:.5f},{lng:.5f} "
+              f"({len(query_bounds(lat, lng, radius_m))} استعلام نطاق، {elapsed * 1000:.0f} ms)")
+        for distance, snapshot in results:
+            print(f"   • {snapshot.id}: {distance:.0f} م")
+        if not results:
+            print("   لا توجد نتائج")
+        return
+
+    collections = {name: GEO_COLLECTIONS[name] for name in args.collections}
+    print("🗺️  تحديث حقول geohash...")
+    results = index_all(db, collections, workers=args.workers, on_result=print_result,
+                        full=args.full, dry_run=args.dry_run,
+                        page_size=args.page_size, batch_size=args.batch_size)
+    label = 'يحتاج تحديثاً' if args.dry_run else 'محدث'
+    print(f"\n✅ {sum(r['updated'] for r in results)} مستند {label}")
+    if any('error' in r for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
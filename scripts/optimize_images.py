@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تحسين الصور على دفعات (صور الملفات الشخصية، شعارات المتاجر، الإيصالات)
+Batch image optimisation: resized WebP/JPEG variants + manifest
+
+يمر على مجلد الصور الأصلية (مثلاً نسخة محلية من Firebase Storage) وينشئ
+لكل صورة نسخاً مصغرة بعروض ثابتة بصيغتي WebP و JPEG على مجموعة عمليات.
+أسماء النسخ مشتقة من محتوى الأصل، فالأصل الذي لم يتغير لا يُعاد معالجته،
+والأصول المكررة تُعالج مرة واحدة. الناتج manifest.json يربط كل أصل بنسخه
+لتحديث روابط Firestore دفعة واحدة.
+
+    python scripts/optimize_images.py storage_export/ --out build/images
+    python scripts/optimize_images.py storage_export/ --out build/images --base-url https://cdn.example/images
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_writer import format_throughput
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff'}
+
+# العروض المطلوبة (بكسل)؛ لا تُكبّر صورة أصغر من العرض المطلوب
+DEFAULT_WIDTHS = (160, 320, 640, 1280)
+DEFAULT_FORMATS = ('webp', 'jpeg')
+DEFAULT_QUALITY = {'webp': 80, 'jpeg': 82}
+
+FORMAT_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+# يرفع عند تغيير طريقة المعالجة نفسها
+PIPELINE_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+HASH_CHUNK = 1 << 20
+
+
+def _require_pillow():
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        raise SystemExit("❌ مكتبة Pillow غير مثبتة. ثبّتها مرة واحدة: pip install Pillow")
+    return Image, ImageOps
+
+
+def file_digest(path):
+    """sha256 لمحتوى الملف (قراءة على أجزاء)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def settings_key(widths, formats, quality):
+    """أي تغيير في الإعدادات يغير أسماء النسخ فتُعاد معالجتها"""
+    encoded = json.dumps([PIPELINE_VERSION, sorted(widths), sorted(formats), quality], sort_keys=True)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:8]
+
+
+def variant_name(digest, settings, width, fmt):
+    # مجلد فرعي بأول حرفين من البصمة حتى لا يتضخم مجلد واحد
+    return f'{digest[:2]}/{digest[:16]}-{settings}-{width}w.{FORMAT_EXTENSIONS[fmt]}'
+
+
+def scan_originals(source_dir):
+    """كل ملفات الصور تحت المجلد: [(المسار النسبي بـ '/', المسار الكامل)] مرتبة"""
+    found = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                full = os.path.join(root, name)
+                found.append((os.path.relpath(full, source_dir).replace(os.sep, '/'), full))
+    return found
+
+
+# ---------------------------------------------------------------------------
+# المعالجة (داخل عملية منفصلة)
+# ---------------------------------------------------------------------------
+
+def _prepare(Image, image, fmt):
+    # JPEG لا يدعم الشفافية: تُدمج على خلفية بيضاء
+    if fmt == 'jpeg':
+        if image.mode in ('RGBA', 'LA', 'P'):
+            rgba = image.convert('RGBA')
+            background = Image.new('RGB', rgba.size, 'white')
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            return background
+        return image.convert('RGB') if image.mode != 'RGB' else image
+    return image if image.mode in ('RGB', 'RGBA') else image.convert('RGBA')
+
+
+def render_variants(job):
+    """
+    فتح الأصل مرة واحدة وإنشاء كل نسخه؛ يعيد معلومات الأصل والنسخ
+    الكتابة إلى ملف مؤقت ثم استبداله، فلا تبقى نسخة ناقصة عند الانقطاع
+    """
+    path, digest, out_dir, settings, widths, formats, quality = job
+    Image, ImageOps = _require_pillow()
+    with Image.open(path) as opened:
+        image = ImageOps.exif_transpose(opened)
+        image.load()
+    original_width, original_height = image.size
+
+    targets = sorted({w for w in widths if w < original_width} | {min(max(widths), original_width)})
+    variants = []
+    for width in targets:
+        height = max(1, round(original_height * width / original_width))
+        resized = image if width == original_width else image.resize((width, height), Image.LANCZOS)
+        for fmt in formats:
+            name = variant_name(digest, settings, width, fmt)
+            target = os.path.join(out_dir, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp = f'{target}.{os.getpid()}.tmp'
+            options = {'quality': quality[fmt], 'optimize': True}
+            if fmt == 'jpeg':
+                options['progressive'] = True
+            else:
+                options['method'] = 4
+            _prepare(Image, resized, fmt).save(tmp, format=fmt.upper(), **options)
+            os.replace(tmp, target)
+            variants.append({'width': width, 'height': height, 'format': fmt,
+                             'path': name, 'bytes': os.path.getsize(target)})
+    return digest, {'width': original_width, 'height': original_height, 'variants': variants}
+
+
+# ---------------------------------------------------------------------------
+# الدفعة
+# ---------------------------------------------------------------------------
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _cached(entry, settings, out_dir):
+    """نسخ الأصل موجودة مسبقاً بنفس الإعدادات"""
+    return (entry.get('settings') == settings and entry.get('variants')
+            and all(os.path.exists(os.path.join(out_dir, v['path'])) for v in entry['variants']))
+
+
+def optimise_directory(source_dir, out_dir, widths=DEFAULT_WIDTHS, formats=DEFAULT_FORMATS,
+                       quality=None, workers=None, force=False, base_url=None):
+    """
+    معالجة كل الأصول وكتابة manifest.json؛ يعيد (manifest, stats)
+
+    البصمة تُعاد حسابها فقط إذا تغير حجم الملف أو وقت تعديله، والنسخ
+    تُنشأ فقط للبصمات التي ليس لها نسخ كاملة بنفس الإعدادات.
+    """
+    quality = {**DEFAULT_QUALITY, **(quality or {})}
+    quality = {fmt: quality[fmt] for fmt in formats}
+    settings = settings_key(widths, formats, quality)
+    os.makedirs(out_dir, exist_ok=True)
+
+    previous = {} if force else load_manifest(out_dir).get('originals', {})
+    by_digest = {}
+    for entry in previous.values():
+        if _cached(entry, settings, out_dir):
+            by_digest.setdefault(entry['digest'], entry)
+
+    stats = {'originals': 0, 'hashed': 0, 'rendered': 0, 'cached': 0, 'failed': 0,
+             'original_bytes': 0, 'variant_bytes': 0}
+    originals = {}
+    pending = {}
+    for relative, full in scan_originals(source_dir):
+        stats['originals'] += 1
+        stat = os.stat(full)
+        old = previous.get(relative, {})
+        if old.get('size') == stat.st_size and old.get('mtime_ns') == stat.st_mtime_ns:
+            digest = old['digest']
+        else:
+            digest = file_digest(full)
+            stats['hashed'] += 1
+        originals[relative] = {'digest': digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        stats['original_bytes'] += stat.st_size
+        if digest in by_digest:
+            stats['cached'] += 1
+        elif digest not in pending:
+            pending[digest] = full
+
+    rendered = {}
+    jobs = [(full, digest, out_dir, settings, tuple(widths), tuple(formats), quality)
+            for digest, full in pending.items()]
+    workers = workers or os.cpu_count() or 1
+    if jobs:
+        if workers == 1 or len(jobs) < 4:
+            results = map(_render_safely, jobs)
+            rendered.update(r for r in results if r[1] is not None)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunksize = max(1, len(jobs) // (workers * 8))
+                rendered.update(r for r in pool.map(_render_safely, jobs, chunksize=chunksize)
+                                if r[1] is not None)
+    stats['rendered'] = len(rendered)
+    stats['failed'] = len(jobs) - len(rendered)
+
+    entries = {}
+    for relative, info in originals.items():
+        result = rendered.get(info['digest']) or by_digest.get(info['digest'])
+        if result is None:
+            continue
+        variants = [dict(v) for v in result['variants']]
+        if base_url:
+            for variant in variants:
+                variant['url'] = f"{base_url.rstrip('/')}/{variant['path']}"
+        entries[relative] = {**info, 'settings': settings, 'width': result['width'],
+                             'height': result['height'], 'variants': variants}
+        stats['variant_bytes'] += sum(v['bytes'] for v in variants)
+
+    manifest = {
+        'version': PIPELINE_VERSION,
+        'settings': {'key': settings, 'widths': sorted(widths), 'formats': list(formats), 'quality': quality},
+        'originals': entries,
+    }
+    tmp_path = os.path.join(out_dir, MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, os.path.join(out_dir, MANIFEST_NAME))
+    return manifest, stats
+
+
+def _render_safely(job):
+    # صورة تالفة واحدة لا توقف الدفعة كلها
+    try:
+        return render_variants(job)
+    except SystemExit:
+        raise
+    except Exception as e:
+        print(f"   ⚠️ {job[0]}: {e}")
+        return job[1], None
+
+
+def pick_variant(entry, width, fmt='webp'):
+    """أصغر نسخة بعرض >= width (أو الأكبر المتاح)؛ لاستخدامها عند تحديث الروابط"""
+    candidates = sorted((v for v in entry['variants'] if v['format'] == fmt), key=lambda v: v['width'])
+    if not candidates:
+        return None
+    for variant in candidates:
+        if variant['width'] >= width:
+            return variant
+    return candidates[-1]
+
+
+# ---------------------------------------------------------------------------
+# واجهة سطر الأوامر
+# ---------------------------------------------------------------------------
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate resized WebP/JPEG variants for a directory of images')
+    parser.add_argument('source', help='directory of original images (e.g. an exported Storage bucket)')
+    parser.add_argument('--out', required=True, help='output directory for variants and manifest.json')
+    parser.add_argument('--widths', type=int, nargs='+', default=list(DEFAULT_WIDTHS),
+                        help=f"variant widths in pixels (default: {' '.join(map(str, DEFAULT_WIDTHS))})")
+    parser.add_argument('--formats', nargs='+', choices=sorted(FORMAT_EXTENSIONS),
+                        default=list(DEFAULT_FORMATS), help='output formats (default: webp jpeg)')
+    parser.add_argument('--webp-quality', type=int, default=DEFAULT_QUALITY['webp'])
+    parser.add_argument('--jpeg-quality', type=int, default=DEFAULT_QUALITY['jpeg'])
+    parser.add_argument('--base-url', help='public URL of the output directory, added to each variant in the manifest')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='ignore the previous manifest and re-render everything')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.isdir(args.source):
+        print(f"❌ المجلد غير موجود: {args.source}")
+        sys.exit(2)
+    _require_pillow()
+
+    print(f"🖼️  تحسين الصور من {args.source} إلى {args.out}...")
+    started = time.perf_counter()
+    _, stats = optimise_directory(
+        args.source, args.out, args.widths, args.formats,
+        quality={'webp': args.webp_quality, 'jpeg': args.jpeg_quality},
+        workers=args.workers, force=args.force, base_url=args.base_url)
+    elapsed = time.perf_counter() - started
+
+    print(f"   ✅ {format_throughput('الأصول', stats['originals'], elapsed)}")
+    print(f"   • {stats['rendered']} معالجة جديدة، {stats['cached']} من الذاكرة المؤقتة، "
+          f"{stats['hashed']} بصمة محسوبة")
+    if stats['failed']:
+        print(f"   ⚠️ {stats['failed']} صورة فشلت معالجتها")
+    print(f"   • الحجم: {stats['original_bytes'] / 1024:.0f} ك.ب أصلي → "
+          f"{stats['variant_bytes'] / 1024:.0f} ك.ب لكل النسخ")
+    print(f"📄 {os.path.join(args.out, MANIFEST_NAME)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+مولّد حمل الطلبات (محاكاة ساعة الذروة)
+Synthetic order-traffic load generator
+
+يبدأ طلبات جديدة بمعدل ثابت (وصول Poisson) ويمر كل طلب بدورة حياته كما
+يكتبها التطبيق:
+
+    إنشاء → تأكيد التاجر → تعيين سائق → تحديثات GPS → تم التوصيل
+
+مع الإشعارات ورسائل المحادثة ومستند delivery_tracking، أي نفس الكتابات التي
+تحرك المستمعين الفوريين في التطبيق. في النهاية يطبع زمن الكتابة (p50/p90/p99)
+لكل نوع عملية وعدد العمليات المحققة في الثانية.
+
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python scripts/order_load.py --rate 20 --duration 60
+    python scripts/order_load.py --fake --latency-ms 15 --rate 50 --duration 30
+
+مع --profile تُقاس كل مرحلة من دورة الطلب (order_create، gps_update، ...)
+كمرحلة مستقلة بطلباتها.
+
+كل المستندات المنشأة تحمل load_run، و --cleanup يحذفها بعد التشغيل.
+يرفض السكربت العمل بدون المحاكي أو --fake؛ الكتابة في مشروع حقيقي تتطلب
+--allow-live مع تأكيد يدوي. لا تشغّله على قاعدة الإنتاج.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import firestore_session
+import profiling
+from batch_writer import BatchWriter, MAX_BATCH_SIZE
+
+# مركز الخرطوم؛ مسارات GPS تبدأ قربه
+BASE_LOCATION = (15.5007, 32.5599)
+
+PRODUCT_NAMES = ['عطر ورد', 'حقيبة يد', 'ساعة', 'قميص', 'بخور', 'كريم', 'هاتف', 'حذاء']
+
+# عدد المعرّفات المقروءة من كل مجموعة ملفات شخصية
+PROFILE_SAMPLE = 200
+
+
+class LatencyRecorder:
+    """تجميع أزمنة الكتابة لكل نوع عملية (من حلقة asyncio واحدة فلا حاجة لقفل)"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, op, seconds):
+        self.samples[op].append(seconds)
+
+    def error(self, op):
+        self.errors[op] += 1
+
+    @property
+    def total(self):
+        return sum(len(values) for values in self.samples.values())
+
+    def summary(self):
+        rows = {op: summarise(values) for op, values in sorted(self.samples.items())}
+        rows['all'] = summarise([v for values in self.samples.values() for v in values])
+        for op, count in self.errors.items():
+            rows.setdefault(op, summarise([]))['errors'] = count
+        rows['all']['errors'] = sum(self.errors.values())
+        return rows
+
+
+def percentile(sorted_values, q):
+    """النسبة المئوية بطريقة nearest-rank؛ القائمة مرتبة مسبقاً"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, -(-q * len(sorted_values) // 100) - 1))
+    return sorted_values[int(index)]
+
+
+def summarise(values):
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'errors': 0,
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p90_ms': percentile(ordered, 90) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+        'max_ms': (ordered[-1] if ordered else 0.0) * 1000,
+    }
+
+
+def load_actors(db, sample=PROFILE_SAMPLE):
+    """
+    معرّفات حقيقية من القاعدة إن وجدت (بدون الحقول)، وإلا معرّفات تركيبية
+    يعيد {'merchants': [...], 'buyers': [...], 'offices': [...], 'drivers': {office: [...]}}
+    """
+    def ids(collection_name, fields=('__name__',)):
+        query = db.collection(collection_name).select(list(fields)).limit(sample)
+        return [(s.id, s.to_dict() or {}) for s in query.stream()]
+
+    actors = {
+        'merchants': [i for i, _ in ids('merchants')] or [f'load-merchant-{n:03d}' for n in range(20)],
+        'buyers': [i for i, _ in ids('buyers')] or [f'load-buyer-{n:03d}' for n in range(100)],
+        'offices': [i for i, _ in ids('delivery_offices')] or [f'load-office-{n:02d}' for n in range(5)],
+    }
+    drivers = defaultdict(list)
+    for driver_id, data in ids('drivers', ['office_id']):
+        drivers[data.get('office_id')].append(driver_id)
+    for office in actors['offices']:
+        if not drivers.get(office):
+            drivers[office] = [f'load-driver-{office}-{n}' for n in range(3)]
+    actors['drivers'] = dict(drivers)
+    return actors
+
+
+def _in_phase(name, func):
+    # المراحل لكل خيط، والمهام تتداخل في حلقة asyncio؛ المرحلة تُفتح داخل العامل
+    def run(*args):
+        with profiling.phase(name):
+            return func(*args)
+    return run
+
+
+class OrderTraffic:
+    """
+    تشغيل دورات حياة الطلبات وقياس زمن كل كتابة
+
+    العميل متزامن (نفس العميل الذي تستخدمه بقية السكربتات)، لذلك تُنفذ كل
+    كتابة في مجموعة خيوط محدودة (concurrency) وتنتظرها حلقة asyncio؛ الزمن
+    المقاس يشمل الانتظار في الطابور، كما يراه التطبيق تحت الضغط.
+    """
+
+    def __init__(self, db, actors, step_delay=0.5, gps_updates=10, gps_interval=0.2,
+                 concurrency=32, seed=None):
+        self.db = db
+        self.actors = actors
+        self.step_delay = step_delay
+        self.gps_updates = gps_updates
+        self.gps_interval = gps_interval
+        self.rng = random.Random(seed)
+        self.run_id = uuid.UUID(int=self.rng.getrandbits(128)).hex[:8]
+        self.executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        self.recorder = LatencyRecorder()
+        self.created = []
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+
+    async def _write(self, op, func, *args):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            await loop.run_in_executor(self.executor, _in_phase(op, func), *args)
+        except Exception:
+            self.recorder.error(op)
+            raise
+        self.recorder.add(op, time.perf_counter() - started)
+
+    async def _pause(self, mean):
+        if mean > 0:
+            await asyncio.sleep(self.rng.expovariate(1.0 / mean))
+
+    def _ref(self, collection_name, doc_id=None):
+        ref = self.db.collection(collection_name).document(doc_id) if doc_id \
+            else self.db.collection(collection_name).document()
+        self.created.append(ref)
+        return ref
+
+    def _notify(self, user_id, title, kind, order_id):
+        return self._write('notification', self._ref('notifications').set, {
+            'user_id': user_id,
+            'title': title,
+            'body': title,
+            'type': kind,
+            'order_id': order_id,
+            'timestamp': firestore_session.server_timestamp(),
+            'read': False,
+            'load_run': self.run_id,
+        })
+
+    def _new_order(self, number):
+        rng = self.rng
+        merchant_id = rng.choice(self.actors['merchants'])
+        buyer_id = rng.choice(self.actors['buyers'])
+        office_id = rng.choice(self.actors['offices'])
+        items = []
+        for _ in range(rng.randint(1, 4)):
+            quantity = rng.randint(1, 3)
+            items.append({'product_id': f'load-product-{rng.randrange(500)}',
+                          'product_name': rng.choice(PRODUCT_NAMES),
+                          'quantity': quantity,
+                          'price': round(rng.uniform(2000, 60000), -2)})
+        total = sum(item['price'] * item['quantity'] for item in items)
+        return {
+            'order_number': f'LOAD-{self.run_id}-{number:06d}',
+            'user_id': buyer_id,
+            'buyer_id': buyer_id,
+            'merchant_id': merchant_id,
+            'delivery_office_id': office_id,
+            'order_date': datetime.now(timezone.utc),
+            'status': 'pending',
+            'merchant_confirmed': False,
+            'items': items,
+            'items_count': len(items),
+            'total_price': total,
+            'total_amount': total,
+            'phone_number': f'+2499{rng.randrange(10**8):08d}',
+            'delivery_address': 'الخرطوم',
+            'load_run': self.run_id,
+        }
+
+    async def order_lifecycle(self, number):
+        """دورة طلب واحد كاملة"""
+        self.started += 1
+        order = self._new_order(number)
+        order_ref = self._ref('orders', f"load-{self.run_id}-{number:06d}")
+        order_id = order_ref.id
+        try:
+            await self._write('order_create', order_ref.set, order)
+            await self._notify(order['merchant_id'], 'طلب جديد', 'new_order', order_id)
+
+            await self._pause(self.step_delay)
+            await self._write('order_confirm', order_ref.update, {
+                'merchant_confirmed': True,
+                'status': 'confirmed',
+                'confirmed_at': firestore_session.server_timestamp(),
+            })
+            message_ref = self.db.collection('chats').document(f'load-{order_id}').collection('messages').document()
+            self.created.append(message_ref)
+            await self._write('chat_message', message_ref.set, {
+                'sender_id': 'system',
+                'message': 'تم تأكيد طلبك',
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'is_read': False,
+                'load_run': self.run_id,
+            })
+            await self._notify(order['buyer_id'], 'تم تأكيد طلبك', 'order_confirmed', order_id)
+
+            await self._pause(self.step_delay)
+            office_id = order['delivery_office_id']
+            driver_id = self.rng.choice(self.actors['drivers'][office_id])
+            await self._write('order_assign', order_ref.update, {
+                'status': 'in_delivery',
+                'driver_id': driver_id,
+                'assigned_at': firestore_session.server_timestamp(),
+            })
+
+            tracking_ref = self._ref('delivery_tracking', order_id)
+            lat, lng = BASE_LOCATION
+            lat += self.rng.uniform(-0.1, 0.1)
+            lng += self.rng.uniform(-0.1, 0.1)
+            heading = self.rng.uniform(0, 360)
+            for _ in range(self.gps_updates):
+                await self._pause(self.gps_interval)
+                lat += self.rng.uniform(-0.002, 0.002)
+                lng += self.rng.uniform(-0.002, 0.002)
+                await self._write('gps_update', tracking_ref.set, {
+                    'order_id': order_id,
+                    'driver_id': driver_id,
+                    'latitude': lat,
+                    'longitude': lng,
+                    'timestamp': firestore_session.server_timestamp(),
+                    'speed': self.rng.uniform(0, 15),
+                    'heading': heading,
+                    'load_run': self.run_id,
+                }, True)
+
+            await self._pause(self.step_delay)
+            await self._write('order_deliver', order_ref.update, {
+                'status': 'delivered',
+                'delivered_at': firestore_session.server_timestamp(),
+            })
+            await self._notify(order['buyer_id'], 'تم توصيل طلبك', 'order_delivered', order_id)
+            self.completed += 1
+        except Exception:
+            self.failed += 1
+
+    async def run(self, rate, duration, max_orders=None):
+        """
+        وصول مفتوح (open loop): الطلبات تبدأ حسب الجدول الزمني مهما كان بطء
+        الكتابات، فيظهر أثر التشبع في الزمن بدلاً من أن يخفض الحمل نفسه
+        """
+        started = time.perf_counter()
+        tasks = []
+        next_start = 0.0
+        number = 0
+        while next_start < duration and (max_orders is None or number < max_orders):
+            delay = started + next_start - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(self.order_lifecycle(number)))
+            number += 1
+            next_start += self.rng.expovariate(rate)
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        self.executor.shutdown(wait=True)
+        return self.report(elapsed, rate)
+
+    def report(self, elapsed, rate):
+        writes = self.recorder.total
+        return {
+            'run_id': self.run_id,
+            'target_orders_per_sec': rate,
+            'elapsed': elapsed,
+            'orders_started': self.started,
+            'orders_completed': self.completed,
+            'orders_failed': self.failed,
+            'writes': writes,
+            'ops_per_sec': writes / elapsed if elapsed > 0 else 0.0,
+            'orders_per_sec': self.completed / elapsed if elapsed > 0 else 0.0,
+            'latency': self.recorder.summary(),
+        }
+
+    def cleanup(self, batch_size=MAX_BATCH_SIZE):
+        """حذف كل ما أنشأه التشغيل"""
+        with profiling.phase('cleanup'), BatchWriter(self.db, batch_size=batch_size, label='cleanup') as writer:
+            for ref in self.created:
+                writer.delete(ref)
+        return writer.writes
+
+
+def print_report(report):
+    print(f"\n📊 التشغيل {report['run_id']}: {report['orders_completed']}/{report['orders_started']} طلب مكتمل "
+          f"في {report['elapsed']:.1f} ث"
+          + (f"، ⚠️ {report['orders_failed']} فشل" if report['orders_failed'] else ''))
+    print(f"   • {report['writes']} كتابة → {report['ops_per_sec']:.0f} عملية/ث، "
+          f"{report['orders_per_sec']:.1f} طلب/ث (المستهدف {report['target_orders_per_sec']:g} طلب/ث)")
+    header = f"{'operation':<16}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print()
+    print(header)
+    print('-' * len(header))
+    for op, row in report['latency'].items():
+        print(f"{op:<16}{row['count']:>8}{row['errors']:>8}{row['p50_ms']:>10.1f}"
+              f"{row['p90_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Drive synthetic order lifecycles against Firestore')
+    parser.add_argument('--rate', type=float, default=10.0, help='new orders per second (default: 10)')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to keep starting orders (default: 30)')
+    parser.add_argument('--max-orders', type=int, default=None, help='stop after starting this many orders')
+    parser.add_argument('--step-delay', type=float, default=0.5,
+                        help='mean seconds between lifecycle steps (default: 0.5)')
+    parser.add_argument('--gps-updates', type=int, default=10, help='GPS writes per delivery (default: 10)')
+    parser.add_argument('--gps-interval', type=float, default=0.2,
+                        help='mean seconds between GPS writes (default: 0.2)')
+    parser.add_argument('--concurrency', type=int, default=32,
+                        help='writes in flight at once (default: 32)')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for reproducible traffic')
+    parser.add_argument('--fake', action='store_true', help='run against the in-process FakeFirestore')
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help='simulated RPC latency for --fake (default: 0)')
+    parser.add_argument('--allow-live', action='store_true',
+                        help='allow writing to a real project when FIRESTORE_EMULATOR_HOST is not set '
+                             '(asks for confirmation)')
+    parser.add_argument('--cleanup', action='store_true', help='delete everything the run created afterwards')
+    parser.add_argument('--json', metavar='PATH', help='write the report to a JSON file')
+    profiling.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.rate <= 0:
+        parser.error('--rate must be positive')
+    return args
+
+
+def confirm_live():
+    """
+    يطلب تأكيداً صريحاً قبل كتابة الحمل في مشروع حقيقي
+    Ask the operator to type 'live' before writing to a real project
+    """
+    print("⚠️  FIRESTORE_EMULATOR_HOST غير مضبوط: الحمل سيُكتب في المشروع الحقيقي")
+    try:
+        answer = input("اكتب live للمتابعة: ")
+    except EOFError:
+        return False
+    return answer.strip().lower() == 'live'
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.fake:
+        from fake_firestore import FakeFirestore
+        firestore_session.set_client(FakeFirestore(latency=args.latency_ms / 1000, seed=args.seed), 'fake')
+    elif not os.environ.get(firestore_session.EMULATOR_HOST_ENV):
+        if not args.allow_live:
+            print("❌ FIRESTORE_EMULATOR_HOST غير مضبوط. استخدم المحاكي أو --fake، "
+                  "أو --allow-live للكتابة في المشروع الحقيقي")
+            sys.exit(2)
+        if not confirm_live():
+            print("❌ تم الإلغاء")
+            sys.exit(2)
+    with profiling.session('order_load', args):
+        run(args)
+
+
+def run(args):
+    try:
+        db = firestore_session.get_db()
+    except Exception as e:
+        print(f"❌ خطأ في الاتصال بـ Firebase: {e}")
+        sys.exit(1)
+
+    with profiling.phase('load actors'):
+        actors = load_actors(db)
+    traffic = OrderTraffic(db, actors, args.step_delay, args.gps_updates, args.gps_interval,
+                           args.concurrency, args.seed)
+    print(f"🚚 {args.rate:g} طلب/ث لمدة {args.duration:g} ث ({firestore_session.session_mode()}, "
+          f"{len(actors['merchants'])} تاجر، {len(actors['offices'])} مكتب) - التشغيل {traffic.run_id}")
+    report = asyncio.run(traffic.run(args.rate, args.duration, args.max_orders))
+    print_report(report)
+
+    if args.cleanup:
+        print(f"\n🧹 حذف {traffic.cleanup()} مستند أنشأه التشغيل")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 {args.json}")
+
+
+if __name__ == '__main__':
+    main()
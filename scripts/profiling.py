@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس زمن المراحل وطلبات Firestore في سكربتات الإدارة
+Per-phase timing, Firestore RPC counts and profiler dumps for the admin scripts
+
+كل سكربت يضيف الخيارات بـ add_arguments(parser) ويشغّل جسمه داخل
+session(...)، ويحدد مراحله بـ phase(name):
+
+    with profiling.session('cleanup_test_data', args):
+        with profiling.phase('orders'):
+            ...
+
+    python cleanup_test_data.py --profile                  # profile-cleanup_test_data-<وقت>.json
+    python scripts/add_drivers_vehicles_data.py --profile run.json --cprofile run.pstats
+    python scripts/ttl_sweeper.py --flamegraph sweep.folded   # flamegraph.pl / speedscope
+
+الطلبات تُعد بتغليف دوال أصناف العميل الفعلي (الحقيقي أو FakeFirestore)
+أثناء الجلسة فقط، وتُنسب للمرحلة المفتوحة في الخيط الذي أرسلها:
+
+- stream: Query.stream (والمستندات المقروءة منه)
+- query: Query.get و count().get و get_partitions و list_documents
+- get: DocumentReference.get و get_all
+- write: كتابة مستند منفرد (set/update/delete/create/add)، كل منها commit مستقل
+- commit: WriteBatch.commit
+
+بدون هذه الخيارات phase() لا يفعل شيئاً ولا تُغلف أي دالة.
+"""
+
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+import firestore_session
+
+RPC_KINDS = ('stream', 'query', 'get', 'write', 'commit')
+UNATTRIBUTED = '(خارج المراحل)'
+SAMPLE_INTERVAL = 0.005
+
+# (اسم الكائن النموذجي، الدالة، نوع الطلب، طريقة عد المستندات)
+# النوع None: عملية محلية بدون طلب (إضافة مستند إلى دفعة)
+_METHODS = [
+    ('query', 'stream', 'stream', 'iter'),
+    ('query', 'get', 'query', 'list'),
+    ('query', 'get_partitions', 'query', None),
+    ('collection', 'stream', 'stream', 'iter'),
+    ('collection', 'get', 'query', 'list'),
+    ('collection', 'list_documents', 'query', 'iter'),
+    ('collection', 'add', 'write', 'written'),
+    ('group', 'stream', 'stream', 'iter'),
+    ('group', 'get', 'query', 'list'),
+    ('group', 'get_partitions', 'query', None),
+    ('aggregation', 'get', 'query', 'one'),
+    ('document', 'get', 'get', 'one'),
+    ('client', 'get_all', 'get', 'iter'),
+    ('batch', 'commit', 'commit', None),
+]
+_METHODS += [('document', name, 'write', 'written') for name in ('create', 'set', 'update', 'delete')]
+_METHODS += [('batch', name, None, 'written') for name in ('create', 'set', 'update', 'delete')]
+
+_active = None
+
+
+def _new_counts():
+    return {'rpcs': dict.fromkeys(RPC_KINDS, 0), 'documents_read': 0, 'documents_written': 0}
+
+
+class _PhaseStats:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.elapsed = 0.0
+        self.counts = _new_counts()
+
+    def to_dict(self):
+        return {'name': self.name, 'calls': self.calls, 'elapsed': round(self.elapsed, 6), **self.counts}
+
+
+class Profiler:
+    """
+    جلسة قياس واحدة؛ آمنة مع الخيوط (السكربتات تحذف وتقرأ بالتوازي)
+
+    الطلبات المتداخلة (مثل Query.get التي تستدعي stream داخلياً في العميل
+    الحقيقي) تُعد مرة واحدة فقط بعداد عمق لكل خيط.
+    """
+
+    def __init__(self, script, argv=()):
+        self.script = script
+        self.argv = list(argv)
+        self.started_at = None
+        self.elapsed = 0.0
+        self.totals = _new_counts()
+        self.phases = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._patched = []
+        self._instrumented = set()
+        self._started = None
+
+    # -- المراحل ------------------------------------------------------------
+
+    def _stack(self):
+        stack = getattr(self._local, 'phases', None)
+        if stack is None:
+            stack = self._local.phases = []
+        return stack
+
+    def _phase_stats(self, name):
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = _PhaseStats(name)
+        return stats
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        stack = self._stack()
+        stack.append(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            stack.pop()
+            with self._lock:
+                stats = self._phase_stats(name)
+                stats.calls += 1
+                stats.elapsed += elapsed
+
+    def _record(self, kind=None, read=0, written=0):
+        stack = self._stack()
+        name = stack[-1] if stack else UNATTRIBUTED
+        with self._lock:
+            for counts in (self.totals, self._phase_stats(name).counts):
+                if kind:
+                    counts['rpcs'][kind] += 1
+                counts['documents_read'] += read
+                counts['documents_written'] += written
+
+    # -- تغليف العميل ---------------------------------------------------------
+
+    def instrument(self, client):
+        """تغليف دوال أصناف هذا العميل (مرة واحدة لكل صنف)"""
+        collection = client.collection('_profiling')
+        samples = {
+            'client': client,
+            'collection': collection,
+            'document': collection.document('_profiling'),
+            'query': collection.limit(1),
+            'group': client.collection_group('_profiling'),
+            'batch': client.batch(),
+        }
+        if hasattr(collection, 'count'):
+            samples['aggregation'] = collection.count()
+
+        for sample, method, kind, reads in _METHODS:
+            if sample not in samples:
+                continue
+            # التغليف في الصنف الذي يعرّف الدالة، حتى لا تُغلف الدالة الموروثة مرتين
+            owner = next((cls for cls in type(samples[sample]).__mro__ if method in vars(cls)), None)
+            if owner is None or (owner, method) in self._instrumented:
+                continue
+            original = vars(owner)[method]
+            setattr(owner, method, self._wrap(original, kind, reads))
+            self._instrumented.add((owner, method))
+            self._patched.append((owner, method, original))
+
+    def _wrap(self, original, kind, reads):
+        profiler = self
+
+        def wrapper(*args, **kwargs):
+            local = profiler._local
+            depth = getattr(local, 'depth', 0)
+            if depth:
+                return original(*args, **kwargs)
+            local.depth = 1
+            try:
+                result = original(*args, **kwargs)
+            finally:
+                local.depth = depth
+            if reads == 'iter':
+                profiler._record(kind)
+                return profiler._counted(result)
+            profiler._record(kind,
+                             read=len(result) if reads == 'list' else int(reads == 'one'),
+                             written=int(reads == 'written'))
+            return result
+
+        wrapper.__name__ = getattr(original, '__name__', 'wrapper')
+        wrapper.__doc__ = getattr(original, '__doc__', None)
+        return wrapper
+
+    def _counted(self, iterable):
+        # كل next() داخل عداد العمق: العميل الحقيقي يبدأ الطلب الداخلي عند أول قراءة
+        local = self._local
+        local.depth = getattr(local, 'depth', 0) + 1
+        try:
+            iterator = iter(iterable)
+        finally:
+            local.depth -= 1
+        while True:
+            local.depth = getattr(local, 'depth', 0) + 1
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                local.depth -= 1
+            self._record(read=1)
+            yield item
+
+    def uninstrument(self):
+        for owner, method, original in reversed(self._patched):
+            setattr(owner, method, original)
+        self._patched.clear()
+        self._instrumented.clear()
+
+    # -- الجلسة والتقرير ------------------------------------------------------
+
+    def start(self):
+        self.started_at = datetime.now().astimezone()
+        self._started = time.perf_counter()
+
+    def stop(self):
+        self.elapsed = time.perf_counter() - self._started
+        self.uninstrument()
+
+    def report(self):
+        phases = [stats.to_dict() for stats in self.phases.values()]
+        return {
+            'script': self.script,
+            'argv': self.argv,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'elapsed': round(self.elapsed, 6),
+            'mode': firestore_session.session_mode(),
+            'cold_start': firestore_session.cold_start_seconds(),
+            **self.totals,
+            'phases': phases,
+        }
+
+
+class StackSampler:
+    """
+    عينات من مكدسات كل الخيوط بصيغة folded (سطر لكل مكدس: a;b;c العدد)
+    التي يقرؤها flamegraph.pl و speedscope؛ cProfile يرى الخيط الرئيسي فقط
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            names.update((t.ident, t.name) for t in threading.enumerate())
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                calls = []
+                while frame is not None:
+                    code = frame.f_code
+                    calls.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                key = ';'.join([names.get(ident, str(ident))] + calls[::-1])
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f'{stack} {count}\n')
+
+
+# ---------------------------------------------------------------------------
+# واجهة السكربتات
+# ---------------------------------------------------------------------------
+
+def phase(name):
+    """مرحلة مقاسة داخل الجلسة الحالية، أو لا شيء بدون --profile"""
+    return _active.phase(name) if _active is not None else contextlib.nullcontext()
+
+
+def bind(fn):
+    """
+    fn تُنفذ في خيط عامل وتُنسب طلباتها للمرحلة المفتوحة عند الاستدعاء
+    (المراحل لكل خيط، والعمال لا يرثونها)
+    """
+    profiler = _active
+    if profiler is None:
+        return fn
+    names = list(profiler._stack())
+
+    @functools.wraps(fn)
+    def bound(*args, **kwargs):
+        stack = profiler._stack()
+        depth = len(stack)
+        stack.extend(names)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            del stack[depth:]
+    return bound
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group('profiling')
+    group.add_argument('--profile', nargs='?', const='', metavar='PATH',
+                       help='write a JSON report of per-phase wall time and Firestore RPCs '
+                            '(default path: profile-<script>-<time>.json)')
+    group.add_argument('--cprofile', metavar='PATH',
+                       help='dump cProfile stats of the main thread (snakeviz, flameprof, gprof2dot)')
+    group.add_argument('--flamegraph', metavar='PATH',
+                       help='write sampled stacks of all threads in folded format (flamegraph.pl, speedscope)')
+    return group
+
+
+def print_report(report):
+    print("\n⏱️  تقرير الأداء")
+    header = f"   {'phase':<28} {'calls':>5} {'sec':>8} " + ' '.join(f'{k:>7}' for k in RPC_KINDS) \
+             + f" {'read':>8} {'written':>8}"
+    print(header)
+    print('   ' + '-' * (len(header) - 3))
+    rows = sorted(report['phases'], key=lambda p: -p['elapsed']) + [
+        {'name': 'total', 'calls': 1, 'elapsed': report['elapsed'], **{k: report[k] for k in
+         ('rpcs', 'documents_read', 'documents_written')}}]
+    for row in rows:
+        print(f"   {row['name'][:28]:<28} {row['calls']:>5} {row['elapsed']:>8.2f} "
+              + ' '.join(f"{row['rpcs'][k]:>7}" for k in RPC_KINDS)
+              + f" {row['documents_read']:>8} {row['documents_written']:>8}")
+
+
+@contextlib.contextmanager
+def session(script, args, argv=None):
+    """
+    تشغيل جسم السكربت مع القياس إذا طُلب أحد خيارات add_arguments
+
+    التقرير يُكتب حتى عند الخروج بـ sys.exit أو بخطأ، فالتشغيل الفاشل يُقاس أيضاً.
+    """
+    global _active
+    json_path = getattr(args, 'profile', None)
+    cprofile_path = getattr(args, 'cprofile', None)
+    flamegraph_path = getattr(args, 'flamegraph', None)
+    if json_path is None and not cprofile_path and not flamegraph_path:
+        yield None
+        return
+
+    profiler = Profiler(script, sys.argv[1:] if argv is None else argv)
+    remove_listener = firestore_session.add_client_listener(profiler.instrument)
+    sampler = StackSampler() if flamegraph_path else None
+    cprofiler = cProfile.Profile() if cprofile_path else None
+    _active = profiler
+    profiler.start()
+    if sampler:
+        sampler.start()
+    if cprofiler:
+        cprofiler.enable()
+    try:
+        yield profiler
+    finally:
+        if cprofiler:
+            cprofiler.disable()
+        if sampler:
+            sampler.stop()
+        profiler.stop()
+        remove_listener()
+        _active = None
+
+        report = profiler.report()
+        print_report(report)
+        if json_path is not None:
+            path = json_path or f"profile-{script}-{profiler.started_at:%Y%m%d-%H%M%S}.json"
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"   📄 {path}")
+        if cprofiler:
+            cprofiler.dump_stats(cprofile_path)
+            print(f"   📄 {cprofile_path} (cProfile)")
+        if sampler:
+            sampler.write(flamegraph_path)
+            print(f"   📄 {flamegraph_path} ({sum(sampler.stacks.values())} عينة)")
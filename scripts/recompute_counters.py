@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+إعادة حساب العدادات المخزنة في الملفات الشخصية
+Recompute denormalised profile counters with one parallel scan
+
+تُقرأ orders و products و drivers مرة واحدة فقط (الحقول المطلوبة فقط) على
+أجزاء متوازية عبر get_partitions، وتُجمع العدادات في الذاكرة، ثم يُكتب ما
+تغير منها فقط:
+
+- merchants: total_products, total_orders, total_sales
+- buyers: total_orders, total_spent
+- delivery_offices: total_deliveries, active_drivers
+
+الملفات الشخصية التي لا تظهر في أي مصدر لا تُلمس؛ --reset-missing يصفّر
+عداداتها.
+"""
+
+import argparse
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import firestore_session
+import profiling
+from batch_writer import BatchWriter, MAX_BATCH_SIZE, format_throughput
+
+# المجموعات المقروءة والحقول المطلوبة من كل منها
+SOURCES = {
+    'orders': ['merchant_id', 'buyer_id', 'user_id', 'delivery_office_id', 'status', 'total_price', 'total_amount'],
+    'products': ['merchant_id'],
+    'drivers': ['office_id', 'is_active'],
+}
+
+# العدادات في كل مجموعة ملفات شخصية
+COUNTERS = {
+    'merchants': ('total_products', 'total_orders', 'total_sales'),
+    'buyers': ('total_orders', 'total_spent'),
+    'delivery_offices': ('total_deliveries', 'active_drivers'),
+}
+
+# الطلبات الملغاة لا تدخل في المبيعات والمصروفات
+CANCELLED_STATUSES = {'cancelled', 'canceled', 'ملغي'}
+DELIVERED_STATUSES = {'delivered', 'completed'}
+
+DEFAULT_PARTITIONS = 8
+
+
+def _order_amount(data):
+    amount = data.get('total_price', data.get('total_amount', 0))
+    return float(amount) if isinstance(amount, (int, float)) else 0.0
+
+
+def _reduce_order(data, totals):
+    status = data.get('status', '')
+    counted = status not in CANCELLED_STATUSES
+    amount = _order_amount(data) if counted else 0.0
+    merchant_id = data.get('merchant_id')
+    if merchant_id:
+        merchant = totals['merchants'][merchant_id]
+        merchant['total_orders'] += 1
+        merchant['total_sales'] += amount
+    # مسار الطلب الرئيسي في التطبيق يكتب user_id فقط (firebase_orders_system.dart)
+    buyer_id = data.get('buyer_id') or data.get('user_id')
+    if buyer_id:
+        buyer = totals['buyers'][buyer_id]
+        buyer['total_orders'] += 1
+        buyer['total_spent'] += amount
+    office_id = data.get('delivery_office_id')
+    if office_id and status in DELIVERED_STATUSES:
+        totals['delivery_offices'][office_id]['total_deliveries'] += 1
+
+
+def _reduce_product(data, totals):
+    merchant_id = data.get('merchant_id')
+    if merchant_id:
+        totals['merchants'][merchant_id]['total_products'] += 1
+
+
+def _reduce_driver(data, totals):
+    office_id = data.get('office_id')
+    if office_id and data.get('is_active', True):
+        totals['delivery_offices'][office_id]['active_drivers'] += 1
+
+
+REDUCERS = {
+    'orders': _reduce_order,
+    'products': _reduce_product,
+    'drivers': _reduce_driver,
+}
+
+
+def _new_totals():
+    return {name: defaultdict(lambda: defaultdict(float)) for name in COUNTERS}
+
+
+def _merge_totals(target, source):
+    for name, entities in source.items():
+        for entity_id, counters in entities.items():
+            merged = target[name][entity_id]
+            for field, value in counters.items():
+                merged[field] += value
+
+
+def _is_top_level(snapshot):
+    # 'orders/o1' وليس 'users/u1/orders/o1'
+    return snapshot.reference.path.count('/') == 1
+
+
+def _scan_query(query, reduce):
+    """قراءة جزء واحد وتجميعه في عدادات محلية (بدون أقفال بين العمال)"""
+    totals = _new_totals()
+    documents = 0
+    for snapshot in query.stream():
+        if not _is_top_level(snapshot):
+            continue
+        reduce(snapshot.to_dict() or {}, totals)
+        documents += 1
+    return totals, documents
+
+
+def scan_collection(db, name, partitions=DEFAULT_PARTITIONS, executor=None):
+    """
+    قراءة مجموعة كاملة على أجزاء متوازية؛ يعيد (العدادات، عدد المستندات)
+
+    get_partitions يقسم المجموعة إلى نطاقات متقاربة الحجم حسب المسار،
+    وكل نطاق يُقرأ في عامل مستقل بالحقول المطلوبة فقط. التقسيم متاح فقط
+    لاستعلامات collection_group التي تشمل المجموعات الفرعية بنفس الاسم، لذلك
+    تُتخطى المستندات غير العليا في الوضعين ولا تتغير النتيجة مع --partitions.
+    """
+    fields = SOURCES[name]
+    if partitions > 1:
+        queries = [p.query().select(fields) for p in db.collection_group(name).get_partitions(partitions)]
+    else:
+        queries = [db.collection(name).select(fields)]
+
+    reduce = REDUCERS[name]
+    results = (executor.map(profiling.bind(lambda q: _scan_query(q, reduce)), queries) if executor
+               else (_scan_query(q, reduce) for q in queries))
+    totals = _new_totals()
+    documents = 0
+    for partial, count in results:
+        _merge_totals(totals, partial)
+        documents += count
+    return totals, documents
+
+
+def compute_totals(db, partitions=DEFAULT_PARTITIONS, workers=8, on_scanned=None):
+    """قراءة كل المصادر بالتوازي ودمجها في عدادات لكل ملف شخصي"""
+    totals = _new_totals()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for name in SOURCES:
+            started = time.perf_counter()
+            with profiling.phase(f'scan {name}'):
+                partial, documents = scan_collection(db, name, partitions, executor)
+            _merge_totals(totals, partial)
+            if on_scanned:
+                on_scanned(name, documents, time.perf_counter() - started)
+    return totals
+
+
+def _normalise(field, value):
+    # المبالغ بخانتين عشريتين، والعدادات أعداد صحيحة
+    if field in ('total_sales', 'total_spent'):
+        return round(float(value), 2)
+    return int(value)
+
+
+def write_changed_counters(db, totals, batch_size=MAX_BATCH_SIZE, reset_missing=False):
+    """
+    مقارنة العدادات المحسوبة بالمخزنة وكتابة الحقول المتغيرة فقط
+
+    الملف الشخصي الذي لا يظهر في البيانات يُترك كما هو ويُحسب ضمن missing،
+    إلا مع reset_missing فيأخذ أصفاراً. المعرّفات المحسوبة التي لا يوجد لها
+    ملف شخصي لا تُنشأ بل تُحسب ضمن orphans.
+    """
+    report = {}
+    for name, fields in COUNTERS.items():
+        collection = db.collection(name)
+        computed = totals[name]
+        seen = set()
+        profiles = changed = missing = 0
+        with profiling.phase(f'write {name}'), \
+                BatchWriter(db, batch_size=batch_size, label=name) as writer:
+            for snapshot in collection.select(list(fields)).stream():
+                profiles += 1
+                seen.add(snapshot.id)
+                if snapshot.id not in computed:
+                    missing += 1
+                    if not reset_missing:
+                        continue
+                stored = snapshot.to_dict() or {}
+                counters = computed.get(snapshot.id, {})
+                updates = {}
+                for field in fields:
+                    value = _normalise(field, counters.get(field, 0))
+                    current = stored.get(field)
+                    if not isinstance(current, (int, float)) or abs(current - value) > 1e-6:
+                        updates[field] = value
+                if updates:
+                    writer.update(collection.document(snapshot.id), updates)
+                    changed += 1
+        report[name] = {
+            'profiles': profiles,
+            'changed': changed,
+            'writes': writer.writes,
+            'commits': writer.commits,
+            'missing': missing,
+            'orphans': len(set(computed) - seen),
+        }
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Recompute denormalised counters on profile documents')
+    parser.add_argument('--partitions', type=int, default=DEFAULT_PARTITIONS,
+                        help=f'parallel cursors per source collection (default: {DEFAULT_PARTITIONS})')
+    parser.add_argument('--workers', type=int, default=8, help='reader threads (default: 8)')
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE,
+                        help=f'writes per batch commit, max {MAX_BATCH_SIZE}')
+    parser.add_argument('--reset-missing', action='store_true',
+                        help='zero the counters of profiles that no order, product or driver refers to')
+    parser.add_argument('--dry-run', action='store_true', help='compute and report without writing')
+    profiling.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with profiling.session('recompute_counters', args):
+        run(args)
+
+
+def run(args):
+    try:
+        db = firestore_session.get_db()
+    except Exception as e:
+        print(f"❌ خطأ في الاتصال بـ Firebase: {e}")
+        sys.exit(1)
+
+    print(f"🔢 قراءة {', '.join(SOURCES)} ({args.partitions} أجزاء لكل مجموعة)...")
+    totals = compute_totals(db, args.partitions, args.workers,
+                            on_scanned=lambda name, n, t: print(f"   ✅ {format_throughput(name, n, t)}"))
+
+    if args.dry_run:
+        for name in COUNTERS:
+            print(f"   • {name}: {len(totals[name])} ملف له عدادات")
+        return
+
+    print("\n✍️  كتابة العدادات المتغيرة...")
+    report = write_changed_counters(db, totals, args.batch_size, args.reset_missing)
+    for name, stats in report.items():
+        untouched = stats['missing'] if not args.reset_missing else 0
+        print(f"   ✅ {name}: {stats['changed']}/{stats['profiles']} متغير "
+              f"({stats['writes']} كتابة، {stats['commits']} دفعة)"
+              + (f"، {untouched} بدون بيانات لم يُلمس" if untouched else '')
+              + (f"، ⚠️ {stats['orphans']} معرّف بدون ملف شخصي" if stats['orphans'] else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+فهرس البحث بالبادئات للمنتجات والتجار
+Arabic-normalised prefix search index for products and merchants
+
+Firestore لا يبحث داخل النص ولا يتجاهل التشكيل، فالتطبيق يحمّل المنتجات
+كلها ويصفيها. هنا تُوحّد الأسماء والتصنيفات (حذف التشكيل والتطويل، توحيد
+أشكال الألف والياء والتاء المربوطة) وتُقطّع إلى كلمات، ثم يُبنى فهرس
+معكوس بادئة -> معرّفات موزع على أجزاء ثابتة العدد:
+
+    search_index/products          {shards, documents, ...}
+    search_index/products-17       {prefixes: {'فاخ': [ids], 'فاخر': [ids], ...}}
+
+البحث عن كلمة = قراءة جزء واحد، رقمه shard_of(البادئة). نفس الأجزاء تُكتب
+في ملف محلي (search_index.json) للواجهات التي تبحث بدون اتصال.
+
+الحقل prefixes مستثنى من الفهرسة في firestore.indexes.json؛ بدون الاستثناء
+يعد Firestore مدخل فهرس لكل مفتاح ولكل عنصر في القوائم، وحد المستند 40,000
+مدخل يُبلغ قبل حد الحجم بكثير. انشر الاستثناء قبل أول تشغيل:
+
+    firebase deploy --only firestore:indexes
+
+    python scripts/search_index.py                   # تحديث ما تغير فقط
+    python scripts/search_index.py --full --shards 128
+    python scripts/search_index.py --query 'متجر الفاخر' --source merchants
+
+المنتجات التي يعدلها التطبيق لا تحمل updated_at، لذلك يقرأ كل تشغيل حقول
+النص فقط من كل المستندات ويقارن بادئات كل مستند بما في الفهرس الحالي؛
+الأجزاء التي لم يتغير فيها مستند لا تُكتب.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+
+import firestore_session
+import profiling
+from batch_writer import BatchWriter, format_throughput
+
+INDEX_COLLECTION = 'search_index'
+INDEX_VERSION = 1
+
+# المجموعة -> الحقول المفهرسة (نص أو قائمة نصوص)
+SEARCH_SOURCES = {
+    'products': ['name', 'category', 'categories'],
+    'merchants': ['merchant_name', 'categories'],
+}
+
+DEFAULT_SHARDS = 64
+MIN_PREFIX = 2
+MAX_PREFIX = 12
+DEFAULT_OUTPUT = 'search_index.json'
+
+# حد حجم المستند في Firestore 1 MiB؛ التحذير قبله بهامش
+SHARD_SIZE_WARNING = 900 * 1024
+# حد مدخلات الفهرس لكل مستند 40,000؛ يهم إذا لم يُنشر استثناء prefixes
+SHARD_ENTRY_WARNING = 30000
+# الأجزاء كبيرة، وطلب الكتابة الواحد محدود بـ 10 MiB
+SHARD_BATCH_SIZE = 8
+
+# التشكيل وعلامات القرآن والألف الخنجرية
+_DIACRITICS_RE = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed]')
+_TATWEEL = '\u0640'
+_LETTER_MAP = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه',
+    **{chr(0x0660 + d): str(d) for d in range(10)},
+    **{chr(0x06f0 + d): str(d) for d in range(10)},
+})
+_TOKEN_RE = re.compile(r'[^\W_]+')
+# أداة التعريف وما يسبقها من حروف الجر والعطف: "للإلكترونيات" -> "الكترونيات"
+_ARTICLES = ('وبال', 'وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+
+
+# ---------------------------------------------------------------------------
+# التوحيد والتقطيع
+# ---------------------------------------------------------------------------
+
+def normalise(text):
+    """
+    توحيد النص للبحث: NFKC (أشكال العرض والحروف المركبة)، حذف التشكيل
+    والتطويل، توحيد الألف والياء والتاء المربوطة والأرقام، وأحرف لاتينية صغيرة
+    """
+    text = unicodedata.normalize('NFKC', str(text))
+    text = _DIACRITICS_RE.sub('', text).replace(_TATWEEL, '')
+    return text.translate(_LETTER_MAP).casefold()
+
+
+def _strip_article(token):
+    """الكلمة بدون أداة التعريف في أولها، أو None إذا لم تبدأ بها"""
+    for article in _ARTICLES:
+        if token.startswith(article) and len(token) - len(article) >= MIN_PREFIX:
+            return token[len(article):]
+    return None
+
+
+def tokenize(text):
+    """
+    كلمات النص الموحد، مع كل نسخها بعد حذف أداة التعريف
+    ("للالكترونيات" -> "الكترونيات" -> "كترونيات")، فالبحث بالنسخة الأقصر
+    يطابق الكلمة مهما كانت السوابق في الاسم أو في نص البحث
+    """
+    tokens = set()
+    for token in _TOKEN_RE.findall(normalise(text)):
+        while token:
+            tokens.add(token)
+            token = _strip_article(token)
+    return tokens
+
+
+def token_prefixes(token):
+    return {token[:n] for n in range(MIN_PREFIX, min(len(token), MAX_PREFIX) + 1)}
+
+
+def document_prefixes(data, fields):
+    """كل بادئات الحقول المفهرسة في مستند واحد"""
+    prefixes = set()
+    for field in fields:
+        value = data.get(field)
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for item in values:
+            if isinstance(item, str):
+                for token in tokenize(item):
+                    prefixes |= token_prefixes(token)
+    return prefixes
+
+
+def shard_of(prefix, shards):
+    """FNV-1a على UTF-8 (سهل الإعادة في Dart)، باقي القسمة على عدد الأجزاء"""
+    value = 0x811c9dc5
+    for byte in prefix.encode('utf-8'):
+        value = ((value ^ byte) * 0x01000193) & 0xffffffff
+    return value % shards
+
+
+def shard_doc_id(source, shard):
+    return f'{source}-{shard:03d}'
+
+
+# ---------------------------------------------------------------------------
+# بناء الفهرس
+# ---------------------------------------------------------------------------
+
+def build_shards(documents, shards):
+    """{doc_id: prefixes} -> {shard: {prefix: [ids مرتبة]}}"""
+    inverted = {}
+    for doc_id, prefixes in documents.items():
+        for prefix in prefixes:
+            inverted.setdefault(prefix, []).append(doc_id)
+    result = {}
+    for prefix, ids in inverted.items():
+        result.setdefault(shard_of(prefix, shards), {})[prefix] = sorted(ids)
+    return result
+
+
+def documents_from_shards(index):
+    """عكس الفهرس: بادئات كل مستند كما هي مخزنة الآن"""
+    documents = {}
+    for prefixes in index.values():
+        for prefix, ids in prefixes.items():
+            for doc_id in ids:
+                documents.setdefault(doc_id, set()).add(prefix)
+    return documents
+
+
+def scan_source(db, source):
+    """قراءة الحقول المفهرسة فقط من كل مستندات المجموعة"""
+    fields = SEARCH_SOURCES[source]
+    return {snapshot.id: document_prefixes(snapshot.to_dict() or {}, fields)
+            for snapshot in db.collection(source).select(fields).stream()}
+
+
+def load_meta(db, source):
+    snapshot = db.collection(INDEX_COLLECTION).document(source).get()
+    return (snapshot.to_dict() or {}) if snapshot.exists else {}
+
+
+def load_index(db, source):
+    """(meta, {shard: prefixes}) من Firestore؛ فهرس فارغ إذا لم يُبنَ بعد"""
+    meta = load_meta(db, source)
+    if not meta:
+        return {}, {}
+    index_ref = db.collection(INDEX_COLLECTION)
+    refs = [index_ref.document(shard_doc_id(source, n)) for n in range(meta.get('shards', 0))]
+    index = {}
+    for snapshot in db.get_all(refs):
+        if snapshot.exists:
+            index[int(snapshot.id.rsplit('-', 1)[1])] = (snapshot.to_dict() or {}).get('prefixes', {})
+    return meta, index
+
+
+def shard_size(prefixes):
+    """تقدير حجم مستند الجزء كما يحسبه Firestore (تقريبي)"""
+    return sum(len(p.encode('utf-8')) + 1 + sum(len(i) + 1 for i in ids) for p, ids in prefixes.items())
+
+
+def shard_index_entries(prefixes):
+    """عدد مدخلات الفهرس لمستند الجزء بدون الاستثناء: مفتاح لكل بادئة وعنصر لكل معرف"""
+    return sum(1 + len(ids) for ids in prefixes.values())
+
+
+def update_source(db, source, shards=DEFAULT_SHARDS, full=False, dry_run=False,
+                  batch_size=SHARD_BATCH_SIZE):
+    """
+    تحديث فهرس مجموعة واحدة؛ يعيد (الأجزاء الجديدة، إحصاءات التشغيل)
+
+    المستندات المتغيرة هي التي اختلفت بادئاتها عن الفهرس الحالي (أو حُذفت
+    أو أُضيفت). تُكتب الأجزاء التي تحتوي بادئة لمستند متغير فقط، وتغيير عدد
+    الأجزاء أو إصدار الفهرس يعني إعادة كتابة كاملة.
+    """
+    started = time.perf_counter()
+    meta, previous = load_index(db, source)
+    rebuild = full or meta.get('shards') != shards or meta.get('version') != INDEX_VERSION
+    scanned = scan_source(db, source)
+    # المستند بدون نص مفهرس لا يظهر في الفهرس، فلا يُعد متغيراً
+    documents = {doc_id: prefixes for doc_id, prefixes in scanned.items() if prefixes}
+    index = build_shards(documents, shards)
+
+    old_documents = {} if rebuild else documents_from_shards(previous)
+    changed = {doc_id for doc_id in documents.keys() | old_documents.keys()
+               if documents.get(doc_id) != old_documents.get(doc_id)}
+    if rebuild:
+        dirty = set(range(shards)) | set(previous)
+    else:
+        dirty = {shard_of(prefix, shards)
+                 for doc_id in changed
+                 for prefix in documents.get(doc_id, set()) ^ old_documents.get(doc_id, set())}
+
+    stats = {'source': source, 'documents': len(scanned), 'changed': len(changed),
+             'removed': len(old_documents.keys() - documents.keys()), 'rebuild': rebuild,
+             'written': 0, 'deleted': 0, 'commits': 0,
+             'largest': max((shard_size(p) for p in index.values()), default=0),
+             'largest_entries': max((shard_index_entries(p) for p in index.values()), default=0)}
+    if dry_run:
+        stats['elapsed'] = time.perf_counter() - started
+        return index, stats
+
+    index_ref = db.collection(INDEX_COLLECTION)
+    with BatchWriter(db, batch_size=batch_size, label=source) as writer:
+        for shard in sorted(dirty):
+            prefixes = index.get(shard)
+            ref = index_ref.document(shard_doc_id(source, shard))
+            if prefixes:
+                if rebuild or prefixes != previous.get(shard):
+                    writer.set(ref, {'source': source, 'shard': shard, 'prefixes': prefixes})
+                    stats['written'] += 1
+            elif shard in previous:
+                writer.delete(ref)
+                stats['deleted'] += 1
+        if stats['written'] or stats['deleted'] or not meta:
+            writer.set(index_ref.document(source), {
+                'source': source,
+                'version': INDEX_VERSION,
+                'shards': shards,
+                'min_prefix': MIN_PREFIX,
+                'max_prefix': MAX_PREFIX,
+                'documents': len(documents),
+                'updated_at': firestore_session.server_timestamp(),
+            })
+    stats['commits'] = writer.commits
+    stats['elapsed'] = time.perf_counter() - started
+    return index, stats
+
+
+def write_local_index(path, indexes, shards):
+    """كتابة كل الأجزاء في ملف JSON مضغوط (كتابة ذرية)"""
+    payload = {
+        'version': INDEX_VERSION,
+        'shards': shards,
+        'min_prefix': MIN_PREFIX,
+        'max_prefix': MAX_PREFIX,
+        'sources': {source: {str(shard): prefixes for shard, prefixes in sorted(index.items())}
+                    for source, index in indexes.items()},
+    }
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+# ---------------------------------------------------------------------------
+# البحث
+# ---------------------------------------------------------------------------
+
+def _bare(token):
+    while True:
+        stripped = _strip_article(token)
+        if stripped is None:
+            return token
+        token = stripped
+
+
+def query_prefixes(text):
+    """
+    بادئة واحدة لكل كلمة في نص البحث بعد حذف أداة التعريف (الكلمات الأقصر
+    من MIN_PREFIX تُهمل)
+    """
+    return sorted({_bare(token)[:MAX_PREFIX] for token in _TOKEN_RE.findall(normalise(text))
+                   if len(token) >= MIN_PREFIX})
+
+
+def search(db, source, text):
+    """معرّفات المستندات التي تطابق كل كلمات النص؛ جزء واحد لكل كلمة"""
+    prefixes = query_prefixes(text)
+    if not prefixes:
+        return []
+    shards = load_meta(db, source).get('shards')
+    if not shards:
+        return []
+    index_ref = db.collection(INDEX_COLLECTION)
+    refs = {shard_doc_id(source, shard_of(p, shards)) for p in prefixes}
+    found = {snapshot.id: (snapshot.to_dict() or {}).get('prefixes', {})
+             for snapshot in db.get_all([index_ref.document(r) for r in sorted(refs)]) if snapshot.exists}
+    result = None
+    for prefix in prefixes:
+        ids = set(found.get(shard_doc_id(source, shard_of(prefix, shards)), {}).get(prefix, ()))
+        result = ids if result is None else result & ids
+    return sorted(result)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def print_stats(stats):
+    mode = 'إعادة بناء' if stats['rebuild'] else f"{stats['changed']} مستند متغير"
+    removed = f"، {stats['removed']} محذوف" if stats['removed'] else ''
+    print(f"✅ {format_throughput(stats['source'], stats['documents'], stats['elapsed'], stats['commits'])}"
+          f" — {mode}{removed}، {stats['written']} جزء مكتوب، {stats['deleted']} جزء محذوف")
+    if stats['largest'] > SHARD_SIZE_WARNING:
+        print(f"⚠️  أكبر جزء في {stats['source']} ≈ {stats['largest'] / 1024:.0f} KB؛ "
+              f"زد --shards قبل أن يتجاوز حد 1 MiB")
+    if stats['largest_entries'] > SHARD_ENTRY_WARNING:
+        print(f"⚠️  أكبر جزء في {stats['source']} فيه {stats['largest_entries']} مدخل فهرس؛ "
+              f"الكتابة تفشل فوق 40,000 ما لم يُنشر استثناء prefixes في firestore.indexes.json، "
+              f"أو زد --shards")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Build the Arabic-normalised prefix search index')
+    parser.add_argument('--sources', nargs='+', choices=sorted(SEARCH_SOURCES), default=list(SEARCH_SOURCES),
+                        help='collections to index (default: all)')
+    parser.add_argument('--shards', type=int, default=DEFAULT_SHARDS,
+                        help=f'index documents per collection (default: {DEFAULT_SHARDS})')
+    parser.add_argument('--full', action='store_true', help='rewrite every shard')
+    parser.add_argument('--dry-run', action='store_true', help='report changes without writing')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help=f'local copy of the index (default: {DEFAULT_OUTPUT}); "" to skip')
+    parser.add_argument('--batch-size', type=int, default=SHARD_BATCH_SIZE,
+                        help=f'shard documents per batch commit (default: {SHARD_BATCH_SIZE})')
+    parser.add_argument('--query', metavar='TEXT', help='instead of indexing, search the index')
+    parser.add_argument('--source', choices=sorted(SEARCH_SOURCES), default='products',
+                        help='collection searched by --query (default: products)')
+    profiling.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.shards < 1:
+        parser.error('--shards must be at least 1')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with profiling.session('search_index', args):
+        run(args)
+
+
+def run(args):
+    try:
+        db = firestore_session.get_db()
+    except Exception as e:
+        print(f"❌ خطأ في الاتصال بـ Firebase: {e}")
+        sys.exit(1)
+
+    if args.query:
+        ids = search(db, args.source, args.query)
+        print(f"🔎 '{args.query}' في {args.source}: {len(ids)} نتيجة")
+        for doc_id in ids[:20]:
+            print(f"   • {doc_id}")
+        return
+
+    print(f"🔤 تحديث فهرس البحث ({args.shards} جزء لكل مجموعة)...")
+    indexes = {}
+    for source in args.sources:
+        with profiling.phase(source):
+            indexes[source], stats = update_source(db, source, args.shards, args.full, args.dry_run,
+                                                   args.batch_size)
+        print_stats(stats)
+
+    if args.output and not args.dry_run:
+        with profiling.phase('write_local_index'):
+            size = write_local_index(args.output, indexes, args.shards)
+        print(f"💾 {args.output} ({size / 1024:.0f} KB)")
+
+
+if __name__ == '__main__':
+    main()
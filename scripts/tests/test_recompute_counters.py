@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات recompute_counters على FakeFirestore
+Tests for recompute_counters against the in-process fake client
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import recompute_counters
+from fake_firestore import FakeFirestore
+
+
+def _recompute(db, partitions=1, **options):
+    totals = recompute_counters.compute_totals(db, partitions=partitions, workers=2)
+    return recompute_counters.write_changed_counters(db, totals, **options)
+
+
+def _profile(db, collection, doc_id):
+    return db.collection(collection).document(doc_id).get().to_dict()
+
+
+def test_buyer_counted_from_user_id_only_order():
+    db = FakeFirestore()
+    db.load('buyers', [('b1', {'total_orders': 0, 'total_spent': 0})])
+    db.load('orders', [
+        ('o1', {'user_id': 'b1', 'status': 'pending', 'total_amount': 120}),
+        ('o2', {'buyer_id': 'b1', 'merchant_id': 'm1', 'status': 'delivered', 'total_price': 30.5}),
+        ('o3', {'user_id': 'b1', 'status': 'cancelled', 'total_amount': 999}),
+    ])
+
+    _recompute(db)
+
+    buyer = _profile(db, 'buyers', 'b1')
+    assert buyer['total_orders'] == 3
+    assert buyer['total_spent'] == 150.5
+
+
+def test_profiles_without_data_are_left_alone():
+    db = FakeFirestore()
+    db.load('buyers', [('b1', {'total_orders': 4, 'total_spent': 80.0}),
+                       ('b2', {'total_orders': 1, 'total_spent': 10.0})])
+    db.load('orders', [('o1', {'user_id': 'b2', 'status': 'pending', 'total_amount': 25})])
+
+    report = _recompute(db)
+
+    assert _profile(db, 'buyers', 'b1') == {'total_orders': 4, 'total_spent': 80.0}
+    assert _profile(db, 'buyers', 'b2') == {'total_orders': 1, 'total_spent': 25.0}
+    assert report['buyers']['missing'] == 1
+
+
+def test_reset_missing_zeroes_profiles_without_data():
+    db = FakeFirestore()
+    db.load('buyers', [('b1', {'total_orders': 4, 'total_spent': 80.0})])
+
+    _recompute(db, reset_missing=True)
+
+    assert _profile(db, 'buyers', 'b1') == {'total_orders': 0, 'total_spent': 0.0}
+
+
+def test_partitioned_scan_matches_single_scan():
+    db = FakeFirestore()
+    db.load('merchants', [('m1', {})])
+    db.load('orders', [(f'o{i}', {'merchant_id': 'm1', 'status': 'pending', 'total_amount': 10})
+                       for i in range(20)])
+    # مجموعة فرعية بنفس الاسم لا تدخل في العدادات
+    db.load('merchants/m1/orders', [('archived', {'merchant_id': 'm1', 'total_amount': 500})])
+
+    single = recompute_counters.compute_totals(db, partitions=1, workers=2)
+    partitioned = recompute_counters.compute_totals(db, partitions=4, workers=2)
+
+    assert single['merchants']['m1'] == partitioned['merchants']['m1']
+    assert partitioned['merchants']['m1']['total_orders'] == 20
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+حذف المستندات المنتهية من المجموعات المؤقتة
+Incremental TTL sweeper for ephemeral collections
+
+لكل مجموعة حقل زمني أو أكثر ومدة صلاحية. المستندات الأقدم من (الآن - المدة)
+تُجلب باستعلام نطاق مفهرس على كل حقل، على صفحات بالمؤشرات، وتُحذف عبر دفعات.
+بعد كل تشغيل ناجح تُحفظ علامة (watermark) لكل حقل في ttl_sweeper_state،
+فيبدأ التشغيل التالي من حيث انتهى ولا يمر إلا على ما انتهى حديثاً.
+
+    python scripts/ttl_sweeper.py
+    python scripts/ttl_sweeper.py --ttl notifications=14 --dry-run
+    python scripts/ttl_sweeper.py --collections otp --full
+
+المستندات التي لا تحتوي أياً من الحقول الزمنية لا تظهر في استعلامات النطاق
+ولا تُحذف.
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+import firestore_session
+import profiling
+from batch_writer import BatchWriter, MAX_BATCH_SIZE, format_throughput
+
+# المجموعة -> (الحقول الزمنية، مدة الصلاحية بالأيام)
+# otp: expiresAt هو وقت الانتهاء نفسه (index.js: sendWhatsAppOTP)
+# notifications: التطبيق يكتب شكلين؛ timestamp في notifications_system.dart
+# و created_at في merchant_order_confirmation.dart، فكل حقل يُمسح باستعلامه
+TTL_RULES = {
+    'otp': (('expiresAt',), 0),
+    'notifications': (('timestamp', 'created_at'), 30),
+    'connection_test': (('timestamp',), 1),
+}
+
+STATE_COLLECTION = 'ttl_sweeper_state'
+PAGE_SIZE = 500
+
+
+def sweep_query(db, collection_name, field, cutoff, watermark=None):
+    """المستندات حيث watermark <= field < cutoff، مرتبة بالحقل ثم المسار"""
+    query = db.collection(collection_name)
+    if watermark is not None:
+        query = query.where(field, '>=', watermark)
+    return (query.where(field, '<', cutoff)
+            .order_by(field)
+            .order_by('__name__')
+            .select([field]))
+
+
+def load_watermarks(db, collection_name, fields):
+    """
+    آخر حد تم الوصول إليه لكل حقل؛ الحقول الجديدة تبدأ بدون علامة
+
+    الحالة القديمة بحقل واحد ({'field', 'watermark'}) تُقرأ كعلامة لذلك الحقل.
+    """
+    snapshot = db.collection(STATE_COLLECTION).document(collection_name).get()
+    state = snapshot.to_dict() if snapshot.exists else {}
+    saved = dict(state.get('watermarks') or {})
+    if 'field' in state and 'watermarks' not in state:
+        saved[state['field']] = state.get('watermark')
+    return {field: saved.get(field) for field in fields}
+
+
+def save_watermarks(db, collection_name, watermarks, deleted):
+    db.collection(STATE_COLLECTION).document(collection_name).set({
+        'watermarks': watermarks,
+        'last_deleted': deleted,
+        'last_run': firestore_session.server_timestamp(),
+    })
+
+
+def sweep_collection(db, collection_name, fields, ttl_days, now=None, full=False,
+                     dry_run=False, page_size=PAGE_SIZE, batch_size=MAX_BATCH_SIZE):
+    """
+    حذف المنتهي من مجموعة واحدة؛ يعيد إحصاءات التشغيل
+
+    لكل حقل زمني استعلام نطاق وعلامة خاصة به. كل صفحة تبدأ بعد آخر مستند في
+    الصفحة السابقة (start_after)، والحذف يتم على دفعات. المستند الذي يحمل
+    الحقلين معاً يُحذف مرة واحدة. العلامات تُحفظ فقط بعد اكتمال المسح، فالتشغيل
+    المتقطع يعيد المرور على نطاقه نفسه فقط (والمحذوف منه لم يعد موجوداً).
+    """
+    if isinstance(fields, str):
+        fields = (fields,)
+    started = time.perf_counter()
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=ttl_days)
+    watermarks = dict.fromkeys(fields) if full else load_watermarks(db, collection_name, fields)
+    queries = {field: sweep_query(db, collection_name, field, cutoff, watermarks[field])
+               for field in fields}
+    result = {'collection': collection_name, 'fields': tuple(fields), 'cutoff': cutoff,
+              'watermarks': watermarks, 'deleted': 0, 'commits': 0, 'pages': 0}
+
+    if dry_run:
+        # المستند الذي يحمل الحقلين قد يُعد مرتين
+        result['expired'] = {field: int(query.count(alias='expired').get()[0][0].value)
+                             for field, query in queries.items()}
+        result['elapsed'] = time.perf_counter() - started
+        return result
+
+    page_size = max(1, page_size)
+    deleted = set()
+    with BatchWriter(db, batch_size=batch_size, label=collection_name) as writer:
+        for query in queries.values():
+            last_doc = None
+            while True:
+                page_query = query.start_after(last_doc) if last_doc else query
+                page = list(page_query.limit(page_size).stream())
+                if not page:
+                    break
+                result['pages'] += 1
+                for snapshot in page:
+                    if snapshot.id not in deleted:
+                        deleted.add(snapshot.id)
+                        writer.delete(snapshot.reference)
+                if len(page) < page_size:
+                    break
+                last_doc = page[-1]
+    result['deleted'] = writer.writes
+    result['commits'] = writer.commits
+
+    save_watermarks(db, collection_name, dict.fromkeys(fields, cutoff), writer.writes)
+    result['elapsed'] = time.perf_counter() - started
+    return result
+
+
+def sweep(db, rules=TTL_RULES, workers=3, on_result=None, **options):
+    """تشغيل المسح على كل المجموعات بالتوازي؛ المجموعات التي فشلت تحمل 'error'"""
+    now = options.pop('now', None) or datetime.now(timezone.utc)
+
+    def run(name, fields, ttl):
+        with profiling.phase(name):
+            return sweep_collection(db, name, fields, ttl, now=now, **options)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(run, name, fields, ttl): name
+            for name, (fields, ttl) in rules.items()
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'collection': name, 'deleted': 0, 'error': e}
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return results
+
+
+def print_result(result):
+    name = result['collection']
+    if 'error' in result:
+        print(f"⚠️  خطأ في مسح '{name}': {result['error']}")
+    elif 'expired' in result:
+        for field, expired in result['expired'].items():
+            print(f"🔎 {name}: {expired} مستند منتهي ({field} < {result['cutoff']:%Y-%m-%d %H:%M})")
+    else:
+        marks = [mark for mark in result['watermarks'].values() if mark]
+        since = f" منذ {min(marks):%Y-%m-%d %H:%M}" if marks else ''
+        print(f"✅ {format_throughput(name, result['deleted'], result['elapsed'], result['commits'])}{since}")
+
+
+def _ttl_override(value):
+    name, _, days = value.partition('=')
+    try:
+        return name, float(days)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected NAME=DAYS, got '{value}'")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Delete expired documents from ephemeral collections')
+    parser.add_argument('--collections', nargs='+', choices=sorted(TTL_RULES), default=list(TTL_RULES),
+                        help='collections to sweep (default: all)')
+    parser.add_argument('--ttl', type=_ttl_override, action='append', default=[], metavar='NAME=DAYS',
+                        help='override the TTL of a collection, e.g. notifications=14')
+    parser.add_argument('--full', action='store_true',
+                        help='ignore saved watermarks and scan from the beginning')
+    parser.add_argument('--dry-run', action='store_true', help='count expired documents without deleting')
+    parser.add_argument('--workers', type=int, default=3, help='collections swept concurrently (default: 3)')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE,
+                        help=f'documents per query page (default: {PAGE_SIZE})')
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE,
+                        help=f'deletes per batch commit, max {MAX_BATCH_SIZE}')
+    profiling.add_arguments(parser)
+    args = parser.parse_args(argv)
+    unknown = [name for name, _ in args.ttl if name not in TTL_RULES]
+    if unknown:
+        parser.error(f"unknown collection in --ttl: {', '.join(unknown)}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with profiling.session('ttl_sweeper', args):
+        run(args)
+
+
+def run(args):
+    try:
+        db = firestore_session.get_db()
+    except Exception as e:
+        print(f"❌ خطأ في الاتصال بـ Firebase: {e}")
+        sys.exit(1)
+
+    overrides = dict(args.ttl)
+    rules = {name: (TTL_RULES[name][0], overrides.get(name, TTL_RULES[name][1]))
+             for name in args.collections}
+
+    print("🧹 حذف المستندات المنتهية...")
+    for name, (fields, ttl) in rules.items():
+        print(f"   • {name}: {' أو '.join(fields)} أقدم من {ttl:g} يوم")
+    results = sweep(db, rules, workers=args.workers, on_result=print_result, full=args.full,
+                    dry_run=args.dry_run, page_size=args.page_size, batch_size=args.batch_size)
+    if not args.dry_run:
+        print(f"\n✅ تم حذف {sum(r['deleted'] for r in results)} مستند منتهي")
+    if any('error' in r for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+كتابة بيانات البذرة بشكل متكرر وآمن (idempotent)
+Diff-based upserts with deterministic document IDs
+
+معرّف كل مستند مشتق من مفتاح طبيعي (رخصة تجارية، بريد، رقم لوحة...)،
+وتُخزن بصمة المحتوى في الحقل seed_hash. عند إعادة التشغيل تُقرأ البصمات
+دفعة واحدة عبر get_all ولا يُكتب إلا الجديد أو المتغير.
+"""
+
+import hashlib
+import itertools
+import json
+import time
+
+from batch_writer import BatchWriter, MAX_BATCH_SIZE
+
+# اسم الحقل الذي يحمل بصمة محتوى البذرة
+HASH_FIELD = 'seed_hash'
+
+# عدد المراجع في كل طلب get_all
+LOOKUP_SIZE = 500
+
+
+def document_id(prefix, natural_key):
+    """معرّف ثابت من مفتاح طبيعي (آمن لأي أحرف، بما فيها العربية و /)"""
+    digest = hashlib.blake2b(str(natural_key).strip().lower().encode('utf-8'), digest_size=10)
+    return f'{prefix}-{digest.hexdigest()}'
+
+
+def content_hash(data):
+    """بصمة المحتوى مستقلة عن ترتيب المفاتيح"""
+    encoded = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.blake2b(encoded.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def upsert_documents(db, collection_name, records, on_create=None,
+                     batch_size=MAX_BATCH_SIZE, lookup_size=LOOKUP_SIZE, label=None):
+    """
+    كتابة السجلات الجديدة أو المتغيرة فقط
+    Write only new or changed records; records are (doc_id, data) pairs
+
+    on_create: حقول تُضاف للمستندات الجديدة فقط ولا تدخل في البصمة
+    (مثل created_at = SERVER_TIMESTAMP). المستندات المتغيرة تُدمج (merge)
+    حتى تبقى الحقول التي يحدّثها التطبيق.
+    """
+    collection = db.collection(collection_name)
+    stats = {'collection': collection_name, 'examined': 0, 'created': 0,
+             'updated': 0, 'unchanged': 0}
+    started = time.perf_counter()
+    records = iter(records)
+
+    with BatchWriter(db, batch_size=batch_size, label=label or collection_name) as writer:
+        while True:
+            chunk = list(itertools.islice(records, lookup_size))
+            if not chunk:
+                break
+            refs = [collection.document(doc_id) for doc_id, _ in chunk]
+            # None = المستند غير موجود، '' = موجود بدون بصمة
+            existing = {
+                snapshot.id: (snapshot.to_dict() or {}).get(HASH_FIELD, '')
+                for snapshot in db.get_all(refs, field_paths=[HASH_FIELD])
+                if snapshot.exists
+            }
+            for ref, (doc_id, data) in zip(refs, chunk):
+                stats['examined'] += 1
+                digest = content_hash(data)
+                current = existing.get(doc_id)
+                if current == digest:
+                    stats['unchanged'] += 1
+                elif current is None:
+                    writer.set(ref, {**data, **(on_create or {}), HASH_FIELD: digest})
+                    stats['created'] += 1
+                else:
+                    writer.set(ref, {**data, HASH_FIELD: digest}, merge=True)
+                    stats['updated'] += 1
+
+    stats.update(writes=writer.writes, commits=writer.commits,
+                 elapsed=time.perf_counter() - started)
+    return stats
+
+
+def format_upsert(stats):
+    """سطر ملخص نتيجة الكتابة"""
+    return (f"{stats['collection']}: {stats['created']} جديد، {stats['updated']} محدّث، "
+            f"{stats['unchanged']} بدون تغيير ({stats['writes']} كتابة، "
+            f"{stats['commits']} دفعة، {stats['elapsed']:.2f} ث)")